@@ -2,28 +2,75 @@ from app.config import get_config
 from flask  import Flask, Blueprint
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from .replica import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 
-def create_app():
+def create_app(test_config=None):
     app = Flask(__name__)
     app.config.from_object(get_config())
+    if test_config:
+        app.config.update(test_config)
+    if str(app.config.get('SQLALCHEMY_DATABASE_URI', '')).startswith('sqlite'):
+        # SQLite gets a static/singleton pool that rejects queue-pool sizing options
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {}
 
     migrate.init_app(app, db)
 
     db.init_app(app)
 
+    # The tables must be registered on db.metadata before create_all()
+    from . import models  # noqa: F401
+
     with app.app_context():
         db.create_all()
+        if db.engine.dialect.name == 'postgresql':
+            # Keep message partitions created ahead of time; the worker's recurring
+            # job does the same, so a failure here must not stop the app starting
+            from .services.partitions import ensure_partitions
+            try:
+                with db.engine.begin() as conn:
+                    ensure_partitions(conn, months_ahead=app.config.get('MESSAGE_PARTITIONS_AHEAD', 3))
+            except Exception:
+                app.logger.exception("Could not create message partitions")
 
     from .routes.users import users_bp
     from .routes.agents import agents_bp
     from .routes.messages import messages_bp
     from .routes.conversations import conversations_bp
+    from .routes.memories import memories_bp
+    from .routes.jobs import jobs_bp
+    from .routes.functions import functions_bp
     app.register_blueprint(users_bp, url_prefix='/api/users')
     app.register_blueprint(agents_bp, url_prefix='/api/agents')
     app.register_blueprint(messages_bp, url_prefix='/api/messages')
     app.register_blueprint(conversations_bp, url_prefix='/api/conversations')   
+    app.register_blueprint(memories_bp, url_prefix='/api/memories')
+    app.register_blueprint(jobs_bp, url_prefix='/api/jobs')
+    app.register_blueprint(functions_bp, url_prefix='/api/functions')
+
+    from .commands import memory_cli, jobs_cli, messages_cli
+    app.cli.add_command(memory_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(messages_cli)
+
+    from . import metrics, query_monitor
+    metrics.init_app(app, db)
+    query_monitor.init_app(app)
+
+    from .services import admission, llm_router
+    admission.init_app(app)
+    llm_router.init_app(app)
+
+    from . import replica
+    replica.init_app(app, db)
+
+    from . import ids
+    ids.init_app(app)
+
+    # Last, so warm-up sees the fully configured app
+    from . import warmup
+    warmup.init_app(app, db)
 
     return app
\ No newline at end of file
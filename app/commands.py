@@ -0,0 +1,162 @@
+import click
+from flask.cli import AppGroup
+
+memory_cli = AppGroup('memory', help='Memory store maintenance commands.')
+jobs_cli = AppGroup('jobs', help='Background job queue commands.')
+messages_cli = AppGroup('messages', help='Message store maintenance commands.')
+
+@memory_cli.command('reembed')
+@click.option('--from', 'source_type', required=True, help='Embedding type to migrate away from.')
+@click.option('--to', 'target_type', required=True, help='Embedding type to migrate to.')
+@click.option('--batch-size', default=100, show_default=True, help='Memories embedded per API call.')
+@click.option('--max-batches', type=int, default=None, help='Stop after this many batches.')
+def reembed(source_type, target_type, batch_size, max_batches):
+    """Copy memories forward to a new embedding type in batches."""
+    from app.services.openai_service import OpenAIService
+    from app.services.reembedding import ReembeddingJob
+
+    job = ReembeddingJob(OpenAIService(), source_type, target_type, batch_size=batch_size)
+    processed = job.run(max_batches=max_batches)
+    click.echo(f"Re-embedded {processed} memories, {job.pending_count()} pending")
+
+@memory_cli.command('retire-embeddings')
+@click.option('--from', 'source_type', required=True, help='Embedding type that was migrated away from.')
+@click.option('--to', 'target_type', required=True, help='Embedding type that was migrated to.')
+@click.option('--batch-size', default=500, show_default=True, help='Memories deleted per commit.')
+def retire_embeddings(source_type, target_type, batch_size):
+    """Delete source memories once the application uses the target type."""
+    from app.services.reembedding import ReembeddingJob
+
+    job = ReembeddingJob(None, source_type, target_type, batch_size=batch_size)
+    deleted = job.retire_source()
+    click.echo(f"Retired {deleted} '{source_type}' memories")
+
+@memory_cli.command('index-tenants')
+@click.option('--min-rows', default=10000, show_default=True, help='Memories a tenant needs to get its own index.')
+def index_tenants(min_rows):
+    """Create partial vector indexes for large tenants."""
+    from app.services.tenant_indexes import TenantIndexManager
+
+    names = TenantIndexManager(min_rows=min_rows).ensure_indexes()
+    click.echo(f"Ensured {len(names)} tenant indexes")
+
+@memory_cli.command('compact')
+@click.option('--similarity', default=0.97, show_default=True, help='Cosine similarity at which memories are duplicates.')
+@click.option('--batch-size', default=500, show_default=True, help='Memories processed per batch.')
+def compact(similarity, batch_size):
+    """Collapse exact and near-duplicate memories, keeping the oldest."""
+    from app.services.memory_dedup import MemoryCompactor
+
+    counts = MemoryCompactor(similarity_threshold=similarity, batch_size=batch_size).compact()
+    click.echo(
+        f"Hashed {counts['hashed']} memories, removed {counts['exact']} exact "
+        f"and {counts['near']} near duplicates"
+    )
+
+@memory_cli.command('snapshot')
+@click.argument('path')
+@click.option('--dtype', type=click.Choice(['float32', 'float16']), default='float32', show_default=True,
+              help='Stored embedding precision.')
+@click.option('--embedding-type', 'embedding_types', multiple=True, help='Only export these embedding types.')
+def snapshot(path, dtype, embedding_types):
+    """Export memories to a snapshot directory (rows plus .npy embedding matrices)."""
+    from app.services.snapshots import export_snapshot
+
+    counts = export_snapshot(path, dtype=dtype, embedding_types=list(embedding_types) or None)
+    click.echo(f"Exported {sum(counts.values())} memories to {path}")
+
+@memory_cli.command('restore')
+@click.argument('path')
+@click.option('--replace', is_flag=True, help='Delete existing memories first.')
+@click.option('--batch-size', default=10000, show_default=True, help='Rows per COPY batch.')
+def restore(path, replace, batch_size):
+    """Bulk-load a snapshot directory and rebuild the vector indexes."""
+    from app.services.snapshots import import_snapshot
+
+    try:
+        counts = import_snapshot(path, replace=replace, batch_size=batch_size)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Restored {sum(counts.values())} memories from {path}")
+
+@jobs_cli.command('work')
+@click.option('--concurrency', type=int, default=None, help='Batches processed in parallel.')
+@click.option('--poll-interval', default=1.0, show_default=True, help='Seconds to sleep when idle.')
+@click.option('--kind', 'kinds', multiple=True, help='Only process these job kinds.')
+def work(concurrency, poll_interval, kinds):
+    """Run a worker that processes queued jobs until interrupted."""
+    from flask import current_app
+    from app.models import db
+    from app.services.job_queue import Worker
+    from app.services import conversation_summary, embedding_jobs  # noqa: F401 registers handlers
+    from app.services.partitions import schedule_partition_maintenance
+
+    app = current_app._get_current_object()
+    if db.engine.dialect.name == 'postgresql':
+        schedule_partition_maintenance()
+    worker = Worker(
+        app,
+        concurrency=concurrency or app.config['JOB_WORKER_CONCURRENCY'],
+        poll_interval=poll_interval,
+        kinds=list(kinds) or None
+    )
+    click.echo(f"Worker started with concurrency {worker.concurrency}")
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        worker.stop()
+
+@jobs_cli.command('stats')
+def stats():
+    """Print queue depth and latency."""
+    import json
+    from app.services.job_queue import JobQueue
+
+    click.echo(json.dumps(JobQueue.stats(), indent=2))
+
+@messages_cli.command('archive')
+@click.option('--older-than-days', default=90.0, show_default=True, help='Archive messages older than this.')
+@click.option('--batch-size', default=1000, show_default=True, help='Messages archived per transaction.')
+@click.option('--max-batches', type=int, default=None, help='Stop after this many batches.')
+def archive(older_than_days, batch_size, max_batches):
+    """Move old messages into the compressed archive table in batches."""
+    from app.services.retention import MessageArchiver
+
+    archiver = MessageArchiver(max_age_days=older_than_days, batch_size=batch_size)
+    archived = archiver.run(max_batches=max_batches)
+    click.echo(f"Archived {archived} messages, {archiver.pending_count()} pending")
+
+@messages_cli.command('embed')
+@click.option('--batch-size', default=1000, show_default=True, help='Messages queued per commit.')
+def embed(batch_size):
+    """Queue embedding jobs for messages stored before history recall was enabled."""
+    from app.services.embedding_jobs import backfill_message_embeddings
+
+    queued = backfill_message_embeddings(batch_size=batch_size)
+    click.echo(f"Queued {queued} messages for embedding")
+
+@messages_cli.command('partitions')
+@click.option('--months-ahead', default=3, show_default=True, help='Future months to create partitions for.')
+@click.option('--from', 'start', type=click.DateTime(formats=['%Y-%m']), default=None,
+              help='Also create partitions back to this month (YYYY-MM).')
+def partitions(months_ahead, start):
+    """Create missing monthly message partitions."""
+    from app.models import db
+    from app.services.partitions import ensure_partitions
+
+    with db.engine.begin() as conn:
+        created = ensure_partitions(conn, months_ahead=months_ahead, start=start)
+    click.echo(f"Created {len(created)} partitions" + (f": {', '.join(created)}" if created else ""))
+
+@messages_cli.command('detach-partitions')
+@click.option('--older-than-months', type=int, required=True, help='Detach partitions that ended this many months ago.')
+@click.option('--drop', is_flag=True, help='Drop the detached partitions.')
+def detach_partitions_command(older_than_months, drop):
+    """Detach whole months of old messages instead of deleting rows."""
+    from app.models import db
+    from app.services.partitions import detach_partitions
+
+    with db.engine.begin() as conn:
+        detached = detach_partitions(conn, older_than_months, drop=drop)
+    click.echo(f"{'Dropped' if drop else 'Detached'} {len(detached)} partitions" +
+               (f": {', '.join(detached)}" if detached else ""))
@@ -0,0 +1,33 @@
+"""
+Helpers for serving many concurrent chat turns per process.
+
+Production runs under gunicorn's gevent worker (see gunicorn.conf.py): each
+request is a green thread, and blocking socket I/O in `requests`, the
+OpenAI client and psycopg2 (through psycogreen, patched in the worker's
+`post_fork` hook) yields to other requests. Waiting on the model therefore
+costs a greenlet, not an OS thread.
+
+The scarce resource becomes database connections, so routes that wait on
+the model release theirs first with `released_session()`.
+"""
+from contextlib import contextmanager
+from app import db
+
+@contextmanager
+def released_session():
+    """
+    Commit and return the session's connection to the pool for a slow block.
+
+    Loaded objects are kept (not expired) so they can still be read without
+    a query; they may be stale once the block ends, so re-read anything the
+    caller needs current. The session is usable again after the block, and
+    the next query checks out a fresh connection.
+    """
+    session = db.session()
+    expire_on_commit = session.expire_on_commit
+    session.expire_on_commit = False
+    try:
+        session.commit()
+    finally:
+        session.expire_on_commit = expire_on_commit
+    yield
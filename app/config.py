@@ -6,15 +6,85 @@ class BaseConfig:
     """Base configuration."""
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Chat turns hold a connection only around short DB bursts (see app.concurrency),
+    # so a small pool serves many concurrent requests per process
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.getenv('DB_POOL_MAX_OVERFLOW', 10)),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+        'pool_pre_ping': True
+    }
+    # Optional read replica; GET requests and similarity searches read from it (see app.replica)
+    SQLALCHEMY_BINDS = {'replica': os.getenv('DATABASE_REPLICA_URL')} if os.getenv('DATABASE_REPLICA_URL') else {}
+    REPLICA_STICKY_SECONDS = float(os.getenv('REPLICA_STICKY_SECONDS', 5))  # Read-your-writes window after a write
+    REPLICA_MAX_LAG_SECONDS = float(os.getenv('REPLICA_MAX_LAG_SECONDS', 2))
+    REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('REPLICA_LAG_CHECK_INTERVAL', 1))
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+    OPENAI_API_BASE = os.getenv('OPENAI_API_BASE')  # e.g. a local mock server for load tests
     OPENAI_DEFAULT_MODEL = os.getenv('OPENAI_DEFAULT_MODEL', 'text-davinci-003')
     OPENAI_DEFAULT_TEMPERATURE = float(os.getenv('OPENAI_DEFAULT_TEMPERATURE', 0.7))
     OPENAI_DEFAULT_MAX_TOKENS = int(os.getenv('OPENAI_DEFAULT_MAX_TOKENS', 150))    
+    # Extra OpenAI-compatible providers as a JSON list (see app.services.llm_router)
+    LLM_PROVIDERS = os.getenv('LLM_PROVIDERS')
+    LLM_DEFAULT_PROVIDER = os.getenv('LLM_DEFAULT_PROVIDER', 'openai')  # For agents whose provider is not configured
+    LLM_BREAKER_FAILURES = int(os.getenv('LLM_BREAKER_FAILURES', 5))  # Consecutive failures before a provider is skipped
+    LLM_BREAKER_COOLDOWN = float(os.getenv('LLM_BREAKER_COOLDOWN', 30))  # Seconds before a skipped provider is probed
+    LLM_STATS_WINDOW = int(os.getenv('LLM_STATS_WINDOW', 200))  # Recent calls kept per provider and model
+    LLM_HEDGE_ENABLED = os.getenv('LLM_HEDGE_ENABLED', 'false').lower() == 'true'
+    LLM_HEDGE_QUANTILE = float(os.getenv('LLM_HEDGE_QUANTILE', 0.95))  # Latency after which a second provider is raced
+    LLM_HEDGE_MIN_SAMPLES = int(os.getenv('LLM_HEDGE_MIN_SAMPLES', 20))
+    OPENAI_SUMMARY_MODEL = os.getenv('OPENAI_SUMMARY_MODEL', os.getenv('OPENAI_DEFAULT_MODEL', 'text-davinci-003'))
+    OPENAI_SUMMARY_MAX_TOKENS = int(os.getenv('OPENAI_SUMMARY_MAX_TOKENS', 400))
+    CONVERSATION_SUMMARY_INTERVAL = int(os.getenv('CONVERSATION_SUMMARY_INTERVAL', 20))  # New messages per summary update
+    CONVERSATION_TAIL_MESSAGES = int(os.getenv('CONVERSATION_TAIL_MESSAGES', 10))  # Recent messages always sent verbatim
+    MESSAGE_PARTITIONS_AHEAD = int(os.getenv('MESSAGE_PARTITIONS_AHEAD', 3))  # Monthly message partitions kept ready
+    MESSAGE_PARTITIONS_INTERVAL = int(os.getenv('MESSAGE_PARTITIONS_INTERVAL', 86400))  # Seconds between partition maintenance jobs
+    MESSAGE_GROUP_COMMIT = os.getenv('MESSAGE_GROUP_COMMIT', 'false').lower() == 'true'  # Batch message inserts into shared commits
+    MESSAGE_GROUP_COMMIT_DELAY = float(os.getenv('MESSAGE_GROUP_COMMIT_DELAY', 0.005))  # Seconds a group waits for more rows
+    MESSAGE_GROUP_COMMIT_MAX_BATCH = int(os.getenv('MESSAGE_GROUP_COMMIT_MAX_BATCH', 256))
+    MESSAGE_GROUP_COMMIT_TIMEOUT = float(os.getenv('MESSAGE_GROUP_COMMIT_TIMEOUT', 5))  # Seconds a request waits before a 503
+    MEMORY_EMBEDDING_TYPE = os.getenv('MEMORY_EMBEDDING_TYPE', 'openai')
+    MEMORY_PROVIDER = os.getenv('MEMORY_PROVIDER', 'none')  # 'none', 'vector' or 'history' (past messages)
+    EMBEDDING_WORKERS = int(os.getenv('EMBEDDING_WORKERS', 0)) or None  # Processes for local embedding batches; default CPU count
+    EMBEDDING_PARALLEL_THRESHOLD = int(os.getenv('EMBEDDING_PARALLEL_THRESHOLD', 256))  # Batch size split across them
+    SNAPSHOT_MAINTENANCE_WORK_MEM = os.getenv('SNAPSHOT_MAINTENANCE_WORK_MEM', '1GB')  # For rebuilding vector indexes after a restore
+    MEMORY_SCORING = os.getenv('MEMORY_SCORING', 'similarity')  # 'similarity' or 'hybrid' (recency, importance, use)
+    MEMORY_ACCESS_FLUSH_INTERVAL = float(os.getenv('MEMORY_ACCESS_FLUSH_INTERVAL', 10))  # Seconds between access count writes
+    MEMORY_ACCESS_FLUSH_SIZE = int(os.getenv('MEMORY_ACCESS_FLUSH_SIZE', 500))  # Pending memories forcing an early write
+    FUNCTION_CONFIG_DIR = os.getenv('FUNCTION_CONFIG_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config', 'zapier'))
+    FUNCTION_RELOAD_INTERVAL = float(os.getenv('FUNCTION_RELOAD_INTERVAL', 5))  # Seconds between checks for changed definitions
+    FUNCTION_DISPATCH_MAX_WORKERS = int(os.getenv('FUNCTION_DISPATCH_MAX_WORKERS', 8))  # Concurrent webhook calls per process
+    FUNCTION_HTTP_POOL_SIZE = int(os.getenv('FUNCTION_HTTP_POOL_SIZE', 16))  # Keep-alive connections per webhook host
+    FUNCTION_DEFAULT_TIMEOUT = float(os.getenv('FUNCTION_DEFAULT_TIMEOUT', 10))
+    FUNCTION_RESULT_CACHE_TTL = float(os.getenv('FUNCTION_RESULT_CACHE_TTL', 300))  # Idempotent functions only
+    FUNCTION_RESULT_CACHE_SIZE = int(os.getenv('FUNCTION_RESULT_CACHE_SIZE', 1024))
+    FUNCTION_MAX_ROUNDS = int(os.getenv('FUNCTION_MAX_ROUNDS', 3))  # Completions per chat turn that may call functions
+    ZAPIER_WEBHOOK_SECRET = os.getenv('ZAPIER_WEBHOOK_SECRET')
+    JOB_VISIBILITY_TIMEOUT = int(os.getenv('JOB_VISIBILITY_TIMEOUT', 300))
+    JOB_RETRY_BACKOFF = float(os.getenv('JOB_RETRY_BACKOFF', 5))
+    JOB_WORKER_CONCURRENCY = int(os.getenv('JOB_WORKER_CONCURRENCY', 4))
+    ADMISSION_MAX_IN_FLIGHT = int(os.getenv('ADMISSION_MAX_IN_FLIGHT', 8))  # Per process
+    ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', 16))
+    ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 2.0))
+    ADMISSION_USER_RATE = float(os.getenv('ADMISSION_USER_RATE', 0.5))  # Chat turns per second per user; 0 disables
+    ADMISSION_USER_BURST = float(os.getenv('ADMISSION_USER_BURST', 5))
+    WARMUP_MODE = os.getenv('WARMUP_MODE', 'background')  # 'background', 'sync' (before serving) or 'off'
+    WARMUP_DB_CONNECTIONS = int(os.getenv('WARMUP_DB_CONNECTIONS', 5))  # Pooled connections opened per bind
+    WARMUP_AGENTS = int(os.getenv('WARMUP_AGENTS', 100))  # Agents whose function payloads are compiled
+    WARMUP_EMBEDDING = os.getenv('WARMUP_EMBEDDING', 'true').lower() == 'true'  # Embed a probe text (one API call)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    SERVER_TIMING_ENABLED = os.getenv('SERVER_TIMING_ENABLED', 'true').lower() == 'true'
+    QUERY_MONITOR_ENABLED = os.getenv('QUERY_MONITOR_ENABLED', 'true').lower() == 'true'
+    QUERY_N_PLUS_ONE_THRESHOLD = int(os.getenv('QUERY_N_PLUS_ONE_THRESHOLD', 5))
+    SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', 200))
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.getenv('SLOW_QUERY_EXPLAIN_SAMPLE_RATE', 0.1))
+    SLOW_QUERY_EXPLAIN_ANALYZE = os.getenv('SLOW_QUERY_EXPLAIN_ANALYZE', 'false').lower() == 'true'  # Re-runs sampled queries
 
 class TestConfig(BaseConfig):
     """Testing configuration - uses SQLite in-memory."""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    OPENAI_API_KEY = 'test-key'  # API clients need a key to be built; tests mock every call
 
 class DevTestConfig(BaseConfig):
     """Development Testing configuration - uses local PostgreSQL test database."""
@@ -61,6 +131,19 @@ config = {
 }
 
 
+class ConfigView:
+    """Attribute access to a Flask app's config mapping, for code written against config classes."""
+
+    def __init__(self, mapping):
+        self._mapping = mapping
+
+    def __getattr__(self, name):
+        # Read on each access so later app.config changes are seen
+        try:
+            return self._mapping[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
 def get_config():
     """Dynamically get the config class based on an environment variable."""
     config_name = os.getenv("FLASK_CONFIG", "default")  # Default to 'default' (development)
@@ -0,0 +1,102 @@
+"""
+Primary key generation and storage.
+
+New ids are time-ordered UUIDs (version 7): a 48-bit millisecond timestamp
+followed by random bits, so consecutive inserts land next to each other in
+primary key indexes instead of at random leaf pages. Ids are stored in a
+native 16-byte `uuid` column on PostgreSQL and as 36-character strings
+elsewhere; in Python they are always strings.
+"""
+import os
+import threading
+import time
+import uuid
+from sqlalchemy import String
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.types import TypeDecorator
+
+_lock = threading.Lock()
+_last_ms = 0
+_sequence = 0
+
+def uuid7() -> str:
+    """
+    Generate a UUIDv7 string.
+
+    Within one millisecond a 12-bit counter (seeded randomly) fills the
+    rand_a field, so ids generated by one process are strictly increasing.
+
+    Returns:
+        Canonical 36-character UUID string
+    """
+    global _last_ms, _sequence
+    with _lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _last_ms:
+            _last_ms = now_ms
+            _sequence = int.from_bytes(os.urandom(2), 'big') & 0x7ff
+        else:
+            _sequence += 1
+            if _sequence > 0xfff:
+                # Counter exhausted: borrow the next millisecond
+                _last_ms += 1
+                _sequence = 0
+        timestamp, sequence = _last_ms, _sequence
+    rand_b = int.from_bytes(os.urandom(8), 'big') & ((1 << 62) - 1)
+    value = (timestamp << 80) | (0x7 << 76) | (sequence << 64) | (0b10 << 62) | rand_b
+    return str(uuid.UUID(int=value))
+
+def uuid7_timestamp(value: str) -> float:
+    """Unix time in seconds encoded in a UUIDv7."""
+    return (uuid.UUID(value).int >> 80) / 1000
+
+def new_id() -> str:
+    """Default for primary key columns."""
+    return uuid7()
+
+def is_valid_id(value) -> bool:
+    """Whether a value can be stored in a UUID id column."""
+    try:
+        uuid.UUID(str(value))
+    except ValueError:
+        return False
+    return True
+
+class InvalidId(ValueError):
+    """Raised when a value that is not a UUID is bound to a native UUID column."""
+
+class UUIDType(TypeDecorator):
+    """UUID id column: native `uuid` on PostgreSQL, String(36) elsewhere; str in Python."""
+
+    impl = String(36)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(postgresql.UUID(as_uuid=False))
+        return dialect.type_descriptor(String(36))
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, uuid.UUID):
+            return str(value)
+        if dialect.name == 'postgresql' and not is_valid_id(value):
+            raise InvalidId(f"Invalid id: {value!r}")
+        return value
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else str(value)
+
+def init_app(app):
+    """Answer 404 for ids that cannot exist because they are not UUIDs."""
+    from flask import jsonify
+    from sqlalchemy.exc import StatementError
+    from app import db
+
+    @app.errorhandler(StatementError)
+    def _invalid_id(error):
+        if not isinstance(error.orig, InvalidId):
+            raise error
+        db.session.rollback()
+        return jsonify({"error": "Not found"}), 404
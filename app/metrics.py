@@ -0,0 +1,281 @@
+"""
+Request instrumentation: per-phase timings and Prometheus metrics.
+
+Code paths wrap their slow phases in `timed(phase)`. Durations are added to
+the current request's timings (emitted as a `Server-Timing` header) and
+observed into in-process histograms served at `/metrics`.
+
+SQL statements are timed once by the engine listeners here; the `db` phase
+and other consumers such as the query monitor subscribe through
+`observe_queries`.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Seconds; covers fast DB calls through slow LLM completions
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram:
+    """Cumulative-bucket histogram for one label set."""
+
+    __slots__ = ('buckets', 'counts', 'total', 'count', '_lock')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += value
+            self.count += 1
+
+class MetricsRegistry:
+    """Thread-safe store of histograms and counters keyed by name and labels."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.help = {}
+        self.collectors = []
+
+    def histogram(self, name, labels, help_text='', buckets=DEFAULT_BUCKETS):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(key, Histogram(buckets))
+                self.help.setdefault(name, help_text)
+        return histogram
+
+    def observe(self, name, value, help_text='', buckets=DEFAULT_BUCKETS, **labels):
+        self.histogram(name, labels, help_text, buckets).observe(value)
+
+    def inc(self, name, amount=1, help_text='', **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+            self.help.setdefault(name, help_text)
+
+    def register_collector(self, collector):
+        """Add a callable returning [(name, help, type, labels, value)] gauges computed at scrape time."""
+        self.collectors.append(collector)
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    @staticmethod
+    def _labels(pairs, extra=()):
+        pairs = tuple(pairs) + tuple(extra)
+        if not pairs:
+            return ''
+        escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in pairs)
+        return '{' + ','.join(escaped) + '}'
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        seen = set()
+        # Snapshot under the locks; requests keep adding series while this formats
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+            help_texts = dict(self.help)
+        snapshots = []
+        for key, histogram in histograms:
+            with histogram._lock:
+                snapshots.append((key, histogram.buckets, list(histogram.counts), histogram.total, histogram.count))
+
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                if help_texts.get(name):
+                    lines.append(f'# HELP {name} {help_texts[name]}')
+                lines.append(f'# TYPE {name} {kind}')
+
+        for (name, labels), value in counters:
+            header(name, 'counter')
+            lines.append(f'{name}{self._labels(labels)} {value}')
+
+        for (name, labels), buckets, counts, total, count in snapshots:
+            header(name, 'histogram')
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{self._labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_bucket{self._labels(labels, [("le", "+Inf")])} {count}')
+            lines.append(f'{name}_sum{self._labels(labels)} {total}')
+            lines.append(f'{name}_count{self._labels(labels)} {count}')
+
+        for collector in self.collectors:
+            for name, help_text, kind, labels, value in collector():
+                help_texts.setdefault(name, help_text)
+                header(name, kind)
+                lines.append(f'{name}{self._labels(sorted(labels.items()))} {value}')
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
+
+def _route():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+def record_phase(phase, seconds):
+    """Add a phase duration to the current request and the phase histogram."""
+    if has_request_context():
+        timings = g.setdefault('phase_timings', {})
+        timings[phase] = timings.get(phase, 0.0) + seconds
+        route = _route()
+    else:
+        route = 'background'
+    registry.observe(
+        'kairix_phase_duration_seconds', seconds,
+        'Time spent in each phase of request handling', route=route, phase=phase
+    )
+
+@contextmanager
+def timed(phase):
+    """Time a block as one phase of the current request."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(phase, time.perf_counter() - start)
+
+def timed_phase(phase):
+    """Decorator form of `timed`."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(phase):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record_token_usage(model, usage):
+    """Count OpenAI token usage from a response's usage block."""
+    if not isinstance(usage, dict):
+        return
+    for kind in ('prompt_tokens', 'completion_tokens'):
+        if usage.get(kind):
+            registry.inc(
+                'kairix_openai_tokens_total', usage[kind],
+                'OpenAI tokens used', model=model, type=kind.replace('_tokens', '')
+            )
+
+# Called as observer(conn, statement, parameters, seconds) after each SQL statement
+_query_observers = []
+
+def observe_queries(observer):
+    """
+    Call `observer(conn, statement, parameters, seconds)` after every SQL statement.
+
+    All observers share one start/stop measurement per statement.
+    """
+    if observer not in _query_observers:
+        _query_observers.append(observer)
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('query_start_time')
+    if not starts:
+        return
+    seconds = time.perf_counter() - starts.pop()
+    for observer in _query_observers:
+        observer(conn, statement, parameters, seconds)
+
+def _record_db_phase(conn, statement, parameters, seconds):
+    record_phase('db', seconds)
+
+def _handle_error(context):
+    # after_cursor_execute does not run for failed statements; drop their start time
+    if context.connection is None or context.execution_context is None:
+        return
+    starts = context.connection.info.get('query_start_time')
+    if starts:
+        starts.pop()
+
+def _pool_collector(db):
+    def collect():
+        gauges = []
+        for bind, engine in db.engines.items():
+            pool = engine.pool
+            labels = {'bind': bind or 'default'}
+            for name, attr, help_text in (
+                ('kairix_db_pool_size', 'size', 'Configured pool size'),
+                ('kairix_db_pool_checked_out', 'checkedout', 'Connections in use'),
+                ('kairix_db_pool_overflow', 'overflow', 'Overflow connections open'),
+                ('kairix_db_pool_checked_in', 'checkedin', 'Idle connections in the pool'),
+            ):
+                if hasattr(pool, attr):
+                    gauges.append((name, help_text, 'gauge', labels, getattr(pool, attr)()))
+        return gauges
+    return collect
+
+def _job_collector():
+    from app.services.job_queue import JobQueue
+    stats = JobQueue.stats(window=100)
+    gauges = [
+        ('kairix_job_oldest_ready_age_seconds', 'Age of the oldest ready job', 'gauge', {},
+         stats['oldest_ready_age_seconds']),
+        ('kairix_job_wait_seconds_avg', 'Average queue wait of recent jobs', 'gauge', {}, stats['avg_wait_seconds']),
+    ]
+    for kind, counts in stats['kinds'].items():
+        for status in ('queued', 'running', 'failed'):
+            gauges.append(('kairix_jobs', 'Jobs by kind and status', 'gauge',
+                           {'kind': kind, 'status': status}, counts[status]))
+    return gauges
+
+def init_app(app, db):
+    """Install request hooks, SQL timing and the /metrics endpoint."""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    if _record_db_phase not in _query_observers:
+        observe_queries(_record_db_phase)
+        registry.register_collector(_pool_collector(db))
+        registry.register_collector(_job_collector)
+
+    @app.before_request
+    def _start_timer():
+        g.request_start = time.perf_counter()
+        g.phase_timings = {}
+
+    @app.after_request
+    def _finish_timer(response):
+        start = g.get('request_start')
+        if start is None:
+            return response
+        total = time.perf_counter() - start
+        registry.observe(
+            'kairix_http_request_duration_seconds', total, 'HTTP request latency',
+            route=_route(), method=request.method, status=response.status_code
+        )
+        if app.config.get('SERVER_TIMING_ENABLED', True):
+            timings = g.get('phase_timings', {})
+            entries = [f'{phase};dur={seconds * 1000:.2f}' for phase, seconds in timings.items()]
+            entries.append(f'total;dur={total * 1000:.2f}')
+            response.headers['Server-Timing'] = ', '.join(entries)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
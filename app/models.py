@@ -1,10 +1,103 @@
 from datetime import datetime
-import uuid
+import hashlib
+import json
+import zlib
 import numpy as np
 from sqlalchemy.sql import text
-from sqlalchemy import Index
+from sqlalchemy import Index, and_, bindparam, cast, event, func, literal, or_, select, union_all, update
+from sqlalchemy.orm import validates
 from pgvector.sqlalchemy import Vector
 from . import db
+from .ids import UUIDType, new_id
+
+# Registry of supported embedding types. Each type stores vectors of a fixed
+# dimension and gets its own partial vector index, so several models can live
+# side by side in the memory table. 'backend' picks the implementation in
+# app/services/embedding_backends.py (default 'openai').
+DEFAULT_EMBEDDING_TYPE = 'openai'
+EMBEDDING_TYPES = {
+    'openai': {'model': 'text-embedding-ada-002', 'dimensions': 1536},
+    'openai-3-small': {'model': 'text-embedding-3-small', 'dimensions': 1536},
+    'openai-3-small-512': {'model': 'text-embedding-3-small', 'dimensions': 512},
+    'openai-3-large-256': {'model': 'text-embedding-3-large', 'dimensions': 256},
+    'local-hash-384': {'model': 'feature-hashing', 'dimensions': 384, 'backend': 'local'},
+}
+
+def get_embedding_dimensions(embedding_type):
+    """Return the vector dimension for an embedding type."""
+    try:
+        return EMBEDDING_TYPES[embedding_type]['dimensions']
+    except KeyError:
+        raise ValueError(f"Unknown embedding type: {embedding_type}")
+
+def truncate_embedding(vector, dimensions):
+    """
+    Shorten a Matryoshka-style embedding to its first `dimensions` components.
+    
+    Args:
+        vector (list or numpy.ndarray): The full embedding vector
+        dimensions (int): Target dimension
+        
+    Returns:
+        List of floats, re-normalized to unit length
+    """
+    truncated = np.asarray(vector, dtype=np.float32)[:dimensions]
+    norm = np.linalg.norm(truncated)
+    if norm > 0:
+        truncated = truncated / norm
+    return truncated.tolist()
+
+# Policies for handling incoming memories that duplicate an existing one
+DUPLICATE_POLICIES = ('skip', 'merge')
+DEFAULT_DUPLICATE_SIMILARITY = 0.97
+
+# Weights of the hybrid memory ranking (see Memory.find_ranked). Each term is
+# in [0, 1]; agents override them through settings["memory"]["ranking"].
+DEFAULT_RANKING_WEIGHTS = {
+    'similarity': 1.0,
+    'recency': 0.3,  # exp decay since the memory was last used or updated
+    'importance': 0.3,
+    'access': 0.1,  # log-scaled access count, 1 at access_saturation
+    'half_life_hours': 168.0,
+    'access_saturation': 50,
+}
+
+def ranking_weights(overrides=None):
+    """
+    Merge ranking weight overrides into DEFAULT_RANKING_WEIGHTS.
+    
+    Raises:
+        ValueError: For unknown keys, non-numeric values or a non-positive
+            half_life_hours or access_saturation
+    """
+    weights = dict(DEFAULT_RANKING_WEIGHTS)
+    for key, value in (overrides or {}).items():
+        if key not in weights:
+            raise ValueError(f"Unknown ranking weight: {key}")
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"Ranking weight {key} must be a number")
+        weights[key] = float(value)
+    if weights['half_life_hours'] <= 0 or weights['access_saturation'] <= 0:
+        raise ValueError("half_life_hours and access_saturation must be positive")
+    return weights
+
+def content_hash(content):
+    """SHA-256 of whitespace-normalized content, used for exact deduplication."""
+    normalized = ' '.join(content.split())
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+def _embedding_indexes(table='memory'):
+    """Build one partial cosine index per embedding type on a table's embedding column (PostgreSQL only)."""
+    return tuple(
+        Index(
+            f"ix_{table}_embedding_{name.replace('-', '_')}_cosine",
+            cast(text('embedding'), Vector(spec['dimensions'])).label('typed_embedding'),
+            postgresql_using='ivfflat',
+            postgresql_ops={'typed_embedding': 'vector_cosine_ops'},
+            postgresql_where=text(f"embedding_type = '{name}'"),
+        ).ddl_if(dialect='postgresql')
+        for name, spec in EMBEDDING_TYPES.items()
+    )
 
 # Enable pgvector extension
 def enable_vector_extension():
@@ -13,51 +106,423 @@ def enable_vector_extension():
     db.session.commit()
 
 class User(db.Model):
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(UUIDType, primary_key=True, default=new_id)
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    conversations = db.relationship('Conversation', backref='user', lazy=True)
+    conversations = db.relationship('Conversation', backref='user', lazy=True,
+                                    cascade='all, delete-orphan', passive_deletes=True)
 
 class Agent(db.Model):
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(UUIDType, primary_key=True, default=new_id)
     provider = db.Column(db.String(50), nullable=False)
     system_message = db.Column(db.Text)
     settings = db.Column(db.JSON)
-    conversations = db.relationship('Conversation', backref='agent', lazy=True)
+    conversations = db.relationship('Conversation', backref='agent', lazy=True,
+                                    cascade='all, delete-orphan', passive_deletes=True)
 
 class Conversation(db.Model):
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False)
-    agent_id = db.Column(db.String(36), db.ForeignKey('agent.id'), nullable=False)
+    id = db.Column(UUIDType, primary_key=True, default=new_id)
+    user_id = db.Column(UUIDType, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
+    agent_id = db.Column(UUIDType, db.ForeignKey('agent.id', ondelete='CASCADE'), nullable=False, index=True)
     started_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_active_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    messages = db.relationship('Message', backref='conversation', lazy=True)
+    message_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    summary = db.Column(db.Text, nullable=True)  # Rolling summary of messages up to the watermark
+    summarized_through_at = db.Column(db.DateTime, nullable=True)  # Watermark: created_at of the last summarized message
+    summarized_through_id = db.Column(UUIDType, nullable=True)  # Watermark tie-breaker: id of the last summarized message
+    summarized_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    messages = db.relationship('Message', backref='conversation', lazy=True,
+                               cascade='all, delete-orphan', passive_deletes=True)
+
+    def after_watermark(self):
+        """
+        Query for this conversation's messages newer than the summary watermark.
+        
+        Returns:
+            Query of Message objects not yet folded into the summary
+        """
+        # Messages are never older than their conversation; the bound lets
+        # PostgreSQL prune partitions from before the conversation started
+        query = Message.query.filter(Message.conversation_id == self.id)
+        lower_bound = self.summarized_through_at or self.started_at
+        if lower_bound is not None:
+            query = query.filter(Message.created_at >= lower_bound)
+        if self.summarized_through_at is not None:
+            query = query.filter(or_(
+                Message.created_at > self.summarized_through_at,
+                and_(Message.created_at == self.summarized_through_at, Message.id > self.summarized_through_id)
+            ))
+        return query
 
 class Message(db.Model):
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    conversation_id = db.Column(db.String(36), db.ForeignKey('conversation.id'), nullable=False)
+    # On PostgreSQL the table is range-partitioned by month on created_at, so
+    # created_at is part of the table's primary key; the ORM still identifies rows by id
+    id = db.Column(UUIDType, primary_key=True, default=new_id)
+    conversation_id = db.Column(UUIDType, db.ForeignKey('conversation.id', ondelete='CASCADE'), nullable=False)
     role = db.Column(db.String(20), nullable=False)
     content = db.Column(db.Text, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, primary_key=True, nullable=False, default=datetime.utcnow)
+    embedding_type = db.Column(db.String(50), nullable=True)  # Key into EMBEDDING_TYPES; set once embedded for recall
+    embedding = db.Column(Vector(), nullable=True)  # Dimension depends on embedding_type
+
+    __table_args__ = (
+        # Serves the timeline and the post-watermark tail of a conversation
+        Index('ix_message_conversation_created', 'conversation_id', 'created_at', 'id'),
+    ) + _embedding_indexes('message') + (
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
+    __mapper_args__ = {'primary_key': [id]}
+
+    @classmethod
+    def find_similar_in_history(cls, query_vector, user_id, limit=5, embedding_type=DEFAULT_EMBEDDING_TYPE,
+                                exclude_conversation_id=None, min_similarity=0.7):
+        """
+        Find a user's past messages most similar to a query vector.
+        
+        Args:
+            query_vector (list): The query embedding vector
+            user_id (str): Only search messages from this user's conversations
+            limit (int): Maximum number of results to return
+            embedding_type (str): Only messages embedded with this type are searched
+            exclude_conversation_id (str): Conversation to leave out, e.g. the current one
+            min_similarity (float): Minimum cosine similarity threshold
+            
+        Returns:
+            List of Message objects ordered by similarity
+        """
+        Memory._validate_vector(query_vector, embedding_type, label="Query vector")
+        query = cls.query.join(Conversation, Conversation.id == cls.conversation_id).filter(
+            Conversation.user_id == user_id,
+            cls.embedding_type == embedding_type
+        )
+        if exclude_conversation_id is not None:
+            query = query.filter(cls.conversation_id != exclude_conversation_id)
+        
+        # For testing (SQLite), rank in memory without a threshold
+        if str(db.engine.url).startswith('sqlite'):
+            candidates = [m for m in query.all() if m.embedding is not None]
+            if not candidates:
+                return []
+            vector = np.asarray(query_vector, dtype=np.float32)
+            matrix = np.asarray([m.embedding for m in candidates], dtype=np.float32)
+            scores = matrix @ vector / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(vector) + 1e-12)
+            return [candidates[i] for i in np.argsort(-scores, kind='stable')[:limit]]
+        
+        # For PostgreSQL, an exact search over the user's embedded messages. The
+        # shared ivfflat index would rank every user's messages and filter by
+        # user afterwards, losing most of this user's neighbours; MATERIALIZED
+        # keeps the planner from folding the CTE back into an index scan
+        distance = cast(cls.embedding, Vector(get_embedding_dimensions(embedding_type))).cosine_distance(query_vector)
+        history = query.filter(cls.embedding.isnot(None)).with_entities(
+            cls.id.label('id'), cls.created_at.label('created_at'), distance.label('distance')
+        ).cte('history').prefix_with('MATERIALIZED')
+        return cls.query.join(
+            history, and_(history.c.id == cls.id, history.c.created_at == cls.created_at)
+        ).filter(
+            history.c.distance <= (1 - min_similarity)
+        ).order_by(history.c.distance).limit(limit).all()
+
+@event.listens_for(Message.__table__, 'after_create')
+def _create_message_partitions(target, connection, **kw):
+    from app.services.partitions import ensure_partitions
+    ensure_partitions(connection)
+
+class MessageArchive(db.Model):
+    """A compressed chunk of archived messages from one conversation."""
+    
+    id = db.Column(UUIDType, primary_key=True, default=new_id)
+    conversation_id = db.Column(UUIDType, db.ForeignKey('conversation.id', ondelete='CASCADE'), nullable=False, index=True)
+    first_created_at = db.Column(db.DateTime, nullable=False)
+    last_created_at = db.Column(db.DateTime, nullable=False)
+    message_count = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.LargeBinary, nullable=False)  # zlib-compressed JSON list of messages
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @classmethod
+    def pack(cls, conversation_id, messages):
+        """
+        Build an archive chunk from messages of one conversation.
+        
+        Args:
+            conversation_id (str): Conversation the messages belong to
+            messages (list): Message objects, oldest first
+            
+        Returns:
+            Unsaved MessageArchive
+        """
+        rows = [
+            {"id": m.id, "role": m.role, "content": m.content, "created_at": m.created_at.isoformat()}
+            for m in messages
+        ]
+        return cls(
+            conversation_id=conversation_id,
+            first_created_at=messages[0].created_at,
+            last_created_at=messages[-1].created_at,
+            message_count=len(messages),
+            payload=zlib.compress(json.dumps(rows, separators=(',', ':')).encode('utf-8'), 9)
+        )
+    
+    def messages(self):
+        """
+        Decompress the archived messages.
+        
+        Returns:
+            List of message dictionaries with id, role, content and created_at
+        """
+        return json.loads(zlib.decompress(self.payload).decode('utf-8'))
 
 class Memory(db.Model):
     """Model for storing text content with vector embeddings for similarity search."""
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(UUIDType, primary_key=True, default=new_id)
+    user_id = db.Column(UUIDType, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=True)  # Owning user; NULL for global memories
+    agent_id = db.Column(UUIDType, db.ForeignKey('agent.id', ondelete='CASCADE'), nullable=True)  # Owning agent; NULL for all of the user's agents
     content = db.Column(db.Text, nullable=False)
     storage_type = db.Column(db.String(50), nullable=False, default='postgres')  # For future storage backends
-    embedding_type = db.Column(db.String(50), nullable=False, default='openai')  # For future embedding models
-    embedding = db.Column(Vector(1536), nullable=True)  # 1536 dimensions for OpenAI ada-002
+    embedding_type = db.Column(db.String(50), nullable=False, default=DEFAULT_EMBEDDING_TYPE)  # Key into EMBEDDING_TYPES
+    embedding = db.Column(Vector(), nullable=True)  # Dimension depends on embedding_type
+    content_hash = db.Column(db.String(64), nullable=True)  # Maintained from content, see content_hash()
+    reembedded_from_id = db.Column(UUIDType, db.ForeignKey('memory.id', ondelete='SET NULL'), nullable=True, index=True)  # Set while migrating between embedding types
+    importance = db.Column(db.Float, nullable=False, default=0.5, server_default='0.5')  # 0-1, used by hybrid ranking
+    access_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Times recalled; flushed in batches
+    last_accessed_at = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     __table_args__ = (
-        Index('ix_memory_embedding_cosine', 'embedding', postgresql_using='ivfflat'),
-    )
+        Index('ix_memory_embedding_type_id', 'embedding_type', 'id'),
+        # Selective prefilter for tenant-scoped searches; large tenants also get
+        # their own partial vector index (see app/services/tenant_indexes.py)
+        Index('ix_memory_owner', 'user_id', 'embedding_type', 'agent_id'),
+        # One copy of a text per owner and embedding type. NULLS NOT DISTINCT makes
+        # global (NULL-owner) memories collide too and needs PostgreSQL 15+; rows
+        # without a hash are left out until backfilled
+        Index(
+            'uq_memory_content_hash', 'content_hash', 'embedding_type', 'user_id', 'agent_id',
+            unique=True, postgresql_nulls_not_distinct=True,
+            postgresql_where=text('content_hash IS NOT NULL')
+        ),
+    ) + _embedding_indexes()
+
+    @validates('content')
+    def _update_content_hash(self, key, value):
+        self.content_hash = content_hash(value) if value is not None else None
+        return value
+
+    @staticmethod
+    def _validate_vector(vector, embedding_type, label="Embedding"):
+        """Check a vector against the dimension of its embedding type."""
+        dimensions = get_embedding_dimensions(embedding_type)
+        if not isinstance(vector, (list, np.ndarray)) or len(vector) != dimensions:
+            raise ValueError(
+                f"{label} must be a {dimensions}-dimensional vector for embedding type '{embedding_type}'"
+            )
+
+    @classmethod
+    def scoped(cls, embedding_type=DEFAULT_EMBEDDING_TYPE, user_id=None, agent_id=None):
+        """
+        Query for memories of one embedding type visible to a tenant.
+        
+        Args:
+            embedding_type (str): Embedding type to search
+            user_id (str): Search this user's memories and the global (unowned) ones;
+                None searches only global memories
+            agent_id (str): Additionally restrict to this agent's memories and the
+                memories that are not tied to any agent
+            
+        Returns:
+            Query filtered on the type and owner columns; vector searches on
+            PostgreSQL go through `nearest` instead, which splits the owners
+            so each can use its own index
+        """
+        query = cls.query.filter(cls.embedding_type == embedding_type)
+        if user_id is not None:
+            query = query.filter(db.or_(cls.user_id == user_id, cls.user_id.is_(None)))
+        else:
+            query = query.filter(cls.user_id.is_(None))
+        if agent_id is not None:
+            query = query.filter(db.or_(cls.agent_id == agent_id, cls.agent_id.is_(None)))
+        return query
+
+    @classmethod
+    def nearest(cls, distance, k, embedding_type=DEFAULT_EMBEDDING_TYPE, user_id=None, agent_id=None):
+        """
+        Subquery of the k nearest memories visible to a tenant, as (id, distance) rows.
+        
+        A user's own memories and the global ones are searched in separate
+        nearest-neighbor branches, merged and cut to k afterwards. Each branch
+        matches its owner's partial vector index (see
+        app/services/tenant_indexes.py); a single search over
+        `user_id = X OR user_id IS NULL` could only use the type-wide index and
+        drop other tenants' rows after the scan, losing recall.
+        
+        Args:
+            distance: Distance expression to order by
+            k (int): Rows to return
+            embedding_type (str): Embedding type to search
+            user_id (str): Search this user's and global memories (only global ones if None)
+            agent_id (str): Additionally restrict to this agent's memories and those of no agent
+        """
+        owners = [cls.user_id.is_(None)] if user_id is None else [cls.user_id == user_id, cls.user_id.is_(None)]
+        branches = []
+        for owner in owners:
+            branch = select(cls.id.label('id'), distance.label('distance')).where(
+                cls.embedding_type == embedding_type, owner
+            )
+            if agent_id is not None:
+                branch = branch.where(or_(cls.agent_id == agent_id, cls.agent_id.is_(None)))
+            branches.append(select(branch.order_by(distance).limit(k).subquery()))
+        merged = (union_all(*branches) if len(branches) > 1 else branches[0]).subquery()
+        return select(merged).order_by(merged.c.distance).limit(k).subquery('nearest')
+
+    @classmethod
+    def owned_by(cls, embedding_type=DEFAULT_EMBEDDING_TYPE, user_id=None, agent_id=None):
+        """Query for memories with exactly this embedding type and owner (NULLs included)."""
+        return cls.query.filter(
+            cls.embedding_type == embedding_type,
+            cls.user_id == user_id if user_id is not None else cls.user_id.is_(None),
+            cls.agent_id == agent_id if agent_id is not None else cls.agent_id.is_(None)
+        )
+
+    @classmethod
+    def nearest_neighbors(cls, vectors, embedding_type=DEFAULT_EMBEDDING_TYPE, user_id=None, agent_id=None,
+                          exclude_ids=None):
+        """
+        Find the single nearest memory of the same owner for each vector in one query.
+        
+        Args:
+            vectors (list): Embedding vectors to look up
+            embedding_type (str): Embedding type of the vectors
+            user_id (str): Owner the neighbors must share
+            agent_id (str): Agent the neighbors must share
+            exclude_ids (list): Per-vector memory id to ignore (e.g. the vector's own row)
+            
+        Returns:
+            List parallel to vectors of (memory_id, cosine_distance) tuples, or None
+            where the owner has no other memories
+        """
+        if not vectors:
+            return []
+        exclude_ids = exclude_ids or [None] * len(vectors)
+        
+        if str(db.engine.url).startswith('sqlite'):
+            candidates = [m for m in cls.owned_by(embedding_type, user_id, agent_id).all() if m.embedding is not None]
+            results = []
+            if not candidates:
+                return [None] * len(vectors)
+            matrix = np.asarray([m.embedding for m in candidates], dtype=np.float32)
+            matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+            queries = np.asarray(vectors, dtype=np.float32)
+            queries /= np.linalg.norm(queries, axis=1, keepdims=True) + 1e-12
+            distances = 1.0 - queries @ matrix.T
+            for row, excluded in zip(distances, exclude_ids):
+                for i in np.argsort(row, kind='stable'):
+                    if candidates[i].id != excluded:
+                        results.append((candidates[i].id, float(row[i])))
+                        break
+                else:
+                    results.append(None)
+            return results
+        
+        # For PostgreSQL, one LATERAL top-1 probe per vector against the type's
+        # partial index, all in a single round trip
+        dimensions = get_embedding_dimensions(embedding_type)
+        owner_sql = ' AND '.join([
+            'm.user_id = :user_id' if user_id is not None else 'm.user_id IS NULL',
+            'm.agent_id = :agent_id' if agent_id is not None else 'm.agent_id IS NULL'
+        ])
+        rows_sql = ', '.join(
+            f'(:ord{i}, CAST(:vec{i} AS vector({dimensions})), CAST(:excl{i} AS uuid))' for i in range(len(vectors))
+        )
+        statement = text(f"""
+            SELECT q.ord, n.id, n.distance
+            FROM (VALUES {rows_sql}) AS q(ord, vec, excluded_id)
+            CROSS JOIN LATERAL (
+                SELECT m.id, CAST(m.embedding AS vector({dimensions})) <=> q.vec AS distance
+                FROM memory m
+                WHERE m.embedding_type = :embedding_type AND {owner_sql}
+                  AND m.id IS DISTINCT FROM q.excluded_id
+                ORDER BY CAST(m.embedding AS vector({dimensions})) <=> q.vec
+                LIMIT 1
+            ) n
+        """)
+        params = {'embedding_type': embedding_type, 'user_id': user_id, 'agent_id': agent_id}
+        for i, (vector, excluded) in enumerate(zip(vectors, exclude_ids)):
+            statement = statement.bindparams(bindparam(f'vec{i}', type_=Vector(dimensions)))
+            params.update({f'ord{i}': i, f'vec{i}': vector, f'excl{i}': excluded})
+        results = [None] * len(vectors)
+        for ord_, memory_id, distance in db.session.execute(statement, params):
+            results[ord_] = (memory_id, float(distance))
+        return results
 
     @classmethod
-    def find_similar(cls, query_vector, limit=5, min_similarity=0.7):
+    def find_duplicates(cls, contents, vectors, embedding_type=DEFAULT_EMBEDDING_TYPE, user_id=None, agent_id=None,
+                        similarity_threshold=DEFAULT_DUPLICATE_SIMILARITY):
+        """
+        Match a batch of incoming memories against stored ones and each other.
+        
+        Exact duplicates are found through the content hash index, the rest
+        through a batched nearest-neighbor probe and a pairwise comparison
+        within the batch.
+        
+        Args:
+            contents (list): Incoming text contents
+            vectors (list): Incoming embedding vectors
+            embedding_type (str): Embedding type of the vectors
+            user_id (str): Owner of the incoming memories
+            agent_id (str): Agent of the incoming memories
+            similarity_threshold (float): Cosine similarity at which two memories count as duplicates
+            
+        Returns:
+            List parallel to contents; each entry is None (new), an existing Memory,
+            or the int index of an earlier item in the batch it duplicates
+        """
+        hashes = [content_hash(content) for content in contents]
+        existing_by_hash = {
+            memory.content_hash: memory
+            for memory in cls.owned_by(embedding_type, user_id, agent_id).filter(
+                cls.content_hash.in_(set(hashes))
+            )
+        }
+        
+        matches = [existing_by_hash.get(h) for h in hashes]
+        pending = [i for i, match in enumerate(matches) if match is None]
+        max_distance = 1 - similarity_threshold
+        
+        # Near duplicates of stored memories
+        neighbors = cls.nearest_neighbors(
+            [vectors[i] for i in pending], embedding_type, user_id=user_id, agent_id=agent_id
+        )
+        near_ids = {i: n[0] for i, n in zip(pending, neighbors) if n is not None and n[1] <= max_distance}
+        if near_ids:
+            by_id = {m.id: m for m in cls.query.filter(cls.id.in_(set(near_ids.values())))}
+            for i, memory_id in near_ids.items():
+                matches[i] = by_id.get(memory_id)
+        
+        # Exact and near duplicates within the batch itself
+        pending = [i for i, match in enumerate(matches) if match is None]
+        if len(pending) > 1:
+            matrix = np.asarray([vectors[i] for i in pending], dtype=np.float32)
+            matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+            similarity = matrix @ matrix.T
+            first_by_hash = {}
+            kept = []
+            for row, i in enumerate(pending):
+                if hashes[i] in first_by_hash:
+                    matches[i] = first_by_hash[hashes[i]]
+                    continue
+                near = [pending[k] for k in kept if similarity[row, k] >= similarity_threshold]
+                if near:
+                    matches[i] = near[0]
+                    continue
+                first_by_hash[hashes[i]] = i
+                kept.append(row)
+        return matches
+
+    @classmethod
+    def find_similar(cls, query_vector, limit=5, min_similarity=0.7, embedding_type=DEFAULT_EMBEDDING_TYPE,
+                     user_id=None, agent_id=None):
         """
         Find similar memories using cosine similarity.
         
@@ -65,61 +530,231 @@ class Memory(db.Model):
             query_vector (list): The query embedding vector
             limit (int): Maximum number of results to return
             min_similarity (float): Minimum cosine similarity threshold
+            embedding_type (str): Only memories embedded with this type are searched
+            user_id (str): Search this user's and global memories (only global ones if None)
+            agent_id (str): Only search memories of this agent (or of no agent)
             
         Returns:
             List of Memory objects ordered by similarity
         """
-        if not isinstance(query_vector, (list, np.ndarray)) or len(query_vector) != 1536:
-            raise ValueError("Query vector must be a 1536-dimensional vector")
+        cls._validate_vector(query_vector, embedding_type, label="Query vector")
             
         # Convert to numpy array if needed
         if isinstance(query_vector, list):
             query_vector = np.array(query_vector)
             
-        # For testing (SQLite), just return all memories up to limit
+        query = cls.scoped(embedding_type, user_id=user_id, agent_id=agent_id)
+            
+        # For testing (SQLite), rank the matching type in memory without a threshold
         if str(db.engine.url).startswith('sqlite'):
-            return cls.query.limit(limit).all()
+            candidates = [m for m in query.all() if m.embedding is not None]
+            if not candidates:
+                return []
+            matrix = np.asarray([m.embedding for m in candidates], dtype=np.float32)
+            scores = matrix @ query_vector / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_vector) + 1e-12)
+            return [candidates[i] for i in np.argsort(-scores, kind='stable')[:limit]]
             
-        # For PostgreSQL, use cosine similarity search
-        return cls.query.filter(
-            cls.embedding.cosine_distance(query_vector) <= (1 - min_similarity)
-        ).order_by(
-            cls.embedding.cosine_distance(query_vector)
-        ).limit(limit).all()
+        # For PostgreSQL, cast to the type's dimension and filter on the type and
+        # owner so the planner picks the owner's or the type's partial index
+        distance = cast(cls.embedding, Vector(get_embedding_dimensions(embedding_type))).cosine_distance(query_vector)
+        nearest = cls.nearest(distance, limit, embedding_type, user_id=user_id, agent_id=agent_id)
+        return cls.query.join(nearest, nearest.c.id == cls.id).filter(
+            nearest.c.distance <= (1 - min_similarity)
+        ).order_by(nearest.c.distance).limit(limit).all()
     
     @classmethod
-    def batch_create(cls, contents, vectors):
+    def find_ranked(cls, query_vector, limit=5, fetch_k=50, weights=None, min_similarity=0.0,
+                    embedding_type=DEFAULT_EMBEDDING_TYPE, user_id=None, agent_id=None, now=None):
         """
-        Create multiple memories in batch.
+        Find memories ranked by a blend of similarity, recency, importance and use.
+        
+        The fetch_k nearest memories are taken from the vector index first;
+        only those are scored, so ranking costs no more than the ANN probe.
+        score = similarity * w_similarity
+              + 0.5 ** (hours since last access or update / half_life_hours) * w_recency
+              + importance * w_importance
+              + min(1, ln(1 + access_count) / ln(1 + access_saturation)) * w_access
+        
+        Args:
+            query_vector (list): The query embedding vector
+            limit (int): Maximum number of results to return
+            fetch_k (int): Nearest candidates scored
+            weights (dict): Overrides of DEFAULT_RANKING_WEIGHTS
+            min_similarity (float): Candidates below this cosine similarity are dropped
+            embedding_type (str): Only memories embedded with this type are searched
+            user_id (str): Search this user's and global memories (only global ones if None)
+            agent_id (str): Only search memories of this agent (or of no agent)
+            now (datetime): Reference time for recency (defaults to utcnow)
+            
+        Returns:
+            List of (Memory, score) tuples ordered by score
+        """
+        cls._validate_vector(query_vector, embedding_type, label="Query vector")
+        weights = ranking_weights(weights)
+        now = now or datetime.utcnow()
+        fetch_k = max(fetch_k, limit)
+        query = cls.scoped(embedding_type, user_id=user_id, agent_id=agent_id)
+        
+        if str(db.engine.url).startswith('sqlite'):
+            candidates = [m for m in query.all() if m.embedding is not None]
+            if not candidates:
+                return []
+            matrix = np.asarray([m.embedding for m in candidates], dtype=np.float64)
+            vector = np.asarray(query_vector, dtype=np.float64)
+            similarity = matrix @ vector / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(vector) + 1e-12)
+            nearest = [i for i in np.argsort(-similarity, kind='stable')[:fetch_k] if similarity[i] >= min_similarity]
+            scored = []
+            for i in nearest:
+                memory = candidates[i]
+                touched = [t for t in (memory.updated_at or memory.created_at, memory.last_accessed_at) if t is not None]
+                hours = max((now - max(touched)).total_seconds(), 0.0) / 3600 if touched else 0.0
+                access = min(1.0, np.log1p(memory.access_count or 0) / np.log1p(weights['access_saturation']))
+                score = (weights['similarity'] * similarity[i]
+                         + weights['recency'] * 0.5 ** (hours / weights['half_life_hours'])
+                         + weights['importance'] * (memory.importance if memory.importance is not None else 0.5)
+                         + weights['access'] * access)
+                scored.append((memory, float(score)))
+            scored.sort(key=lambda item: -item[1])
+            return scored[:limit]
+        
+        # For PostgreSQL, the candidates come from per-owner nearest-neighbor
+        # queries that use the partial indexes; scoring happens on their fetch_k rows
+        distance = cast(cls.embedding, Vector(get_embedding_dimensions(embedding_type))).cosine_distance(query_vector)
+        candidates = cls.nearest(distance, fetch_k, embedding_type, user_id=user_id, agent_id=agent_id)
+        touched = func.greatest(func.coalesce(cls.updated_at, cls.created_at), cls.last_accessed_at)
+        hours = func.greatest(func.extract('epoch', literal(now, db.DateTime) - touched), 0) / 3600.0
+        score = (
+            weights['similarity'] * (1 - candidates.c.distance)
+            + weights['recency'] * func.power(0.5, hours / weights['half_life_hours'])
+            + weights['importance'] * cls.importance
+            + weights['access'] * func.least(
+                1.0, func.ln(1 + cls.access_count) / float(np.log1p(weights['access_saturation']))
+            )
+        ).label('score')
+        rows = db.session.query(cls, score).join(candidates, candidates.c.id == cls.id) \
+            .filter(candidates.c.distance <= 1 - min_similarity) \
+            .order_by(score.desc()).limit(limit).all()
+        return [(memory, float(value)) for memory, value in rows]
+    
+    @classmethod
+    def record_accesses(cls, counts, accessed_at=None):
+        """
+        Add to the access counts of many memories in one executemany UPDATE.
+        
+        Args:
+            counts (dict): Memory id -> number of accesses to add
+            accessed_at (datetime): Stored as last_accessed_at (defaults to utcnow)
+            
+        Returns:
+            Number of memories updated
+        """
+        if not counts:
+            return 0
+        accessed_at = accessed_at or datetime.utcnow()
+        statement = update(cls.__table__).where(cls.__table__.c.id == bindparam('memory_id')).values(
+            access_count=cls.__table__.c.access_count + bindparam('accesses'),
+            last_accessed_at=bindparam('accessed_at')
+        )
+        # Sorted ids take row locks in a consistent order across concurrent flushes
+        db.session.execute(statement, [
+            {'memory_id': memory_id, 'accesses': n, 'accessed_at': accessed_at}
+            for memory_id, n in sorted(counts.items())
+        ])
+        return len(counts)
+    
+    @classmethod
+    def batch_create(cls, contents, vectors, embedding_type=DEFAULT_EMBEDDING_TYPE, user_id=None, agent_id=None,
+                     on_duplicate='skip', similarity_threshold=DEFAULT_DUPLICATE_SIMILARITY):
+        """
+        Create multiple memories in batch, suppressing duplicates.
         
         Args:
             contents (list): List of text contents
             vectors (list): List of embedding vectors
+            embedding_type (str): Embedding type the vectors were produced with
+            user_id (str): Owning user, if any
+            agent_id (str): Owning agent, if any
+            on_duplicate (str): 'skip' keeps the stored memory unchanged, 'merge'
+                overwrites it with the incoming content and embedding
+            similarity_threshold (float): Cosine similarity at which two memories count as duplicates
+            
+        Returns:
+            List parallel to contents of the memory each item was stored as
         """
         if len(contents) != len(vectors):
             raise ValueError("Number of contents must match number of vectors")
+        if on_duplicate not in DUPLICATE_POLICIES:
+            raise ValueError(f"on_duplicate must be one of {DUPLICATE_POLICIES}")
+        for vector in vectors:
+            cls._validate_vector(vector, embedding_type)
+            
+        matches = cls.find_duplicates(
+            contents, vectors, embedding_type,
+            user_id=user_id, agent_id=agent_id, similarity_threshold=similarity_threshold
+        )
             
         memories = []
-        for content, vector in zip(contents, vectors):
-            memory = cls(
-                content=content,
-                embedding=vector
-            )
+        for content, vector, match in zip(contents, vectors, matches):
+            if isinstance(match, int):
+                memory = memories[match]
+                if on_duplicate == 'merge':
+                    memory.content = content
+                    memory.embedding = vector
+            elif match is not None:
+                memory = match
+                if on_duplicate == 'merge':
+                    memory.content = content
+                    memory.update_embedding(vector)
+            else:
+                memory = cls(
+                    content=content,
+                    user_id=user_id,
+                    agent_id=agent_id,
+                    embedding_type=embedding_type,
+                    embedding=vector
+                )
+                db.session.add(memory)
             memories.append(memory)
             
-        db.session.add_all(memories)
         db.session.commit()
         return memories
     
-    def update_embedding(self, vector):
+    def update_embedding(self, vector, embedding_type=None):
         """
         Update the embedding vector for this memory.
         
         Args:
             vector (list or numpy.ndarray): The new embedding vector
+            embedding_type (str): Optionally switch the memory to another embedding type
         """
-        if not isinstance(vector, (list, np.ndarray)) or len(vector) != 1536:
-            raise ValueError("Embedding must be a 1536-dimensional vector")
+        embedding_type = embedding_type or self.embedding_type or DEFAULT_EMBEDDING_TYPE
+        self._validate_vector(vector, embedding_type)
             
         self.embedding = vector if isinstance(vector, list) else vector.tolist()
+        self.embedding_type = embedding_type
         self.updated_at = datetime.utcnow()
+
+
+class Job(db.Model):
+    """Deferred unit of work, claimed by workers with SELECT ... FOR UPDATE SKIP LOCKED."""
+    
+    id = db.Column(UUIDType, primary_key=True, default=new_id)
+    kind = db.Column(db.String(100), nullable=False)  # Name of the registered handler
+    payload = db.Column(db.JSON, nullable=False, default=dict)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Not claimable before this time
+    locked_until = db.Column(db.DateTime, nullable=True)  # Visibility timeout of a running job
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # Claim scans only look at unfinished jobs
+        Index(
+            'ix_job_claim', 'kind', 'status', 'run_after',
+            postgresql_where=text("status IN ('queued', 'running')")
+        ),
+    )
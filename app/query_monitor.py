@@ -0,0 +1,149 @@
+"""
+SQL query accounting for each request.
+
+Counts queries and DB time per request, flags statement shapes repeated
+often enough to look like N+1 loading, and for a sample of slow SELECTs
+logs the `EXPLAIN` plan so index usage can be checked. With
+SLOW_QUERY_EXPLAIN_ANALYZE the sampled query is re-run under
+`EXPLAIN (ANALYZE, BUFFERS)` for actual timings; that doubles its cost, so it
+is off by default.
+"""
+import logging
+import random
+import re
+from collections import deque
+from flask import current_app, g, has_app_context, has_request_context, request
+from app.metrics import observe_queries, registry
+
+logger = logging.getLogger(__name__)
+explain_logger = logging.getLogger(__name__ + '.explain')
+
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# Most recent sampled plans, newest last
+recent_plans = deque(maxlen=50)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\((?:\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*,)+\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*\)")
+_PLACEHOLDER = re.compile(r"\?|%\(\w+\)s|%s|:\w+")
+_WHITESPACE = re.compile(r"\s+")
+
+def statement_shape(statement):
+    """
+    Normalize a SQL statement so calls differing only in parameters compare equal.
+
+    Args:
+        statement: SQL text as sent to the driver
+
+    Returns:
+        Statement with literals, placeholders and IN-lists collapsed to `?`
+    """
+    shape = _STRING_LITERAL.sub('?', statement)
+    shape = _NUMBER.sub('?', shape)
+    shape = _PLACEHOLDER_LIST.sub('(?)', shape)
+    shape = _PLACEHOLDER.sub('?', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+def _is_select(statement):
+    head = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ''
+    return head in ('SELECT', 'WITH') and not re.search(r"\b(INSERT|UPDATE|DELETE)\b", statement, re.IGNORECASE)
+
+def capture_plan(conn, statement, parameters, duration, analyze=False):
+    """
+    Log the EXPLAIN plan of a slow SELECT.
+
+    Runs on the raw DBAPI connection so it does not re-enter these event
+    listeners. Inside a transaction it runs in a savepoint that is always
+    rolled back, so a failed EXPLAIN cannot abort the caller's transaction
+    and nothing the re-run query does is kept.
+
+    Args:
+        analyze: Execute the query with EXPLAIN (ANALYZE, BUFFERS) for actual timings
+
+    Returns:
+        The plan record, or None when it could not be captured
+    """
+    if conn.dialect.name != 'postgresql' or not _is_select(statement):
+        return None
+    explain = 'EXPLAIN (ANALYZE, BUFFERS) ' if analyze else 'EXPLAIN '
+    nested = conn.in_transaction()
+    cursor = conn.connection.cursor()
+    try:
+        if nested:
+            cursor.execute('SAVEPOINT query_monitor_explain')
+        try:
+            cursor.execute(explain + statement, parameters)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        finally:
+            if nested:
+                cursor.execute('ROLLBACK TO SAVEPOINT query_monitor_explain')
+                cursor.execute('RELEASE SAVEPOINT query_monitor_explain')
+    except Exception:
+        logger.exception("EXPLAIN failed for slow query")
+        return None
+    finally:
+        cursor.close()
+    record = {
+        'route': request.url_rule.rule if has_request_context() and request.url_rule else None,
+        'duration_ms': round(duration * 1000, 2),
+        'statement': statement,
+        'uses_index': 'Index Scan' in plan or 'Index Only Scan' in plan,
+        'plan': plan
+    }
+    recent_plans.append(record)
+    explain_logger.info("Slow query (%.1f ms, index=%s):\n%s\n%s",
+                        record['duration_ms'], record['uses_index'], statement, plan)
+    return record
+
+def _observe_query(conn, statement, parameters, duration):
+    if not has_app_context():
+        return
+    config = current_app.config
+    if not config.get('QUERY_MONITOR_ENABLED', True):
+        return
+
+    if has_request_context():
+        stats = g.get('query_stats')
+        if stats is not None:
+            stats['count'] += 1
+            stats['seconds'] += duration
+            shape = statement_shape(statement)
+            seen = stats['shapes'].get(shape, 0) + 1
+            stats['shapes'][shape] = seen
+            if seen == config.get('QUERY_N_PLUS_ONE_THRESHOLD', 5):
+                stats['n_plus_one'].append(shape)
+
+    if (duration * 1000 >= config.get('SLOW_QUERY_THRESHOLD_MS', 200)
+            and random.random() < config.get('SLOW_QUERY_EXPLAIN_SAMPLE_RATE', 0.1)):
+        capture_plan(conn, statement, parameters, duration, config.get('SLOW_QUERY_EXPLAIN_ANALYZE', False))
+
+def init_app(app):
+    """Install the query listeners and per-request reporting."""
+    if not app.config.get('QUERY_MONITOR_ENABLED', True):
+        return
+
+    # Timed by the metrics module's statement listeners
+    observe_queries(_observe_query)
+
+    @app.before_request
+    def _start_query_stats():
+        g.query_stats = {'count': 0, 'seconds': 0.0, 'shapes': {}, 'n_plus_one': []}
+
+    @app.after_request
+    def _report_query_stats(response):
+        stats = g.get('query_stats')
+        if stats is None:
+            return response
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        registry.observe(
+            'kairix_db_queries_per_request', stats['count'], 'SQL statements issued per request',
+            buckets=QUERY_COUNT_BUCKETS, route=route
+        )
+        for shape in stats['n_plus_one']:
+            registry.inc('kairix_db_n_plus_one_total', 1, 'Requests repeating one statement shape', route=route)
+            logger.warning("Probable N+1 on %s %s: %d x %s",
+                           request.method, route, stats['shapes'][shape], shape)
+        response.headers['X-Query-Count'] = str(stats['count'])
+        response.headers['X-Query-Time'] = f"{stats['seconds'] * 1000:.2f}ms"
+        return response
@@ -0,0 +1,175 @@
+"""
+Read/write splitting between the primary database and a read replica.
+
+When a `replica` bind is configured (DATABASE_REPLICA_URL), GET requests
+and explicit `use_replica()` blocks read from it; writes and everything
+else use the primary. A client that just wrote is pinned to the primary
+for REPLICA_STICKY_SECONDS through a cookie so it reads its own writes,
+and all reads fall back to the primary while replica lag exceeds
+REPLICA_MAX_LAG_SECONDS.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+import sqlalchemy as sa
+from sqlalchemy import event
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND = 'replica'
+STICKY_COOKIE = 'kx_primary_until'
+READ_METHODS = ('GET', 'HEAD')
+
+LAG_QUERY = sa.text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+class ReplicaMonitor:
+    """Measures replica lag, at most once per check interval."""
+
+    def __init__(self, engine, max_lag: float = 2.0, check_interval: float = 1.0):
+        """
+        Initialize the monitor.
+
+        Args:
+            engine: Engine of the replica bind
+            max_lag: Seconds of lag above which reads fall back to the primary
+            check_interval: Seconds a lag measurement is reused
+        """
+        self.engine = engine
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def measure(self):
+        """
+        Query the replica's lag.
+
+        Returns:
+            Lag in seconds, 0 for databases without replication, or None if the replica is unreachable
+        """
+        if self.engine.dialect.name != 'postgresql':
+            return 0.0
+        try:
+            with self.engine.connect() as conn:
+                return float(conn.execute(LAG_QUERY).scalar() or 0)
+        except Exception:
+            logger.exception("Replica lag check failed")
+            return None
+
+    def healthy(self) -> bool:
+        """Whether the replica is reachable and within the lag threshold."""
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval and self._lock.acquire(blocking=False):
+            # One request refreshes the measurement; the rest use the cached value
+            try:
+                self.lag = self.measure()
+                self._checked_at = now
+            finally:
+                self._lock.release()
+        return self.lag is not None and self.lag <= self.max_lag
+
+class RoutingSession(Session):
+    """Session that sends reads to the replica bind when the request allows it."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._reads_from_replica(clause):
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _reads_from_replica(self, clause) -> bool:
+        if not has_request_context() or REPLICA_BIND not in self._db.engines:
+            return False
+        if self._flushing or isinstance(clause, sa.sql.dml.UpdateBase):
+            return False
+        if g.get('force_replica'):
+            return True
+        # Once this request has written, keep its reads on the primary
+        return g.get('db_route') == REPLICA_BIND and not self.info.get('wrote')
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_written(session, flush_context):
+    session.info['wrote'] = True
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _mark_statement_written(orm_execute_state):
+    # Bulk insert/update/delete statements run without a flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['wrote'] = True
+
+def mark_written(session) -> None:
+    """Pin the client to the primary for a write made outside its request session, e.g. by a writer thread."""
+    session.info['wrote'] = True
+
+def replica_available() -> bool:
+    """Whether a replica is configured and currently healthy."""
+    monitor = current_app.extensions.get('replica_monitor')
+    return monitor is not None and monitor.healthy()
+
+@contextmanager
+def use_replica():
+    """
+    Read from the replica inside the block, e.g. for similarity searches in a write request.
+
+    Falls back to the primary when no healthy replica is available.
+    """
+    if not has_request_context() or not replica_available():
+        yield
+        return
+    previous = g.get('force_replica')
+    g.force_replica = True
+    try:
+        yield
+    finally:
+        g.force_replica = previous
+
+def init_app(app, db):
+    """Route each request to the replica or primary and maintain read-your-writes stickiness."""
+    with app.app_context():
+        if REPLICA_BIND not in db.engines:
+            return
+        app.extensions['replica_monitor'] = ReplicaMonitor(
+            db.engines[REPLICA_BIND],
+            max_lag=app.config.get('REPLICA_MAX_LAG_SECONDS', 2.0),
+            check_interval=app.config.get('REPLICA_LAG_CHECK_INTERVAL', 1.0)
+        )
+
+    if _collect not in registry.collectors:
+        registry.register_collector(_collect)
+
+    @app.before_request
+    def _choose_route():
+        db.session().info.pop('wrote', None)
+        g.db_route = 'primary'
+        if request.method not in READ_METHODS:
+            return
+        try:
+            pinned_until = float(request.cookies.get(STICKY_COOKIE, 0))
+        except ValueError:
+            pinned_until = 0
+        if pinned_until <= time.time() and replica_available():
+            g.db_route = REPLICA_BIND
+
+    @app.after_request
+    def _pin_writer(response):
+        if request.method not in READ_METHODS and db.session().info.get('wrote'):
+            sticky = app.config.get('REPLICA_STICKY_SECONDS', 5)
+            response.set_cookie(STICKY_COOKIE, f'{time.time() + sticky:.3f}', max_age=int(sticky) + 1,
+                                httponly=True, samesite='Lax')
+        return response
+
+def _collect():
+    monitor = current_app.extensions.get('replica_monitor')
+    if monitor is None or monitor.lag is None:
+        return []
+    return [('kairix_db_replica_lag_seconds', 'Last measured replica lag', 'gauge', {}, monitor.lag)]
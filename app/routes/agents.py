@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
 from app.models import db, Agent
+from app.services.retention import delete_agent as delete_agent_cascade
 
 agents_bp = Blueprint('agents', __name__, url_prefix='/api/agents')
 
@@ -75,10 +76,6 @@ def update_agent(agent_id):
 # ✅ Delete an agent
 @agents_bp.route('/<string:agent_id>', methods=['DELETE'])
 def delete_agent(agent_id):
-    agent = Agent.query.get(agent_id)
-    if not agent:
+    if not delete_agent_cascade(agent_id):
         return jsonify({"error": "Agent not found"}), 404
-
-    db.session.delete(agent)
-    db.session.commit()
     return jsonify({"message": "Agent deleted successfully"}), 200
\ No newline at end of file
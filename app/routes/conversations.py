@@ -1,5 +1,13 @@
-from flask import Blueprint, request, jsonify
-from app.models import db, Conversation
+from datetime import datetime
+from flask import Blueprint, current_app, request, jsonify
+from app.models import db, Agent, Conversation, Message
+from app.services.admission import get_admission_controller
+from app.services.conversation_summary import build_context, record_messages
+from app.services.embedding_jobs import enqueue_message_embeddings
+from app.services.function_dispatch import complete_with_functions, get_function_dispatcher
+from app.services.function_registry import get_function_registry
+from app.services.openai_service import get_openai_service
+from app.services.retention import delete_conversations
 
 conversations_bp = Blueprint('conversations', __name__, url_prefix='/api/conversations')
 
@@ -54,10 +62,84 @@ def create_conversation():
 # ✅ Delete a conversation
 @conversations_bp.route('/<string:conversation_id>', methods=['DELETE'])
 def delete_conversation(conversation_id):
-    conversation = Conversation.query.get(conversation_id)
+    deleted = delete_conversations(Conversation.id == conversation_id)
+    db.session.commit()
+    if not deleted:
+        return jsonify({"error": "Conversation not found"}), 404
+    return jsonify({"message": "Conversation deleted successfully"}), 200
+# ✅ Run a chat turn: store the user message, call the model, store the reply
+@conversations_bp.route('/<string:conversation_id>/chat', methods=['POST'])
+def chat(conversation_id):
+    data = request.json
+    if not data.get("content"):
+        return jsonify({"error": "content is required"}), 400
+
+    conversation = db.session.get(Conversation, conversation_id)
     if not conversation:
         return jsonify({"error": "Conversation not found"}), 404
+    agent = db.session.get(Agent, conversation.agent_id)
+    if not agent:
+        return jsonify({"error": "Agent not found"}), 404
+
+    # Shed load before storing anything; AdmissionRejected becomes a 429/503
+    with get_admission_controller(current_app).admit(conversation.user_id):
+        user_message = Message(conversation_id=conversation.id, role="user", content=data["content"])
+        db.session.add(user_message)
+        db.session.flush()
 
-    db.session.delete(conversation)
+        # The user message is committed and the connection released before the
+        # model call, so slow completions do not hold pooled connections
+        try:
+            service = get_openai_service(current_app)
+            functions = get_function_registry(current_app).payload_for(agent)
+            if functions:
+                # Requested function calls run against their webhooks and the
+                # results go back to the model until it answers
+                response = complete_with_functions(
+                    service,
+                    get_function_dispatcher(current_app),
+                    build_context(conversation),
+                    agent,
+                    functions,
+                    max_rounds=current_app.config.get('FUNCTION_MAX_ROUNDS', 3),
+                    release_connection=True,
+                    user_id=conversation.user_id,
+                    conversation_id=conversation.id
+                )
+            else:
+                response = service.create_chat_completion(
+                    build_context(conversation),
+                    agent,
+                    user_id=conversation.user_id,
+                    conversation_id=conversation.id,
+                    release_connection=True
+                )
+        except Exception as e:
+            # The user message is kept, so it is counted and embedded like any other
+            record_messages(conversation)
+            enqueue_message_embeddings([user_message])
+            db.session.commit()
+            return jsonify({"error": str(e)}), 502
+
+    reply = Message(
+        conversation_id=conversation.id,
+        role="assistant",
+        content=response["choices"][0]["message"].get("content") or ""
+    )
+    db.session.add(reply)
+    conversation.last_active_at = datetime.utcnow()
+    record_messages(conversation, 2)
+    enqueue_message_embeddings([user_message])
     db.session.commit()
-    return jsonify({"message": "Conversation deleted successfully"}), 200
\ No newline at end of file
+
+    return jsonify({
+        "conversation_id": conversation.id,
+        "message": {
+            "id": reply.id,
+            "role": reply.role,
+            "content": reply.content,
+            "created_at": reply.created_at
+        },
+        "usage": response.get("usage"),
+        "function_calls": response.get("function_results", [])
+    }), 200
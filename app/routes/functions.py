@@ -0,0 +1,17 @@
+from flask import Blueprint, current_app, jsonify
+from app.services.function_registry import get_function_registry
+
+functions_bp = Blueprint('functions', __name__, url_prefix='/api/functions')
+
+# ✅ List the functions agents can call
+@functions_bp.route('/', methods=['GET'])
+def get_functions():
+    registry = get_function_registry(current_app)
+    return jsonify([{
+        "name": spec["name"],
+        "description": spec["description"],
+        "parameters": spec["parameters"],
+        "idempotent": spec.get("idempotent", False),
+        "timeout": spec.get("timeout"),
+        "configured": bool(spec.get("webhook_url"))
+    } for spec in registry.definitions()]), 200
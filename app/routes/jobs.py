@@ -0,0 +1,9 @@
+from flask import Blueprint, jsonify
+from app.services.job_queue import JobQueue
+
+jobs_bp = Blueprint('jobs', __name__, url_prefix='/api/jobs')
+
+# ✅ Queue depth and job latency
+@jobs_bp.route('/stats', methods=['GET'])
+def get_job_stats():
+    return jsonify(JobQueue.stats()), 200
@@ -0,0 +1,47 @@
+from flask import Blueprint, current_app, request, jsonify
+from app.models import db, Memory
+from app.services.embedding_jobs import create_memories_deferred
+
+memories_bp = Blueprint('memories', __name__, url_prefix='/api/memories')
+
+def _memory_json(memory):
+    return {
+        "id": memory.id,
+        "content": memory.content,
+        "user_id": memory.user_id,
+        "agent_id": memory.agent_id,
+        "embedding_type": memory.embedding_type,
+        "embedding_status": "ready" if memory.embedding is not None else "pending",
+        "importance": memory.importance,
+        "access_count": memory.access_count,
+        "created_at": memory.created_at
+    }
+
+# ✅ Get a single memory by ID
+@memories_bp.route('/<string:memory_id>', methods=['GET'])
+def get_memory(memory_id):
+    memory = db.session.get(Memory, memory_id)
+    if not memory:
+        return jsonify({"error": "Memory not found"}), 404
+    return jsonify(_memory_json(memory)), 200
+
+# ✅ Create memories; embeddings are computed by the job worker
+@memories_bp.route('/', methods=['POST'])
+def create_memories():
+    data = request.json
+    contents = data.get("contents") or ([data["content"]] if data.get("content") else [])
+    if not contents:
+        return jsonify({"error": "content or contents is required"}), 400
+
+    try:
+        memories = create_memories_deferred(
+            contents,
+            embedding_type=data.get("embedding_type", current_app.config["MEMORY_EMBEDDING_TYPE"]),
+            user_id=data.get("user_id"),
+            agent_id=data.get("agent_id"),
+            importance=data.get("importance")
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify([_memory_json(memory) for memory in memories]), 202
@@ -1,12 +1,20 @@
-from flask import Blueprint, request, jsonify
-from app.models import db, Message
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from flask import Blueprint, current_app, request, jsonify
+from app.models import db, Conversation, Message
+from app.replica import mark_written
+from app.services.message_buffer import get_message_buffer, message_json, store_messages
 
 messages_bp = Blueprint('messages', __name__, url_prefix='/api/messages')
 
 # ✅ Get all messages for a conversation
 @messages_bp.route('/<string:conversation_id>', methods=['GET'])
 def get_messages(conversation_id):
-    messages = Message.query.filter_by(conversation_id=conversation_id).all()
+    query = Message.query.filter_by(conversation_id=conversation_id)
+    started_at = db.session.query(Conversation.started_at).filter_by(id=conversation_id).scalar()
+    if started_at is not None:
+        # Lets PostgreSQL skip message partitions from before the conversation
+        query = query.filter(Message.created_at >= started_at)
+    messages = query.order_by(Message.created_at, Message.id).all()
     return jsonify([{
         "id": msg.id,
         "conversation_id": msg.conversation_id,
@@ -22,18 +30,28 @@ def create_message():
     if not data.get("conversation_id") or not data.get("role") or not data.get("content"):
         return jsonify({"error": "conversation_id, role, and content are required"}), 400
 
-    new_message = Message(
-        conversation_id=data["conversation_id"],
-        role=data["role"],
-        content=data["content"]
-    )
-    db.session.add(new_message)
+    values = {
+        "conversation_id": data["conversation_id"],
+        "role": data["role"],
+        "content": data["content"]
+    }
+    if current_app.config.get('MESSAGE_GROUP_COMMIT'):
+        # Answered once the group commit holding this message is durable
+        future = get_message_buffer(current_app._get_current_object()).submit(values)
+        try:
+            result = future.result(timeout=current_app.config.get('MESSAGE_GROUP_COMMIT_TIMEOUT', 5))
+        except FutureTimeoutError:
+            if future.cancel():
+                # Never written, so the client can safely retry
+                return jsonify({"error": "Timed out waiting for the message to be stored"}), 503
+            # Its group is already being written; a 503 now would invite a duplicate
+            result = future.result()
+        # Written by the buffer's own session, so pin the client's reads explicitly
+        mark_written(db.session())
+        return jsonify(result), 201
+
+    new_message = Message(**values)
+    store_messages([new_message])
     db.session.commit()
 
-    return jsonify({
-        "id": new_message.id,
-        "conversation_id": new_message.conversation_id,
-        "role": new_message.role,
-        "content": new_message.content,
-        "created_at": new_message.created_at
-    }), 201
\ No newline at end of file
+    return jsonify(message_json(new_message)), 201
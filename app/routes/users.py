@@ -1,5 +1,6 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, abort, jsonify, request
 from app.models import db, User
+from app.services.retention import delete_user as delete_user_cascade
 
 users_bp = Blueprint('users', __name__)
 
@@ -55,7 +56,6 @@ def update_user(user_id):
 
 @users_bp.route('/<user_id>', methods=['DELETE'])
 def delete_user(user_id):
-    user = User.query.get_or_404(user_id)
-    db.session.delete(user)
-    db.session.commit()
+    if not delete_user_cascade(user_id):
+        abort(404)
     return '', 204
\ No newline at end of file
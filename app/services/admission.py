@@ -0,0 +1,175 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+from flask import current_app, jsonify
+from app.metrics import registry
+
+class AdmissionRejected(Exception):
+    """Raised when a model-calling request is shed instead of admitted."""
+
+    def __init__(self, status: int, retry_after: float, message: str):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+        self.message = message
+
+class AdmissionController:
+    """
+    Admission control for requests that call the model.
+
+    Bounds concurrent in-flight calls per process, lets a short queue wait for
+    a slot until a deadline, and rate-limits each user with a token bucket.
+    Requests that cannot be admitted fail fast so that worker threads stay
+    free for cheap routes.
+    """
+
+    def __init__(self, max_in_flight: int = 8, max_queue: int = 16, queue_timeout: float = 2.0,
+                 user_rate: float = 0.5, user_burst: float = 5, max_tracked_users: int = 10000):
+        """
+        Initialize the controller.
+
+        Args:
+            max_in_flight: Concurrent admitted requests
+            max_queue: Requests allowed to wait for a slot; more are rejected with 503
+            queue_timeout: Seconds a queued request waits before it is rejected with 503
+            user_rate: Tokens per second refilled into each user's bucket; 0 disables per-user limits
+            user_burst: Bucket capacity, i.e. requests a user can make back to back
+            max_tracked_users: Bucket count above which idle, full buckets are dropped
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_tracked_users = max_tracked_users
+        self.in_flight = 0
+        self.waiting = 0
+        self._condition = threading.Condition()
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._bucket_lock = threading.Lock()
+        # Recent admitted-call durations, used to estimate Retry-After for 503s
+        self._avg_duration = 1.0
+
+    def _take_token(self, user_id: Optional[str]) -> None:
+        if not user_id or self.user_rate <= 0:
+            return
+        now = time.monotonic()
+        with self._bucket_lock:
+            tokens, updated = self._buckets.get(user_id, (self.user_burst, now))
+            tokens = min(self.user_burst, tokens + (now - updated) * self.user_rate)
+            if tokens < 1:
+                self._buckets[user_id] = (tokens, now)
+                raise AdmissionRejected(429, (1 - tokens) / self.user_rate, "Rate limit exceeded")
+            self._buckets[user_id] = (tokens - 1, now)
+            if len(self._buckets) > self.max_tracked_users:
+                self._prune(now)
+
+    def _prune(self, now: float) -> None:
+        full_after = self.user_burst / self.user_rate
+        for user_id, (_, updated) in list(self._buckets.items()):
+            if now - updated >= full_after:
+                del self._buckets[user_id]
+
+    def acquire(self, user_id: Optional[str] = None) -> None:
+        """
+        Admit a request or raise AdmissionRejected.
+
+        Args:
+            user_id: User making the request, for the per-user rate limit
+
+        Raises:
+            AdmissionRejected: 429 when the user is over their rate, 503 when
+                the queue is full or the wait deadline passes
+        """
+        self._take_token(user_id)
+        with self._condition:
+            if self.in_flight < self.max_in_flight and not self.waiting:
+                self.in_flight += 1
+                return
+            if self.waiting >= self.max_queue:
+                raise AdmissionRejected(503, self._retry_after(), "Server busy")
+            self.waiting += 1
+            deadline = time.monotonic() + self.queue_timeout
+            try:
+                while self.in_flight >= self.max_in_flight:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise AdmissionRejected(503, self._retry_after(), "Server busy")
+                    self._condition.wait(remaining)
+                self.in_flight += 1
+            finally:
+                self.waiting -= 1
+
+    def release(self, duration: Optional[float] = None) -> None:
+        """Free a slot taken by acquire()."""
+        with self._condition:
+            self.in_flight -= 1
+            if duration is not None:
+                self._avg_duration = 0.9 * self._avg_duration + 0.1 * duration
+            self._condition.notify()
+
+    def _retry_after(self) -> float:
+        # Time for the current queue to drain through the available slots
+        return self._avg_duration * (self.waiting + 1) / max(1, self.max_in_flight)
+
+    @contextmanager
+    def admit(self, user_id: Optional[str] = None):
+        """Context manager form of acquire()/release()."""
+        try:
+            self.acquire(user_id)
+        except AdmissionRejected as e:
+            registry.inc('kairix_admission_rejected_total', 1, 'Requests shed by admission control',
+                         status=e.status)
+            raise
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+def get_admission_controller(app) -> AdmissionController:
+    """
+    Return the application's admission controller, creating it on first use.
+
+    Args:
+        app: Flask application owning the controller
+
+    Returns:
+        The shared AdmissionController
+    """
+    controller = app.extensions.get('admission')
+    if controller is None:
+        config = app.config
+        controller = AdmissionController(
+            max_in_flight=config.get('ADMISSION_MAX_IN_FLIGHT', 8),
+            max_queue=config.get('ADMISSION_MAX_QUEUE', 16),
+            queue_timeout=config.get('ADMISSION_QUEUE_TIMEOUT', 2.0),
+            user_rate=config.get('ADMISSION_USER_RATE', 0.5),
+            user_burst=config.get('ADMISSION_USER_BURST', 5)
+        )
+        app.extensions['admission'] = controller
+    return controller
+
+def init_app(app):
+    """Turn AdmissionRejected into fast 429/503 responses with Retry-After."""
+
+    @app.errorhandler(AdmissionRejected)
+    def _rejected(e):
+        response = jsonify({"error": e.message})
+        response.status_code = e.status
+        response.headers['Retry-After'] = str(max(1, math.ceil(e.retry_after)))
+        return response
+
+    if _collect not in registry.collectors:
+        registry.register_collector(_collect)
+
+def _collect():
+    controller = current_app.extensions.get('admission')
+    if controller is None:
+        return []
+    return [
+        ('kairix_admission_in_flight', 'Admitted model calls in progress', 'gauge', {}, controller.in_flight),
+        ('kairix_admission_waiting', 'Requests waiting for admission', 'gauge', {}, controller.waiting),
+    ]
@@ -0,0 +1,121 @@
+from typing import Dict, List
+from flask import current_app
+from sqlalchemy import func, update
+from app.concurrency import released_session
+from app.models import db, Conversation, Message
+from .job_queue import enqueue, job_handler
+from .openai_service import OpenAIService, get_openai_service
+
+SUMMARIZE_CONVERSATION = 'summarize_conversation'
+
+def _settings():
+    config = current_app.config
+    return config.get('CONVERSATION_SUMMARY_INTERVAL', 20), config.get('CONVERSATION_TAIL_MESSAGES', 10)
+
+def record_messages(conversation: Conversation, count: int = 1) -> None:
+    """
+    Count new messages and queue a summary update once enough have built up.
+
+    A job is queued each time another interval of messages builds up past
+    the watermark and the verbatim tail. Jobs are idempotent, so a lagging or
+    failed job never blocks later ones. Nothing is committed here so the job
+    becomes visible together with the caller's messages.
+
+    The counter is incremented in the UPDATE itself rather than read and
+    written back, so concurrent chat turns on one conversation never lose
+    each other's counts.
+
+    Args:
+        conversation: Conversation the messages were added to
+        count: Number of messages added
+    """
+    interval, tail = _settings()
+    message_count, summarized_count = db.session.execute(
+        update(Conversation)
+        .where(Conversation.id == conversation.id)
+        .values(message_count=Conversation.message_count + count)
+        .returning(Conversation.message_count, Conversation.summarized_count)
+        .execution_options(synchronize_session='fetch')
+    ).one()
+    unsummarized = message_count - (summarized_count or 0)
+    if unsummarized >= interval + tail and (unsummarized - count - tail) // interval < (unsummarized - tail) // interval:
+        enqueue(SUMMARIZE_CONVERSATION, {'conversation_id': conversation.id}, commit=False)
+
+def build_context(conversation: Conversation) -> List[Dict[str, str]]:
+    """
+    Build the prompt history for a chat turn: rolling summary plus recent tail.
+
+    Only messages past the watermark are read, and at most one interval plus
+    the tail of them, so the query and prompt stay bounded however long the
+    conversation gets.
+
+    Args:
+        conversation: Conversation to build the history for
+
+    Returns:
+        List of message dictionaries with 'role' and 'content', oldest first
+    """
+    interval, tail = _settings()
+    recent = conversation.after_watermark().order_by(
+        Message.created_at.desc(), Message.id.desc()
+    ).limit(interval + tail).all()
+
+    history = []
+    if conversation.summary:
+        history.append({"role": "system", "content": f"Summary of the conversation so far:\n{conversation.summary}"})
+    history.extend({"role": msg.role, "content": msg.content} for msg in reversed(recent))
+    return history
+
+def summarize(conversation: Conversation, service: OpenAIService) -> int:
+    """
+    Fold every message past the watermark except the recent tail into the summary.
+
+    The connection goes back to the pool while the model writes the summary.
+    The result is stored with a compare-and-set on the watermark, so when two
+    jobs summarize the same conversation at once only the first to finish
+    folds its messages in; the other stores nothing.
+
+    Args:
+        conversation: Conversation to summarize
+        service: Service used to generate the summary
+
+    Returns:
+        Number of messages folded in
+    """
+    _, tail = _settings()
+    pending = conversation.after_watermark().order_by(Message.created_at, Message.id).all()
+    to_fold = pending[:max(0, len(pending) - tail)]
+    if not to_fold:
+        return 0
+    watermark_id = conversation.summarized_through_id
+    with released_session():
+        summary = service.summarize_conversation(
+            conversation.summary,
+            [{"role": msg.role, "content": msg.content} for msg in to_fold]
+        )
+    result = db.session.execute(
+        update(Conversation)
+        .where(
+            Conversation.id == conversation.id,
+            Conversation.summarized_through_id.is_(None) if watermark_id is None
+            else Conversation.summarized_through_id == watermark_id
+        )
+        .values(
+            summary=summary,
+            summarized_through_at=to_fold[-1].created_at,
+            summarized_through_id=to_fold[-1].id,
+            summarized_count=func.coalesce(Conversation.summarized_count, 0) + len(to_fold)
+        )
+        .execution_options(synchronize_session='fetch')
+    )
+    return len(to_fold) if result.rowcount else 0
+
+@job_handler(SUMMARIZE_CONVERSATION, batch_size=10)
+def summarize_conversations(payloads: List[dict]) -> None:
+    """Update the rolling summary of each conversation in the batch."""
+    conversation_ids = {payload['conversation_id'] for payload in payloads}
+    service = get_openai_service(current_app)
+    for conversation in Conversation.query.filter(Conversation.id.in_(conversation_ids)).all():
+        summarize(conversation, service)
+        # Commit per conversation so a later failure does not redo earlier summaries
+        db.session.commit()
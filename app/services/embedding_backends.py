@@ -0,0 +1,212 @@
+"""
+Embedding backends behind OpenAIService.create_embedding(s).
+
+Each entry of EMBEDDING_TYPES names its backend ("openai" when unset), so
+memories of different types can be produced by different backends side by
+side:
+
+    openai   text-embedding-* models over the OpenAI API
+    local    feature-hashing vectorizer on the local CPU: no network, no model
+             files, sub-millisecond per text. Word unigrams, word bigrams and
+             character trigrams are hashed into the type's dimensions with a
+             stable hash, so vectors are identical across processes and
+             restarts. Large batches are split across EMBEDDING_WORKERS
+             processes.
+
+The local backend captures lexical rather than semantic similarity; it suits
+offline use, tests and latency-critical recall where keyword overlap is a
+good signal.
+"""
+import atexit
+import multiprocessing
+import os
+import re
+import threading
+import zlib
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+import numpy as np
+import openai
+from app.models import EMBEDDING_TYPES
+
+DEFAULT_BACKEND = 'openai'
+
+class EmbeddingBackend(ABC):
+    """Turns texts into vectors for one or more embedding types."""
+
+    @abstractmethod
+    def embed(self, texts: List[str], spec: Dict) -> List[List[float]]:
+        """
+        Embed a batch of texts.
+
+        Args:
+            texts: Texts to embed
+            spec: The embedding type's EMBEDDING_TYPES entry
+
+        Returns:
+            One vector of spec["dimensions"] floats per text, in order
+        """
+        pass
+
+    def embed_one(self, text: str, spec: Dict) -> List[float]:
+        """Embed a single text."""
+        return self.embed([text], spec)[0]
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    """Embeddings from the OpenAI API."""
+
+    def __init__(self, api_key: Optional[str] = None, api_base: Optional[str] = None):
+        """
+        Initialize the backend and its API client.
+
+        Args:
+            api_key: API key; without one every request fails
+            api_base: Endpoint; defaults to the OpenAI API
+        """
+        options = {'base_url': api_base} if api_base else {}
+        self.client = openai.OpenAI(api_key=api_key, **options) if api_key else None
+
+    def _create(self, input, spec: Dict) -> Dict:
+        if self.client is None:
+            raise openai.OpenAIError("No OpenAI API key configured for embeddings")
+        return self.client.embeddings.create(input=input, **self.params(spec)).model_dump()
+
+    @staticmethod
+    def params(spec: Dict) -> Dict:
+        """Build the model parameters for an embedding type."""
+        params = {"model": spec["model"]}
+        # text-embedding-3 models can return shortened (Matryoshka) vectors
+        if not spec["model"].endswith("ada-002"):
+            params["dimensions"] = spec["dimensions"]
+        return params
+
+    def embed(self, texts: List[str], spec: Dict) -> List[List[float]]:
+        response = self._create(texts, spec)
+        data = sorted(response["data"], key=lambda item: item.get("index", 0))
+        return [item["embedding"] for item in data]
+
+    def embed_one(self, text: str, spec: Dict) -> List[float]:
+        return self._create(text, spec)["data"][0]["embedding"]
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+# Relative weight of each feature kind
+_BIGRAM_WEIGHT = 0.7
+_TRIGRAM_WEIGHT = 0.3
+
+def hash_embedding(text: str, dimensions: int) -> np.ndarray:
+    """
+    Embed one text by signed feature hashing.
+
+    Features are hashed with CRC-32: the low bits pick the dimension and the
+    top bit the sign, so colliding features tend to cancel instead of adding
+    up. Counts are log-scaled and the vector is L2-normalized.
+
+    Returns:
+        float32 vector of the given dimensions (all zeros for text without words)
+    """
+    words = _TOKEN.findall(text.lower())
+    vector = np.zeros(dimensions, dtype=np.float32)
+    if not words:
+        return vector
+    bigrams = [f"{a} {b}" for a, b in zip(words, words[1:])]
+    trigrams = [padded[i:i + 3] for padded in (f"#{w}#" for w in words) for i in range(len(padded) - 2)]
+    features = words + bigrams + trigrams
+    weights = np.concatenate([
+        np.ones(len(words), dtype=np.float32),
+        np.full(len(bigrams), _BIGRAM_WEIGHT, dtype=np.float32),
+        np.full(len(trigrams), _TRIGRAM_WEIGHT, dtype=np.float32),
+    ])
+    hashes = np.fromiter((zlib.crc32(f.encode('utf-8')) for f in features), dtype=np.uint32, count=len(features))
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+    np.add.at(vector, (hashes & 0x7FFFFFFF) % dimensions, signs * weights)
+    vector = np.sign(vector) * np.log1p(np.abs(vector))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+def _hash_chunk(args) -> List[List[float]]:
+    texts, dimensions = args
+    return [hash_embedding(text, dimensions).tolist() for text in texts]
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """Local CPU embeddings by feature hashing; batches above a threshold use all cores."""
+
+    def __init__(self, workers: Optional[int] = None, parallel_threshold: int = 256):
+        """
+        Initialize the backend.
+
+        Args:
+            workers: Processes for large batches (defaults to the CPU count); 1 disables them
+            parallel_threshold: Batch size from which texts are split across processes
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.parallel_threshold = parallel_threshold
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    # spawn: forking a threaded server process can deadlock the child
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+                    )
+                    atexit.register(self._pool.shutdown, wait=False)
+        return self._pool
+
+    def embed(self, texts: List[str], spec: Dict) -> List[List[float]]:
+        dimensions = spec["dimensions"]
+        if self.workers <= 1 or len(texts) < self.parallel_threshold:
+            return _hash_chunk((texts, dimensions))
+        size = -(-len(texts) // self.workers)
+        chunks = [(texts[i:i + size], dimensions) for i in range(0, len(texts), size)]
+        return [vector for chunk in self._executor().map(_hash_chunk, chunks) for vector in chunk]
+
+    def embed_one(self, text: str, spec: Dict) -> List[float]:
+        return hash_embedding(text, spec["dimensions"]).tolist()
+
+_backends: Dict[tuple, EmbeddingBackend] = {}
+_backends_lock = threading.Lock()
+
+def _backend_key(name: str, config) -> tuple:
+    # API backends are shared per endpoint and key, not just per name
+    if name == 'openai':
+        return name, getattr(config, 'OPENAI_API_KEY', None), getattr(config, 'OPENAI_API_BASE', None)
+    return (name,)
+
+def _create_backend(name: str, config) -> EmbeddingBackend:
+    if name == 'openai':
+        return OpenAIEmbeddingBackend(
+            api_key=getattr(config, 'OPENAI_API_KEY', None),
+            api_base=getattr(config, 'OPENAI_API_BASE', None)
+        )
+    if name == 'local':
+        return HashingEmbeddingBackend(
+            workers=getattr(config, 'EMBEDDING_WORKERS', None),
+            parallel_threshold=getattr(config, 'EMBEDDING_PARALLEL_THRESHOLD', 256)
+        )
+    raise ValueError(f"Unknown embedding backend: {name}")
+
+def get_embedding_backend(embedding_type: str, config=None) -> EmbeddingBackend:
+    """
+    Return the process-wide backend producing an embedding type.
+
+    Args:
+        embedding_type: Key into EMBEDDING_TYPES
+        config: Configuration used when the backend is first created
+
+    Raises:
+        ValueError: For unknown embedding types or backends
+    """
+    if embedding_type not in EMBEDDING_TYPES:
+        raise ValueError(f"Unknown embedding type: {embedding_type}")
+    name = EMBEDDING_TYPES[embedding_type].get('backend', DEFAULT_BACKEND)
+    key = _backend_key(name, config)
+    backend = _backends.get(key)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(key)
+            if backend is None:
+                backend = _backends[key] = _create_backend(name, config)
+    return backend
@@ -0,0 +1,153 @@
+from collections import defaultdict
+from typing import Iterable, List, Optional
+from flask import current_app
+from app.models import db, Memory, Message, content_hash, DEFAULT_EMBEDDING_TYPE, get_embedding_dimensions
+from .job_queue import enqueue, job_handler
+from .openai_service import OpenAIService
+
+EMBED_MEMORIES = 'embed_memories'
+EMBED_MESSAGES = 'embed_messages'
+
+# Only what users said is recalled across conversations
+RECALLED_ROLES = ('user',)
+
+def create_memories_deferred(
+    contents: List[str],
+    embedding_type: str = DEFAULT_EMBEDDING_TYPE,
+    user_id: Optional[str] = None,
+    agent_id: Optional[str] = None,
+    importance: Optional[float] = None
+) -> List[Memory]:
+    """
+    Store memories now and embed them in the background.
+
+    Exact duplicates are suppressed through the content hash; near duplicates
+    are left to `flask memory compact` since no vector exists yet.
+
+    Args:
+        contents: Text contents to store
+        embedding_type: Embedding type the worker should produce
+        user_id: Owning user, if any
+        agent_id: Owning agent, if any
+        importance: Importance between 0 and 1 for hybrid ranking (defaults to 0.5)
+
+    Returns:
+        List parallel to contents of the memory each item was stored as
+    """
+    get_embedding_dimensions(embedding_type)
+    if importance is not None and not 0 <= importance <= 1:
+        raise ValueError("importance must be between 0 and 1")
+    hashes = [content_hash(content) for content in contents]
+    by_hash = {
+        memory.content_hash: memory
+        for memory in Memory.owned_by(embedding_type, user_id, agent_id).filter(
+            Memory.content_hash.in_(set(hashes))
+        )
+    }
+
+    memories = []
+    for content, hash_ in zip(contents, hashes):
+        memory = by_hash.get(hash_)
+        if memory is None:
+            memory = Memory(content=content, embedding_type=embedding_type, user_id=user_id, agent_id=agent_id)
+            if importance is not None:
+                memory.importance = importance
+            db.session.add(memory)
+            db.session.flush()
+            enqueue(EMBED_MEMORIES, {'memory_id': memory.id}, commit=False)
+            by_hash[hash_] = memory
+        memories.append(memory)
+
+    # Rows and their jobs become visible to workers together
+    db.session.commit()
+    return memories
+
+@job_handler(EMBED_MEMORIES, batch_size=100)
+def embed_memories(payloads: List[dict]) -> None:
+    """Embed a batch of memories with one API call per embedding type."""
+    memory_ids = [payload['memory_id'] for payload in payloads]
+    memories = Memory.query.filter(Memory.id.in_(memory_ids), Memory.embedding.is_(None)).all()
+
+    by_type = defaultdict(list)
+    for memory in memories:
+        by_type[memory.embedding_type].append(memory)
+
+    service = OpenAIService()
+    for embedding_type, group in by_type.items():
+        vectors = service.create_embeddings([memory.content for memory in group], embedding_type=embedding_type)
+        for memory, vector in zip(group, vectors):
+            memory.update_embedding(vector)
+    db.session.commit()
+
+def history_recall_enabled() -> bool:
+    """Whether past messages are embedded for cross-conversation recall."""
+    return current_app.config.get('MEMORY_PROVIDER') == 'history'
+
+def enqueue_message_embeddings(messages: Iterable[Message], embedding_type: Optional[str] = None) -> int:
+    """
+    Queue newly stored messages for embedding, in the caller's transaction.
+
+    Does nothing unless history recall is enabled. Messages must have been
+    flushed so their ids exist.
+
+    Args:
+        messages: Messages to embed; roles other than RECALLED_ROLES are skipped
+        embedding_type: Embedding type to produce (defaults to MEMORY_EMBEDDING_TYPE)
+
+    Returns:
+        Number of messages queued
+    """
+    if not history_recall_enabled():
+        return 0
+    embedding_type = embedding_type or current_app.config.get('MEMORY_EMBEDDING_TYPE', DEFAULT_EMBEDDING_TYPE)
+    queued = 0
+    for message in messages:
+        if message.role in RECALLED_ROLES:
+            enqueue(EMBED_MESSAGES, {'message_id': message.id, 'embedding_type': embedding_type}, commit=False)
+            queued += 1
+    return queued
+
+def backfill_message_embeddings(embedding_type: Optional[str] = None, batch_size: int = 1000) -> int:
+    """
+    Queue embedding jobs for stored messages that have no embedding yet, e.g. after enabling history recall.
+
+    Returns:
+        Number of messages queued
+    """
+    embedding_type = embedding_type or current_app.config.get('MEMORY_EMBEDDING_TYPE', DEFAULT_EMBEDDING_TYPE)
+    query = Message.query.filter(Message.role.in_(RECALLED_ROLES), Message.embedding.is_(None)) \
+        .order_by(Message.created_at, Message.id)
+    queued = 0
+    last = None
+    while True:
+        page = query
+        if last is not None:
+            last_created_at, last_id = last
+            page = page.filter(db.or_(Message.created_at > last_created_at,
+                                      db.and_(Message.created_at == last_created_at, Message.id > last_id)))
+        messages = page.limit(batch_size).all()
+        if not messages:
+            return queued
+        for message in messages:
+            enqueue(EMBED_MESSAGES, {'message_id': message.id, 'embedding_type': embedding_type}, commit=False)
+        last = (messages[-1].created_at, messages[-1].id)
+        db.session.commit()
+        queued += len(messages)
+
+@job_handler(EMBED_MESSAGES, batch_size=100)
+def embed_messages(payloads: List[dict]) -> None:
+    """Embed a batch of messages with one API call per embedding type."""
+    types = {payload['message_id']: payload['embedding_type'] for payload in payloads}
+    messages = Message.query.filter(Message.id.in_(types), Message.embedding.is_(None)).all()
+
+    by_type = defaultdict(list)
+    for message in messages:
+        by_type[types[message.id]].append(message)
+
+    service = OpenAIService()
+    for embedding_type, group in by_type.items():
+        vectors = service.create_embeddings([message.content for message in group], embedding_type=embedding_type)
+        for message, vector in zip(group, vectors):
+            message.embedding = vector
+            message.embedding_type = embedding_type
+    db.session.commit()
@@ -0,0 +1,318 @@
+"""
+Execution of the function calls a model asks for.
+
+Each function is backed by a webhook (a Zapier catch hook or anything that
+accepts a JSON POST). Calls requested in one model response run
+concurrently on a shared thread pool over one pooled HTTP session, each
+bounded by its function's timeout. Results of functions marked idempotent
+are cached for a short TTL, and identical idempotent calls in one response
+are only sent once. Failures and timeouts come back as error results so the
+model can answer anyway.
+
+A function spec is a dict:
+    name, description, parameters    OpenAI function definition
+    webhook_url                      Where the call is POSTed
+    timeout                          Seconds, defaults to FUNCTION_DEFAULT_TIMEOUT
+    idempotent                       Whether results may be cached and shared
+    cache_ttl                        Seconds, defaults to FUNCTION_RESULT_CACHE_TTL
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from app.concurrency import released_session
+from app.metrics import registry, timed
+from .function_registry import FunctionPayload, argument_errors
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 10.0
+CONNECT_TIMEOUT = 3.05
+
+class ResultCache:
+    """Thread-safe LRU cache whose entries expire after a per-entry TTL."""
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """Return the cached value, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl: float) -> None:
+        """Store a value for ttl seconds, evicting the least recently used entries."""
+        if ttl <= 0 or self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+def parse_function_calls(message: Dict) -> List[Dict]:
+    """
+    Extract the function calls from an assistant message.
+
+    Handles parallel `tool_calls` and the single legacy `function_call`.
+
+    Returns:
+        List of dicts with id (None for legacy calls), name and arguments (parsed JSON,
+        or the raw string under "_raw" if it is not valid JSON)
+    """
+    raw_calls = [
+        (call.get('id'), call.get('function') or {})
+        for call in message.get('tool_calls') or []
+        if call.get('type', 'function') == 'function'
+    ]
+    if not raw_calls and message.get('function_call'):
+        raw_calls = [(None, message['function_call'])]
+
+    calls = []
+    for call_id, function in raw_calls:
+        arguments = function.get('arguments') or '{}'
+        try:
+            parsed = json.loads(arguments) if isinstance(arguments, str) else arguments
+        except ValueError:
+            parsed = {'_raw': arguments}
+        calls.append({'id': call_id, 'name': function.get('name'), 'arguments': parsed})
+    return calls
+
+class FunctionDispatcher:
+    """Runs model function calls against their webhooks concurrently."""
+
+    def __init__(self, max_workers: int = 8, pool_size: int = 16, default_timeout: float = DEFAULT_TIMEOUT,
+                 cache_ttl: float = 300, cache_size: int = 1024, webhook_secret: Optional[str] = None):
+        """
+        Initialize the dispatcher.
+
+        Args:
+            max_workers: Calls executed concurrently across all requests
+            pool_size: Keep-alive connections kept per webhook host
+            default_timeout: Seconds a call may take when its spec sets no timeout
+            cache_ttl: Seconds idempotent results are reused when the spec sets no cache_ttl
+            cache_size: Maximum cached results
+            webhook_secret: Sent as X-Kairix-Secret so webhooks can authenticate calls
+        """
+        self.default_timeout = default_timeout
+        self.cache_ttl = cache_ttl
+        self.cache = ResultCache(cache_size)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['Content-Type'] = 'application/json'
+        if webhook_secret:
+            self.session.headers['X-Kairix-Secret'] = webhook_secret
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='function-call')
+
+    def _timeout(self, spec: Dict) -> float:
+        return float(spec.get('timeout') or self.default_timeout)
+
+    @staticmethod
+    def cache_key(spec: Dict, arguments) -> str:
+        """Key identifying a call: the webhook, function name and canonical arguments."""
+        return json.dumps([spec.get('webhook_url'), spec.get('name'), arguments], sort_keys=True, default=str)
+
+    def dispatch_to_zapier(self, spec: Dict, arguments) -> Dict:
+        """
+        POST one function call to its webhook.
+
+        Args:
+            spec: Function spec with webhook_url
+            arguments: Arguments chosen by the model
+
+        Returns:
+            The webhook's JSON response (wrapped as {"result": ...} if it is not
+            an object), or {"error": ...} on failure
+        """
+        name = spec.get('name')
+        if not spec.get('webhook_url'):
+            return {'error': f"Function '{name}' has no webhook"}
+        timeout = self._timeout(spec)
+        start = time.monotonic()
+        outcome = 'ok'
+        try:
+            response = self.session.post(
+                spec['webhook_url'],
+                data=json.dumps({'function': name, 'arguments': arguments}),
+                timeout=(min(CONNECT_TIMEOUT, timeout), timeout)
+            )
+            response.raise_for_status()
+            try:
+                body = response.json()
+            except ValueError:
+                body = response.text
+            return body if isinstance(body, dict) else {'result': body}
+        except requests.Timeout:
+            outcome = 'timeout'
+            return {'error': f"Function '{name}' timed out after {timeout:g}s"}
+        except requests.RequestException as e:
+            outcome = 'error'
+            logger.warning("Function %s failed: %s", name, e)
+            return {'error': f"Function '{name}' failed: {e}"}
+        finally:
+            registry.observe('kairix_function_call_duration_seconds', time.monotonic() - start,
+                             'Webhook round trip of model function calls', function=name, outcome=outcome)
+
+    def dispatch_all(self, calls: List[Dict], specs: Dict[str, Dict], validators: Optional[Dict] = None) -> List[Dict]:
+        """
+        Execute function calls concurrently.
+
+        Args:
+            calls: Parsed calls from parse_function_calls()
+            specs: Function specs by name
+            validators: Compiled argument validators by name; calls with invalid
+                arguments are answered with an error instead of being sent
+
+        Returns:
+            List parallel to calls of result dicts
+        """
+        validators = validators or {}
+        results: List[Optional[Dict]] = [None] * len(calls)
+        pending = {}  # cache key -> (future, spec, call indexes)
+        for i, call in enumerate(calls):
+            spec = specs.get(call['name'])
+            if spec is None:
+                results[i] = {'error': f"Unknown function '{call['name']}'"}
+                continue
+            validator = validators.get(call['name'])
+            errors = argument_errors(validator, call['arguments']) if validator is not None else []
+            if errors:
+                results[i] = {'error': f"Invalid arguments for '{call['name']}': {'; '.join(errors)}"}
+                continue
+            if not spec.get('idempotent'):
+                future = self._executor.submit(self.dispatch_to_zapier, spec, call['arguments'])
+                pending[('call', i)] = (future, spec, [i])
+                continue
+            key = self.cache_key(spec, call['arguments'])
+            cached = self.cache.get(key)
+            if cached is not None:
+                registry.inc('kairix_function_cache_hits_total', 1, 'Function calls answered from cache',
+                             function=call['name'])
+                results[i] = cached
+            elif key in pending:
+                pending[key][2].append(i)
+            else:
+                future = self._executor.submit(self.dispatch_to_zapier, spec, call['arguments'])
+                pending[key] = (future, spec, [i])
+
+        if pending:
+            # The HTTP timeouts bound each call; this bounds the whole batch if a
+            # webhook trickles its response
+            deadline = max(self._timeout(spec) for _, spec, _ in pending.values()) + CONNECT_TIMEOUT
+            wait([future for future, _, _ in pending.values()], timeout=deadline)
+        for key, (future, spec, indexes) in pending.items():
+            if future.done():
+                result = future.result()
+                if spec.get('idempotent') and 'error' not in result:
+                    self.cache.set(key, result, float(spec.get('cache_ttl', self.cache_ttl)))
+            else:
+                result = {'error': f"Function '{spec.get('name')}' timed out after {self._timeout(spec):g}s"}
+            for i in indexes:
+                results[i] = result
+        return results
+
+def function_result_messages(message: Dict, calls: List[Dict], results: List[Dict]) -> List[Dict]:
+    """
+    Build the messages that feed function results back to the model.
+
+    Returns:
+        The assistant message that made the calls followed by one result message per call
+    """
+    assistant = {'role': 'assistant', 'content': message.get('content')}
+    if message.get('tool_calls'):
+        assistant['tool_calls'] = message['tool_calls']
+    elif message.get('function_call'):
+        assistant['function_call'] = message['function_call']
+    messages = [assistant]
+    for call, result in zip(calls, results):
+        content = json.dumps(result, default=str)
+        if call['id'] is not None:
+            messages.append({'role': 'tool', 'tool_call_id': call['id'], 'content': content})
+        else:
+            messages.append({'role': 'function', 'name': call['name'], 'content': content})
+    return messages
+
+def complete_with_functions(service, dispatcher: FunctionDispatcher, messages: List[Dict], agent,
+                            payload: FunctionPayload, max_rounds: int = 3, release_connection: bool = False,
+                            **kwargs) -> Dict:
+    """
+    Run a chat completion, executing requested function calls until the model answers.
+
+    Args:
+        service: OpenAIService used for the completions
+        dispatcher: Dispatcher executing the calls
+        messages: Conversation messages for the completion
+        agent: Agent answering
+        payload: The agent's compiled functions (see FunctionRegistry.payload_for)
+        max_rounds: Completions that may request calls; the next one gets no functions
+        release_connection: Release the DB connection during model and webhook calls
+        **kwargs: Passed to create_chat_completion
+
+    Returns:
+        The final OpenAI response; its "function_results" lists the executed
+        calls with their results
+    """
+    messages = list(messages)
+    executed = []
+    for round_ in range(max_rounds + 1):
+        response = service.create_chat_completion(
+            messages, agent, tools=payload.tools if round_ < max_rounds else [],
+            release_connection=release_connection, **kwargs
+        )
+        message = response['choices'][0]['message']
+        calls = parse_function_calls(message) if round_ < max_rounds else []
+        if not calls:
+            break
+        with released_session() if release_connection else nullcontext(), timed('function_calls'):
+            results = dispatcher.dispatch_all(calls, payload.specs, payload.validators)
+        executed.extend({'name': c['name'], 'arguments': c['arguments'], 'result': r} for c, r in zip(calls, results))
+        messages.extend(function_result_messages(message, calls, results))
+        # Memory context was already added to the first completion
+        kwargs['include_memory'] = False
+    response['function_results'] = executed
+    return response
+
+def get_function_dispatcher(app) -> FunctionDispatcher:
+    """
+    Return the application's shared FunctionDispatcher, creating it on first use.
+
+    Args:
+        app: Flask application owning the dispatcher
+
+    Returns:
+        The shared FunctionDispatcher
+    """
+    dispatcher = app.extensions.get('function_dispatcher')
+    if dispatcher is None:
+        config = app.config
+        dispatcher = FunctionDispatcher(
+            max_workers=config.get('FUNCTION_DISPATCH_MAX_WORKERS', 8),
+            pool_size=config.get('FUNCTION_HTTP_POOL_SIZE', 16),
+            default_timeout=config.get('FUNCTION_DEFAULT_TIMEOUT', DEFAULT_TIMEOUT),
+            cache_ttl=config.get('FUNCTION_RESULT_CACHE_TTL', 300),
+            cache_size=config.get('FUNCTION_RESULT_CACHE_SIZE', 1024),
+            webhook_secret=config.get('ZAPIER_WEBHOOK_SECRET')
+        )
+        app.extensions['function_dispatcher'] = dispatcher
+    return dispatcher
@@ -0,0 +1,270 @@
+"""
+Registry of the functions agents can call, loaded from config/zapier/*.json.
+
+Each file holds one function definition (see DEFINITION_SCHEMA). Files are
+read and validated once; the argument validators and each agent's tools
+payload are compiled and cached, so a chat turn touches no files. A
+background watcher re-reads files whose mtime changed and swaps in a new
+snapshot; an invalid edit keeps the previous version of that function.
+
+Agents choose functions with settings["functions"], a list of registry
+names and/or inline definitions.
+"""
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, Tuple
+from jsonschema import Draft202012Validator
+from jsonschema.exceptions import SchemaError
+
+logger = logging.getLogger(__name__)
+
+DEFINITION_SCHEMA = {
+    'type': 'object',
+    'required': ['name', 'description', 'parameters'],
+    'properties': {
+        'name': {'type': 'string', 'pattern': '^[A-Za-z0-9_-]{1,64}$'},
+        'description': {'type': 'string', 'minLength': 1},
+        'parameters': {'type': 'object'},
+        'webhook_url': {'type': 'string', 'pattern': '^https?://'},
+        'webhook_url_env': {'type': 'string'},  # Environment variable holding the webhook URL
+        'timeout': {'type': 'number', 'exclusiveMinimum': 0},
+        'idempotent': {'type': 'boolean'},
+        'cache_ttl': {'type': 'number', 'minimum': 0},
+    },
+    'additionalProperties': False,
+}
+_definition_validator = Draft202012Validator(DEFINITION_SCHEMA)
+
+# Keys of a definition the model sees; the rest stays server-side
+TOOL_KEYS = ('name', 'description', 'parameters')
+
+class InvalidFunctionDefinition(ValueError):
+    """Raised when a function definition does not match DEFINITION_SCHEMA."""
+
+def compile_definition(definition: Dict) -> Tuple[Dict, Draft202012Validator]:
+    """
+    Validate a function definition and compile its argument validator.
+
+    Returns:
+        (spec, validator) where spec has webhook_url resolved from webhook_url_env
+
+    Raises:
+        InvalidFunctionDefinition: If the definition or its parameters schema is invalid
+    """
+    errors = sorted(_definition_validator.iter_errors(definition), key=lambda e: list(e.path))
+    if errors:
+        raise InvalidFunctionDefinition('; '.join(
+            f"{'/'.join(str(p) for p in e.path) or '<root>'}: {e.message}" for e in errors
+        ))
+    try:
+        Draft202012Validator.check_schema(definition['parameters'])
+    except SchemaError as e:
+        raise InvalidFunctionDefinition(f"parameters: {e.message}")
+    spec = dict(definition)
+    env = spec.pop('webhook_url_env', None)
+    if env and not spec.get('webhook_url'):
+        spec['webhook_url'] = os.getenv(env)
+    return spec, Draft202012Validator(definition['parameters'])
+
+def argument_errors(validator: Draft202012Validator, arguments) -> List[str]:
+    """Messages for each way arguments violate a function's parameters schema."""
+    return [e.message for e in validator.iter_errors(arguments)]
+
+class FunctionPayload:
+    """Compiled functions of one agent: the tools sent to the model and what runs them."""
+
+    __slots__ = ('tools', 'specs', 'validators')
+
+    def __init__(self, tools: List[Dict], specs: Dict[str, Dict], validators: Dict[str, Draft202012Validator]):
+        self.tools = tools
+        self.specs = specs
+        self.validators = validators
+
+    def __bool__(self):
+        return bool(self.specs)
+
+EMPTY_PAYLOAD = FunctionPayload([], {}, {})
+
+class _Snapshot:
+    """Immutable view of the loaded definitions; replaced as a whole on reload."""
+
+    __slots__ = ('version', 'specs', 'validators', 'files')
+
+    def __init__(self, version, specs, validators, files):
+        self.version = version
+        self.specs = specs
+        self.validators = validators
+        self.files = files  # path -> (mtime_ns, function name)
+
+class FunctionRegistry:
+    """Loads, validates and caches function definitions from a directory."""
+
+    def __init__(self, directory: str):
+        """
+        Initialize the registry and load the directory.
+
+        Args:
+            directory: Directory of *.json function definitions; may not exist yet
+        """
+        self.directory = directory
+        self.errors: Dict[str, str] = {}  # file name -> last load error
+        self._snapshot = _Snapshot(0, {}, {}, {})
+        self._payloads: Dict[str, Tuple[int, object, FunctionPayload]] = {}
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+        self.reload()
+
+    @property
+    def version(self) -> int:
+        """Incremented whenever a reload changes any definition."""
+        return self._snapshot.version
+
+    def reload(self) -> bool:
+        """
+        Re-read definition files that were added, changed or removed since the last load.
+
+        Returns:
+            Whether any definition changed
+        """
+        with self._reload_lock:
+            current = self._snapshot
+            try:
+                paths = sorted(
+                    os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                    if name.endswith('.json')
+                )
+            except FileNotFoundError:
+                paths = []
+            mtimes = {}
+            for path in paths:
+                try:
+                    mtimes[path] = os.stat(path).st_mtime_ns
+                except FileNotFoundError:
+                    continue
+            if {p: m for p, (m, _) in current.files.items()} == mtimes:
+                return False
+
+            specs = dict(current.specs)
+            validators = dict(current.validators)
+            files = {}
+            for path, (_, name) in current.files.items():
+                if path not in mtimes and name is not None:
+                    # File deleted: drop its function
+                    specs.pop(name, None)
+                    validators.pop(name, None)
+                    self.errors.pop(os.path.basename(path), None)
+            for path, mtime in mtimes.items():
+                previous = current.files.get(path)
+                if previous is not None and previous[0] == mtime:
+                    files[path] = previous
+                    continue
+                name = previous[1] if previous else None
+                try:
+                    with open(path) as f:
+                        spec, validator = compile_definition(json.load(f))
+                except (OSError, ValueError) as e:
+                    # Keep serving the last good version of this file's function
+                    self.errors[os.path.basename(path)] = str(e)
+                    logger.error("Invalid function definition %s: %s", path, e)
+                    files[path] = (mtime, name)
+                    continue
+                if name is not None and name != spec['name']:
+                    specs.pop(name, None)
+                    validators.pop(name, None)
+                specs[spec['name']] = spec
+                validators[spec['name']] = validator
+                files[path] = (mtime, spec['name'])
+                self.errors.pop(os.path.basename(path), None)
+
+            self._snapshot = _Snapshot(current.version + 1, specs, validators, files)
+            logger.info("Loaded %d function definitions (version %d)", len(specs), self._snapshot.version)
+            return True
+
+    def definitions(self) -> List[Dict]:
+        """All loaded function specs, sorted by name."""
+        snapshot = self._snapshot
+        return [snapshot.specs[name] for name in sorted(snapshot.specs)]
+
+    def payload_for(self, agent) -> FunctionPayload:
+        """
+        Return the agent's compiled functions, cached until the agent's selection or the registry changes.
+
+        Unknown names and invalid inline definitions are skipped with a warning.
+
+        Args:
+            agent: Agent whose settings["functions"] selects the functions
+
+        Returns:
+            FunctionPayload, falsy when the agent has no functions
+        """
+        selection = ((agent.settings or {}).get('functions') or []) if agent is not None else []
+        if not selection:
+            return EMPTY_PAYLOAD
+        snapshot = self._snapshot
+        cached = self._payloads.get(agent.id)
+        if cached is not None and cached[0] == snapshot.version and cached[1] == selection:
+            return cached[2]
+
+        specs, validators = {}, {}
+        for entry in selection:
+            if isinstance(entry, str):
+                if entry not in snapshot.specs:
+                    logger.warning("Agent %s selects unknown function %s", agent.id, entry)
+                    continue
+                specs[entry], validators[entry] = snapshot.specs[entry], snapshot.validators[entry]
+                continue
+            try:
+                spec, validator = compile_definition(entry)
+            except InvalidFunctionDefinition as e:
+                logger.warning("Agent %s has an invalid inline function: %s", agent.id, e)
+                continue
+            specs[spec['name']], validators[spec['name']] = spec, validator
+        tools = [
+            {'type': 'function', 'function': {key: spec[key] for key in TOOL_KEYS}}
+            for spec in specs.values()
+        ]
+        payload = FunctionPayload(tools, specs, validators)
+        self._payloads[agent.id] = (snapshot.version, json.loads(json.dumps(selection)), payload)
+        return payload
+
+    def start_watcher(self, interval: float) -> None:
+        """Poll the directory for changes every `interval` seconds in a daemon thread."""
+        if self._watcher is not None or interval <= 0:
+            return
+
+        def watch():
+            while not self._stop.wait(interval):
+                try:
+                    self.reload()
+                except Exception:
+                    logger.exception("Function definition reload failed")
+
+        self._watcher = threading.Thread(target=watch, name='function-registry-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self) -> None:
+        self._stop.set()
+
+def get_function_registry(app) -> FunctionRegistry:
+    """
+    Return the application's function registry, loading it on first use.
+
+    Outside of testing, a watcher thread reloads changed files every
+    FUNCTION_RELOAD_INTERVAL seconds.
+
+    Args:
+        app: Flask application owning the registry
+
+    Returns:
+        The shared FunctionRegistry
+    """
+    registry = app.extensions.get('function_registry')
+    if registry is None:
+        registry = FunctionRegistry(app.config['FUNCTION_CONFIG_DIR'])
+        if not app.testing:
+            registry.start_watcher(app.config.get('FUNCTION_RELOAD_INTERVAL', 5))
+        app.extensions['function_registry'] = registry
+    return registry
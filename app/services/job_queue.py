@@ -0,0 +1,258 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import and_, func, or_
+from app.models import db, Job
+
+logger = logging.getLogger(__name__)
+
+# Registered handlers by job kind
+HANDLERS: Dict[str, 'JobHandler'] = {}
+
+class JobHandler:
+    """A registered job handler and how many jobs it accepts per call."""
+
+    def __init__(self, kind: str, func: Callable[[List[dict]], None], batch_size: int = 1):
+        self.kind = kind
+        self.func = func
+        self.batch_size = batch_size
+
+def job_handler(kind: str, batch_size: int = 1):
+    """
+    Register a function as the handler for a job kind.
+
+    The handler is called with a list of up to `batch_size` payloads and must
+    process all of them; if it raises, every job in the batch is retried.
+
+    Args:
+        kind: Job kind the handler processes
+        batch_size: Maximum number of jobs passed to one call
+    """
+    def decorator(func):
+        HANDLERS[kind] = JobHandler(kind, func, batch_size)
+        return func
+    return decorator
+
+def enqueue(kind: str, payload: dict, delay: float = 0, max_attempts: int = 5, commit: bool = True) -> Job:
+    """
+    Add a job to the queue.
+
+    Args:
+        kind: Job kind, matching a registered handler
+        payload: JSON-serializable job arguments
+        delay: Seconds before the job becomes claimable
+        max_attempts: Attempts before the job is marked failed
+        commit: Commit immediately; pass False to enqueue inside the caller's transaction
+
+    Returns:
+        The queued Job
+    """
+    job = Job(
+        kind=kind,
+        payload=payload,
+        max_attempts=max_attempts,
+        run_after=datetime.utcnow() + timedelta(seconds=delay)
+    )
+    db.session.add(job)
+    if commit:
+        db.session.commit()
+    return job
+
+class JobQueue:
+    """Claims, completes and retries jobs stored in the job table."""
+
+    def __init__(self, visibility_timeout: float = 300, retry_backoff: float = 5):
+        """
+        Initialize the queue.
+
+        Args:
+            visibility_timeout: Seconds a claimed job stays invisible to other
+                workers; a job whose worker died becomes claimable again afterwards
+            retry_backoff: Base delay in seconds for exponential retry backoff
+        """
+        self.visibility_timeout = visibility_timeout
+        self.retry_backoff = retry_backoff
+
+    def claim(self, kind: str, limit: int = 1) -> List[Job]:
+        """
+        Claim up to `limit` ready jobs of one kind.
+
+        Rows locked by another worker are skipped rather than waited on, so
+        concurrent workers never block each other or claim the same job. A
+        running job whose visibility timeout expired after its last attempt is
+        marked failed instead of being handed out again, so a job that keeps
+        killing its worker is not retried forever.
+
+        Returns:
+            The claimed jobs, already marked running
+        """
+        now = datetime.utcnow()
+        candidates = Job.query.filter(
+            Job.kind == kind,
+            or_(
+                and_(Job.status == 'queued', Job.run_after <= now),
+                and_(Job.status == 'running', Job.locked_until < now)
+            )
+        ).order_by(Job.run_after).limit(limit).with_for_update(skip_locked=True).all()
+
+        jobs = []
+        for job in candidates:
+            if job.status == 'running' and job.attempts >= job.max_attempts:
+                job.status = 'failed'
+                job.last_error = 'visibility timeout'
+                job.finished_at = now
+                job.locked_until = None
+                continue
+            jobs.append(job)
+            job.status = 'running'
+            job.attempts += 1
+            job.started_at = now
+            job.locked_until = now + timedelta(seconds=self.visibility_timeout)
+        db.session.commit()
+        return jobs
+
+    def complete(self, jobs: List[Job]) -> None:
+        """Mark jobs as done."""
+        now = datetime.utcnow()
+        for job in jobs:
+            job.status = 'done'
+            job.finished_at = now
+            job.locked_until = None
+        db.session.commit()
+
+    def fail(self, jobs: List[Job], error: str) -> None:
+        """Schedule jobs for retry with exponential backoff, or mark them failed."""
+        now = datetime.utcnow()
+        for job in jobs:
+            job.last_error = error
+            job.locked_until = None
+            if job.attempts >= job.max_attempts:
+                job.status = 'failed'
+                job.finished_at = now
+            else:
+                job.status = 'queued'
+                job.run_after = now + timedelta(seconds=self.retry_backoff * 2 ** (job.attempts - 1))
+        db.session.commit()
+
+    @staticmethod
+    def stats(window: int = 500) -> dict:
+        """
+        Queue depth and latency figures.
+
+        Args:
+            window: Number of most recently finished jobs used for latency
+
+        Returns:
+            Dictionary with per-kind depth, running and failed counts, the age of
+            the oldest ready job and average queue/run latency in seconds
+        """
+        now = datetime.utcnow()
+        counts = db.session.query(Job.kind, Job.status, func.count(Job.id)).group_by(Job.kind, Job.status).all()
+        by_kind: Dict[str, Dict[str, int]] = {}
+        for kind, status, count in counts:
+            by_kind.setdefault(kind, {'queued': 0, 'running': 0, 'done': 0, 'failed': 0})[status] = count
+
+        oldest = db.session.query(func.min(Job.run_after)).filter(
+            Job.status == 'queued', Job.run_after <= now
+        ).scalar()
+
+        finished = Job.query.with_entities(Job.created_at, Job.started_at, Job.finished_at).filter(
+            Job.status == 'done'
+        ).order_by(Job.finished_at.desc()).limit(window).all()
+        wait_times = [(started - created).total_seconds() for created, started, _ in finished if started and created]
+        run_times = [(done - started).total_seconds() for _, started, done in finished if started and done]
+
+        return {
+            'kinds': by_kind,
+            'depth': sum(kind['queued'] for kind in by_kind.values()),
+            'oldest_ready_age_seconds': (now - oldest).total_seconds() if oldest else 0.0,
+            'avg_wait_seconds': sum(wait_times) / len(wait_times) if wait_times else 0.0,
+            'avg_run_seconds': sum(run_times) / len(run_times) if run_times else 0.0
+        }
+
+class Worker:
+    """
+    Runs queued jobs on a thread pool.
+
+    Each loop iteration claims up to `concurrency` batches per registered kind
+    and hands them to pool threads. Each batch runs its handler in its own
+    application context and database session.
+    """
+
+    def __init__(self, app, concurrency: int = 4, poll_interval: float = 1.0,
+                 queue: Optional[JobQueue] = None, kinds: Optional[List[str]] = None):
+        """
+        Initialize the worker.
+
+        Args:
+            app: Flask application providing configuration and the database
+            concurrency: Number of batches processed in parallel
+            poll_interval: Seconds to sleep when no jobs are ready
+            queue: JobQueue to claim from (defaults to one built from app config)
+            kinds: Job kinds to process (defaults to all registered handlers)
+        """
+        self.app = app
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.queue = queue or JobQueue(
+            visibility_timeout=app.config.get('JOB_VISIBILITY_TIMEOUT', 300),
+            retry_backoff=app.config.get('JOB_RETRY_BACKOFF', 5)
+        )
+        self.kinds = kinds
+        self._stopping = False
+
+    def _run_batch(self, kind: str, job_ids: List[str]) -> None:
+        with self.app.app_context():
+            jobs = Job.query.filter(Job.id.in_(job_ids)).all()
+            try:
+                HANDLERS[kind].func([job.payload for job in jobs])
+            except Exception as e:
+                db.session.rollback()
+                logger.exception("Job batch %s failed", kind)
+                self.queue.fail(jobs, str(e))
+            else:
+                self.queue.complete(jobs)
+            finally:
+                db.session.remove()
+
+    def run_once(self, executor: Optional[ThreadPoolExecutor] = None) -> int:
+        """
+        Claim batches for every kind and process them.
+
+        Args:
+            executor: Pool to run batches on, up to `concurrency` batches per
+                kind; runs a single batch per kind inline when None
+
+        Returns:
+            Number of jobs processed
+        """
+        processed = 0
+        futures = []
+        max_batches = self.concurrency if executor is not None else 1
+        with self.app.app_context():
+            for kind in self.kinds or list(HANDLERS):
+                for _ in range(max_batches):
+                    jobs = self.queue.claim(kind, limit=HANDLERS[kind].batch_size)
+                    if not jobs:
+                        break
+                    job_ids = [job.id for job in jobs]
+                    processed += len(job_ids)
+                    if executor is None:
+                        self._run_batch(kind, job_ids)
+                    else:
+                        futures.append(executor.submit(self._run_batch, kind, job_ids))
+        wait(futures)
+        return processed
+
+    def run(self) -> None:
+        """Process jobs until stop() is called."""
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='job-worker') as executor:
+            while not self._stopping:
+                if not self.run_once(executor):
+                    time.sleep(self.poll_interval)
+
+    def stop(self) -> None:
+        """Ask the run loop to exit after the current iteration."""
+        self._stopping = True
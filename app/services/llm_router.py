@@ -0,0 +1,468 @@
+"""
+Routing of chat completions across LLM providers.
+
+Providers implement ChatProvider and are registered on an LLMRouter by name;
+`Agent.provider` picks the primary and the remaining providers are tried in
+order of health when it fails. The router keeps a rolling window of latency
+and outcome per provider and model, and a circuit breaker per provider: after
+LLM_BREAKER_FAILURES consecutive failures a provider is skipped for
+LLM_BREAKER_COOLDOWN seconds, then a single probe request decides whether it
+is used again.
+
+With hedging enabled, a request that has not finished within the primary's
+rolling p95 latency is also sent to the next provider and the first success
+wins. Hedging needs LLM_HEDGE_MIN_SAMPLES recent successes to know the p95,
+and costs a duplicate request for roughly one call in twenty.
+
+Providers are configured with LLM_PROVIDERS, a JSON list of
+    {"name": "azure", "api_base": "...", "api_key_env": "AZURE_OPENAI_KEY",
+     "models": {"gpt-4o": "gpt-4o-deployment"}, "default_model": "...", "timeout": 30}
+for OpenAI-compatible endpoints; providers without a key use OPENAI_API_KEY.
+Without it only "openai" is registered, using OPENAI_API_KEY and
+OPENAI_API_BASE. Each provider owns an openai.OpenAI client.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+import numpy as np
+import openai
+from flask import current_app
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROVIDER = 'openai'
+
+# Client errors that would fail the same way on every provider
+_NON_RETRIABLE_STATUSES = frozenset(range(400, 500)) - {408, 409, 429}
+
+class ChatProvider(ABC):
+    """A backend that can answer chat completion requests."""
+
+    name: str
+
+    def model_for(self, model: Optional[str]) -> Optional[str]:
+        """Name this provider uses for a requested model."""
+        return model
+
+    @abstractmethod
+    def complete(self, params: Dict) -> Dict:
+        """
+        Run one chat completion.
+
+        Args:
+            params: OpenAI chat completion parameters; "model" is already mapped
+                with model_for()
+
+        Returns:
+            OpenAI-style response dictionary
+        """
+        pass
+
+class OpenAICompatibleProvider(ChatProvider):
+    """Provider speaking the OpenAI chat completions API, e.g. OpenAI, Azure or a vLLM server."""
+
+    def __init__(self, name: str = DEFAULT_PROVIDER, api_base: Optional[str] = None, api_key: Optional[str] = None,
+                 models: Optional[Dict[str, str]] = None, default_model: Optional[str] = None,
+                 timeout: Optional[float] = None):
+        """
+        Initialize the provider and its API client.
+
+        Args:
+            name: Name agents select the provider by
+            api_base: Endpoint; defaults to the OpenAI API
+            api_key: API key; without one every request fails
+            models: Requested model name -> this provider's model name
+            default_model: Model used for requests whose model is not in models
+            timeout: Request timeout in seconds
+        """
+        self.name = name
+        self.api_base = api_base
+        self.models = models or {}
+        self.default_model = default_model
+        self.timeout = timeout
+        # Retries and failover are the router's job
+        options = {'max_retries': 0}
+        if api_base:
+            options['base_url'] = api_base
+        if timeout:
+            options['timeout'] = timeout
+        self.client = openai.OpenAI(api_key=api_key, **options) if api_key else None
+
+    def model_for(self, model: Optional[str]) -> Optional[str]:
+        return self.models.get(model) or self.default_model or model
+
+    def complete(self, params: Dict) -> Dict:
+        if self.client is None:
+            raise openai.OpenAIError(f"No API key configured for provider {self.name}")
+        return self.client.chat.completions.create(**params).model_dump()
+
+class RollingStats:
+    """Latency and outcome of the most recent calls to one provider and model."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)  # (latency seconds, succeeded)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool) -> None:
+        with self._lock:
+            self._samples.append((latency, ok))
+
+    def __len__(self):
+        return len(self._samples)
+
+    def successes(self) -> int:
+        with self._lock:
+            return sum(1 for _, ok in self._samples if ok)
+
+    def error_rate(self) -> float:
+        """Fraction of recent calls that failed; 0 without samples."""
+        with self._lock:
+            if not self._samples:
+                return 0.0
+            return sum(1 for _, ok in self._samples if not ok) / len(self._samples)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Latency quantile of recent successful calls, or None without any."""
+        with self._lock:
+            latencies = [latency for latency, ok in self._samples if ok]
+        if not latencies:
+            return None
+        return float(np.quantile(latencies, q))
+
+class CircuitBreaker:
+    """Stops sending requests to a failing provider until a probe succeeds."""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0):
+        """
+        Args:
+            failure_threshold: Consecutive failures that open the breaker
+            cooldown: Seconds the breaker stays open before a probe is allowed
+        """
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        """Whether allow() would let a request through now, without claiming the probe."""
+        with self._lock:
+            return self.state == self.CLOSED or time.monotonic() - self.opened_at >= self.cooldown
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now; moves an expired open breaker to half-open for one probe."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            # A half-open probe that never reported back (e.g. the provider was
+            # listed but not reached) is replaced after another cooldown
+            if time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning("Circuit opened after %d failures", self.failures)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+class NoProviderAvailable(Exception):
+    """Raised when no registered provider can take a request."""
+
+def is_retriable(error: Exception) -> bool:
+    """Whether another provider might succeed where this error occurred."""
+    status = getattr(error, 'http_status', None) or getattr(error, 'status_code', None)
+    return status not in _NON_RETRIABLE_STATUSES
+
+class LLMRouter:
+    """Sends chat completions to the healthiest provider, failing over and hedging."""
+
+    def __init__(self, providers: List[ChatProvider], default: str = DEFAULT_PROVIDER, hedge: bool = False,
+                 hedge_quantile: float = 0.95, hedge_min_samples: int = 20, stats_window: int = 200,
+                 failure_threshold: int = 5, cooldown: float = 30.0, max_workers: int = 16):
+        """
+        Initialize the router.
+
+        Args:
+            providers: Providers in fallback order
+            default: Primary provider for agents whose provider is not registered
+            hedge: Race the next provider when the primary is slower than its hedge_quantile latency
+            hedge_quantile: Latency quantile after which a hedge is sent
+            hedge_min_samples: Recent successes needed before hedging a provider and model
+            stats_window: Calls kept per provider and model
+            failure_threshold: Consecutive failures that open a provider's breaker
+            cooldown: Seconds an open breaker waits before probing
+            max_workers: Threads running hedged requests
+        """
+        if not providers:
+            raise ValueError("At least one provider is required")
+        self.providers: Dict[str, ChatProvider] = {provider.name: provider for provider in providers}
+        self.default = default if default in self.providers else providers[0].name
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.stats_window = stats_window
+        self.breakers = {name: CircuitBreaker(failure_threshold, cooldown) for name in self.providers}
+        self._stats: Dict[tuple, RollingStats] = {}
+        self._stats_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm-hedge') if hedge else None
+
+    def stats(self, provider: str, model: Optional[str]) -> RollingStats:
+        """Rolling stats of a provider and (provider-side) model."""
+        key = (provider, model)
+        stats = self._stats.get(key)
+        if stats is None:
+            with self._stats_lock:
+                stats = self._stats.setdefault(key, RollingStats(self.stats_window))
+        return stats
+
+    def candidates(self, preferred: Optional[str], model: Optional[str]) -> List[ChatProvider]:
+        """
+        Providers to try for a request, in order.
+
+        The preferred provider comes first, the others follow ordered by
+        recent error rate (ties keep registration order). Providers with an
+        open breaker are left out; if every breaker is open, the primary is
+        tried anyway rather than failing outright. Listing a provider does not
+        claim its half-open probe; that happens only when it is called.
+        """
+        primary = preferred if preferred in self.providers else self.default
+        others = [name for name in self.providers if name != primary]
+        others.sort(key=lambda name: self.stats(name, self.providers[name].model_for(model)).error_rate())
+        ordered = [name for name in [primary] + others if self.breakers[name].available()]
+        if not ordered:
+            ordered = [primary]
+        return [self.providers[name] for name in ordered]
+
+    def _call(self, provider: ChatProvider, params: Dict, check_breaker: bool = True) -> Dict:
+        """
+        Call one provider, recording latency, outcome and breaker state.
+
+        Raises:
+            NoProviderAvailable: If the provider's breaker turns the request away,
+                e.g. because another request took its half-open probe
+        """
+        if check_breaker and not self.breakers[provider.name].allow():
+            raise NoProviderAvailable(f"Circuit open for provider {provider.name}")
+        model = provider.model_for(params.get('model'))
+        start = time.monotonic()
+        try:
+            response = provider.complete(dict(params, model=model))
+        except Exception as e:
+            elapsed = time.monotonic() - start
+            self.stats(provider.name, model).record(elapsed, False)
+            if is_retriable(e):
+                # Bad requests say nothing about the provider's health
+                self.breakers[provider.name].record_failure()
+            registry.inc('kairix_llm_requests_total', 1, 'Chat completions by provider and outcome',
+                         provider=provider.name, model=model, outcome='error')
+            raise
+        elapsed = time.monotonic() - start
+        self.stats(provider.name, model).record(elapsed, True)
+        self.breakers[provider.name].record_success()
+        registry.inc('kairix_llm_requests_total', 1, 'Chat completions by provider and outcome',
+                     provider=provider.name, model=model, outcome='ok')
+        registry.observe('kairix_llm_request_duration_seconds', elapsed, 'Chat completion latency by provider',
+                         provider=provider.name, model=model)
+        return response
+
+    def hedge_delay(self, provider: ChatProvider, model: Optional[str]) -> Optional[float]:
+        """Seconds after which a request to provider is hedged, or None if it is not."""
+        if not self.hedge:
+            return None
+        stats = self.stats(provider.name, provider.model_for(model))
+        if stats.successes() < self.hedge_min_samples:
+            return None
+        return stats.quantile(self.hedge_quantile)
+
+    def _hedged(self, primary: ChatProvider, secondary: ChatProvider, params: Dict, delay: float) -> Dict:
+        """
+        Send to primary, adding secondary if primary is still running after delay or fails.
+
+        Returns the first successful response; the slower call is left to
+        finish in the background so its latency still counts.
+        """
+        futures = {self._executor.submit(self._call, primary, params): primary}
+        done, _ = wait(futures, timeout=delay)
+        if done:
+            first_error = next(iter(done)).exception()
+            if first_error is None:
+                return next(iter(done)).result()
+            if not is_retriable(first_error):
+                # A bad request fails on every provider; do not pay for it twice
+                raise first_error
+        else:
+            registry.inc('kairix_llm_hedges_total', 1, 'Requests raced against a second provider',
+                          provider=primary.name, hedge=secondary.name)
+        futures[self._executor.submit(self._call, secondary, params)] = secondary
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+                if not is_retriable(error):
+                    raise error
+        raise error
+
+    def create_chat_completion(self, params: Dict, provider: Optional[str] = None) -> Dict:
+        """
+        Run a chat completion on the best available provider.
+
+        Args:
+            params: OpenAI chat completion parameters
+            provider: Preferred provider, e.g. the agent's; defaults to the router default
+
+        Returns:
+            OpenAI-style response dictionary of the provider that answered
+
+        Raises:
+            The last provider error when every candidate failed, or a
+            non-retriable error immediately
+        """
+        candidates = self.candidates(provider, params.get('model'))
+        # Every breaker open: the primary is tried regardless
+        forced = not self.breakers[candidates[0].name].available()
+        error: Optional[Exception] = None
+        i = 0
+        while i < len(candidates):
+            current = candidates[i]
+            secondary = candidates[i + 1] if i + 1 < len(candidates) else None
+            delay = self.hedge_delay(current, params.get('model')) if secondary is not None else None
+            try:
+                if delay is not None:
+                    i += 2
+                    return self._hedged(current, secondary, params, delay)
+                i += 1
+                return self._call(current, params, check_breaker=not forced)
+            except Exception as e:
+                if not is_retriable(e):
+                    raise
+                error = e
+                if i < len(candidates):
+                    logger.warning("Provider %s failed, failing over: %s", current.name, e)
+                    registry.inc('kairix_llm_failovers_total', 1, 'Requests retried on another provider',
+                                 provider=current.name)
+        raise error if error is not None else NoProviderAvailable("No LLM provider available")
+
+    def snapshot(self) -> List[Dict]:
+        """Health of every provider and model seen so far, for metrics and debugging."""
+        rows = []
+        for (name, model), stats in sorted(self._stats.items(), key=lambda item: (item[0][0], str(item[0][1]))):
+            rows.append({
+                'provider': name,
+                'model': model,
+                'calls': len(stats),
+                'error_rate': stats.error_rate(),
+                'p50': stats.quantile(0.5),
+                'p95': stats.quantile(0.95),
+                'circuit': self.breakers[name].state,
+            })
+        return rows
+
+def _setting(config, key, default=None):
+    """Read a setting from a Flask config mapping or a config object."""
+    if hasattr(config, 'get'):
+        return config.get(key, default)
+    return getattr(config, key, default)
+
+def providers_from_config(config) -> List[ChatProvider]:
+    """
+    Build providers from LLM_PROVIDERS, or just "openai" when it is unset.
+
+    Args:
+        config: Flask config or config object
+
+    Returns:
+        Providers in fallback order
+    """
+    raw = _setting(config, 'LLM_PROVIDERS')
+    api_key = _setting(config, 'OPENAI_API_KEY')
+    if not raw:
+        return [OpenAICompatibleProvider(
+            DEFAULT_PROVIDER, api_base=_setting(config, 'OPENAI_API_BASE'), api_key=api_key
+        )]
+    specs = json.loads(raw) if isinstance(raw, str) else raw
+    providers = []
+    for spec in specs:
+        spec = dict(spec)
+        key_env = spec.pop('api_key_env', None)
+        if key_env:
+            spec.setdefault('api_key', os.getenv(key_env))
+        spec.setdefault('api_key', api_key)
+        providers.append(OpenAICompatibleProvider(**spec))
+    return providers
+
+def router_from_config(config) -> LLMRouter:
+    """Create an LLMRouter from the LLM_* settings."""
+    return LLMRouter(
+        providers_from_config(config),
+        default=_setting(config, 'LLM_DEFAULT_PROVIDER', DEFAULT_PROVIDER),
+        hedge=_setting(config, 'LLM_HEDGE_ENABLED', False),
+        hedge_quantile=_setting(config, 'LLM_HEDGE_QUANTILE', 0.95),
+        hedge_min_samples=_setting(config, 'LLM_HEDGE_MIN_SAMPLES', 20),
+        stats_window=_setting(config, 'LLM_STATS_WINDOW', 200),
+        failure_threshold=_setting(config, 'LLM_BREAKER_FAILURES', 5),
+        cooldown=_setting(config, 'LLM_BREAKER_COOLDOWN', 30.0),
+    )
+
+def get_llm_router(app) -> LLMRouter:
+    """
+    Return the application's shared LLMRouter, creating it on first use.
+
+    Args:
+        app: Flask application owning the router
+
+    Returns:
+        The shared LLMRouter
+    """
+    router = app.extensions.get('llm_router')
+    if router is None:
+        router = router_from_config(app.config)
+        app.extensions['llm_router'] = router
+    return router
+
+def init_app(app):
+    """Expose provider health on /metrics."""
+    if _collect not in registry.collectors:
+        registry.register_collector(_collect)
+
+def _collect():
+    router = current_app.extensions.get('llm_router')
+    if router is None:
+        return []
+    rows = []
+    for row in router.snapshot():
+        labels = {'provider': row['provider'], 'model': row['model']}
+        rows.append(('kairix_llm_error_rate', 'Error rate over the rolling window', 'gauge', labels, row['error_rate']))
+        if row['p95'] is not None:
+            rows.append(('kairix_llm_latency_p95_seconds', 'Rolling p95 latency of successful calls', 'gauge',
+                         labels, row['p95']))
+    for name, breaker in router.breakers.items():
+        rows.append(('kairix_llm_circuit_open', '1 while the provider is skipped', 'gauge', {'provider': name},
+                     int(breaker.state == CircuitBreaker.OPEN)))
+    return rows
@@ -0,0 +1,124 @@
+"""
+Batched bookkeeping of memory accesses for hybrid ranking.
+
+Recalling a memory bumps its access_count and last_accessed_at, but writing
+that on every read would turn each retrieval into row updates on the hot
+path. AccessRecorder only counts accesses in memory; a flusher thread writes
+the accumulated counts in one executemany UPDATE every
+MEMORY_ACCESS_FLUSH_INTERVAL seconds, or sooner once MEMORY_ACCESS_FLUSH_SIZE
+distinct memories are pending. Counts of a process that dies before a flush
+are lost, which only makes ranking slightly less informed.
+"""
+import atexit
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Iterable
+from app.models import db, Memory
+
+logger = logging.getLogger(__name__)
+
+class AccessRecorder:
+    """Accumulates memory accesses and writes them to the database in batches."""
+
+    def __init__(self, app=None, flush_size: int = 500):
+        """
+        Initialize the recorder.
+
+        Args:
+            app: Flask application whose database the flusher writes to
+            flush_size: Pending memories that trigger an early flush
+        """
+        self.app = app
+        self.flush_size = flush_size
+        self._pending = Counter()
+        self._last_accessed_at = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def record(self, memory_ids: Iterable[str]) -> None:
+        """Count one access of each memory; never touches the database."""
+        with self._lock:
+            self._pending.update(memory_ids)
+            self._last_accessed_at = datetime.utcnow()
+            full = len(self._pending) >= self.flush_size
+        if full:
+            self._wake.set()
+
+    def pending(self) -> int:
+        """Memories with accesses not yet written."""
+        return len(self._pending)
+
+    def flush(self) -> int:
+        """
+        Write pending access counts in one statement and commit.
+
+        Must run inside an application context. On failure the counts are
+        put back so the next flush retries them.
+
+        Returns:
+            Number of memories updated
+        """
+        with self._lock:
+            counts, self._pending = self._pending, Counter()
+            accessed_at = self._last_accessed_at
+        if not counts:
+            return 0
+        try:
+            updated = Memory.record_accesses(counts, accessed_at)
+            db.session.commit()
+            return updated
+        except Exception:
+            db.session.rollback()
+            with self._lock:
+                self._pending.update(counts)
+            raise
+
+    def start(self, interval: float) -> None:
+        """Flush every `interval` seconds (or when full) in a daemon thread, and once more at exit."""
+        if self._thread is not None or interval <= 0 or self.app is None:
+            return
+
+        def run():
+            while not self._stop.is_set():
+                self._wake.wait(interval)
+                self._wake.clear()
+                self._flush_in_context()
+
+        self._thread = threading.Thread(target=run, name='memory-access-flusher', daemon=True)
+        self._thread.start()
+        atexit.register(self._flush_in_context)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def _flush_in_context(self) -> None:
+        try:
+            with self.app.app_context():
+                self.flush()
+        except Exception:
+            logger.exception("Flushing memory access counts failed")
+
+def get_access_recorder(app) -> AccessRecorder:
+    """
+    Return the application's shared AccessRecorder, creating it on first use.
+
+    Outside of testing, its flusher thread is started.
+
+    Args:
+        app: Flask application owning the recorder
+
+    Returns:
+        The shared AccessRecorder
+    """
+    recorder = app.extensions.get('memory_access')
+    if recorder is None:
+        recorder = AccessRecorder(app, flush_size=app.config.get('MEMORY_ACCESS_FLUSH_SIZE', 500))
+        if not app.testing:
+            recorder.start(app.config.get('MEMORY_ACCESS_FLUSH_INTERVAL', 10))
+        app.extensions['memory_access'] = recorder
+    return recorder
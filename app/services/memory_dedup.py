@@ -0,0 +1,182 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Tuple
+from sqlalchemy import func
+from app.models import db, Memory, content_hash, DEFAULT_DUPLICATE_SIMILARITY
+
+def _age(memory):
+    """Sort key putting older memories first."""
+    return (memory.created_at or datetime.min, memory.id)
+
+class MemoryCompactor:
+    """
+    Offline compaction of duplicate memories.
+
+    Ingest through `Memory.batch_create` suppresses new duplicates; this job
+    collapses the ones already stored. Within each group of duplicates the
+    oldest memory is kept.
+    """
+
+    def __init__(self, similarity_threshold: float = DEFAULT_DUPLICATE_SIMILARITY, batch_size: int = 500):
+        """
+        Initialize the compactor.
+
+        Args:
+            similarity_threshold: Cosine similarity at which two memories count as duplicates
+            batch_size: Memories processed per query and commit
+        """
+        self.similarity_threshold = similarity_threshold
+        self.batch_size = batch_size
+
+    def backfill_hashes(self) -> Tuple[int, int]:
+        """
+        Compute content hashes for memories stored before hashing existed.
+
+        Legacy memories can repeat each other or an already hashed memory, and
+        writing the same hash twice would violate `uq_memory_content_hash`. So
+        each batch is grouped by computed hash, owner and embedding type first:
+        only the oldest memory of a group keeps its hash, the others are
+        deleted before any hash is written.
+
+        Returns:
+            Numbers of memories hashed and of duplicates deleted
+        """
+        updated = deleted = 0
+        while True:
+            batch = Memory.query.filter(Memory.content_hash.is_(None)).order_by(
+                Memory.created_at, Memory.id
+            ).limit(self.batch_size).all()
+            if not batch:
+                return updated, deleted
+            hashes = {memory.id: content_hash(memory.content) for memory in batch}
+            keepers = {
+                (memory.content_hash, memory.embedding_type, memory.user_id, memory.agent_id): memory
+                for memory in Memory.query.filter(Memory.content_hash.in_(set(hashes.values())))
+            }
+            doomed = []
+            for memory in batch:
+                key = (hashes[memory.id], memory.embedding_type, memory.user_id, memory.agent_id)
+                kept = keepers.get(key)
+                if kept is None or _age(memory) < _age(kept):
+                    if kept is not None:
+                        doomed.append(kept.id)
+                    keepers[key] = memory
+                else:
+                    doomed.append(memory.id)
+            dropped = set(doomed)
+            survivors = [memory for memory in batch if memory.id not in dropped]
+            deleted += self._delete(doomed)
+            for memory in survivors:
+                memory.content_hash = hashes[memory.id]
+            db.session.commit()
+            updated += len(survivors)
+
+    def collapse_exact(self) -> int:
+        """
+        Delete memories whose content hash, owner and embedding type repeat.
+
+        Returns:
+            Number of memories deleted
+        """
+        groups = db.session.query(
+            Memory.content_hash, Memory.embedding_type, Memory.user_id, Memory.agent_id
+        ).filter(
+            Memory.content_hash.isnot(None)
+        ).group_by(
+            Memory.content_hash, Memory.embedding_type, Memory.user_id, Memory.agent_id
+        ).having(func.count(Memory.id) > 1).all()
+
+        doomed = []
+        for hash_, embedding_type, user_id, agent_id in groups:
+            ids = [
+                row.id for row in Memory.owned_by(embedding_type, user_id, agent_id).with_entities(Memory.id).filter(
+                    Memory.content_hash == hash_
+                ).order_by(Memory.created_at, Memory.id)
+            ]
+            doomed.extend(ids[1:])
+        return self._delete(doomed)
+
+    def collapse_near(self) -> int:
+        """
+        Delete memories that are near duplicates of an older memory of the same owner.
+
+        Memories are scanned in keyset-paginated batches; each batch is probed
+        with a single nearest-neighbor query per owner.
+
+        Returns:
+            Number of memories deleted
+        """
+        max_distance = 1 - self.similarity_threshold
+        deleted = set()
+        after_id = None
+        while True:
+            query = Memory.query.filter(Memory.embedding.isnot(None))
+            if after_id is not None:
+                query = query.filter(Memory.id > after_id)
+            batch = query.order_by(Memory.id).limit(self.batch_size).all()
+            if not batch:
+                break
+            after_id = batch[-1].id
+
+            by_owner = defaultdict(list)
+            for memory in batch:
+                if memory.id not in deleted:
+                    by_owner[(memory.embedding_type, memory.user_id, memory.agent_id)].append(memory)
+
+            doomed = []
+            for (embedding_type, user_id, agent_id), memories in by_owner.items():
+                neighbors = Memory.nearest_neighbors(
+                    [memory.embedding for memory in memories],
+                    embedding_type,
+                    user_id=user_id,
+                    agent_id=agent_id,
+                    exclude_ids=[memory.id for memory in memories]
+                )
+                candidates = {
+                    memory.id: neighbor[0]
+                    for memory, neighbor in zip(memories, neighbors)
+                    if neighbor is not None and neighbor[1] <= max_distance and neighbor[0] not in deleted
+                }
+                if not candidates:
+                    continue
+                created = dict(
+                    Memory.query.with_entities(Memory.id, Memory.created_at).filter(
+                        Memory.id.in_(set(candidates.values()))
+                    ).all()
+                )
+                for memory in memories:
+                    neighbor_id = candidates.get(memory.id)
+                    if neighbor_id is None or neighbor_id in deleted or neighbor_id not in created:
+                        continue
+                    # Keep whichever of the pair is older
+                    if (created[neighbor_id], neighbor_id) < (memory.created_at, memory.id):
+                        doomed.append(memory.id)
+                        deleted.add(memory.id)
+            self._delete(doomed)
+        return len(deleted)
+
+    def compact(self) -> dict:
+        """
+        Run all compaction steps.
+
+        Returns:
+            Counts per step
+        """
+        hashed, collapsed = self.backfill_hashes()
+        return {
+            'hashed': hashed,
+            'exact': collapsed + self.collapse_exact(),
+            'near': self.collapse_near()
+        }
+
+    def _delete(self, ids) -> int:
+        deleted = 0
+        for start in range(0, len(ids), self.batch_size):
+            chunk = ids[start:start + self.batch_size]
+            # Keep re-embedding links from dangling
+            Memory.query.filter(Memory.reembedded_from_id.in_(chunk)).update(
+                {Memory.reembedded_from_id: None}, synchronize_session=False
+            )
+            deleted += Memory.query.filter(Memory.id.in_(chunk)).delete(synchronize_session=False)
+            db.session.commit()
+        return deleted
@@ -1,18 +1,72 @@
 from abc import ABC, abstractmethod
-from typing import List
-from app.models import Memory
+from typing import List, Optional
+import numpy as np
+from app.metrics import timed
+from app.replica import use_replica
+from app.models import Agent, Memory, Message, DEFAULT_EMBEDDING_TYPE, get_embedding_dimensions
+
+DEFAULT_MMR_LAMBDA = 0.7
+DEFAULT_FETCH_MULTIPLIER = 4
+SCORING_MODES = ('similarity', 'hybrid')
+
+def mmr_select(query_vector, candidate_vectors, k: int, lambda_mult: float = DEFAULT_MMR_LAMBDA) -> List[int]:
+    """
+    Pick a relevant but diverse subset by maximal marginal relevance.
+    
+    Each step picks the candidate maximizing
+    lambda * sim(query, c) - (1 - lambda) * max(sim(c, selected)).
+    
+    Args:
+        query_vector: Query embedding
+        candidate_vectors: Candidate embeddings, one per row
+        k: Number of candidates to select
+        lambda_mult: 1.0 ranks by relevance only, 0.0 by diversity only
+        
+    Returns:
+        Indices into candidate_vectors in selection order
+    """
+    matrix = np.asarray(candidate_vectors, dtype=np.float32)
+    if matrix.size == 0 or k <= 0:
+        return []
+    matrix = matrix / (np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12)
+    query = np.asarray(query_vector, dtype=np.float32)
+    query = query / (np.linalg.norm(query) + 1e-12)
+    
+    relevance = matrix @ query
+    redundancy = np.full(len(matrix), -np.inf, dtype=np.float32)
+    available = np.ones(len(matrix), dtype=bool)
+    selected = []
+    for _ in range(min(k, len(matrix))):
+        penalty = np.where(np.isfinite(redundancy), redundancy, 0.0)
+        scores = np.where(available, lambda_mult * relevance - (1 - lambda_mult) * penalty, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        # Track each candidate's highest similarity to anything selected so far
+        redundancy = np.maximum(redundancy, matrix @ matrix[best])
+    return selected
 
 class MemoryProvider(ABC):
     """Abstract base class for memory providers."""
     
     @abstractmethod
-    def get_relevant_memories(self, query: str, limit: int = 5) -> List[Memory]:
+    def get_relevant_memories(
+        self,
+        query: str,
+        limit: int = 5,
+        user_id: Optional[str] = None,
+        agent: Optional[Agent] = None,
+        conversation_id: Optional[str] = None
+    ) -> List[Memory]:
         """
         Retrieve relevant memories for a given query.
         
         Args:
             query: The query text to find relevant memories for
             limit: Maximum number of memories to return
+            user_id: Return this user's and global memories (only global ones if None)
+            agent: Only return memories of this agent or shared by all agents
+            conversation_id: Conversation the query comes from
             
         Returns:
             List of Memory objects ordered by relevance
@@ -22,35 +76,182 @@ class MemoryProvider(ABC):
 class NoOpMemoryProvider(MemoryProvider):
     """Memory provider that returns no memories. Used as default."""
     
-    def get_relevant_memories(self, query: str, limit: int = 5) -> List[Memory]:
+    def get_relevant_memories(
+        self,
+        query: str,
+        limit: int = 5,
+        user_id: Optional[str] = None,
+        agent: Optional[Agent] = None,
+        conversation_id: Optional[str] = None
+    ) -> List[Memory]:
         """Return empty list of memories."""
         return []
 
 class VectorMemoryProvider(MemoryProvider):
     """Memory provider that uses vector similarity search."""
     
-    def __init__(self, embedding_service):
+    def __init__(self, embedding_service, embedding_type: str = DEFAULT_EMBEDDING_TYPE,
+                 mmr_lambda: Optional[float] = DEFAULT_MMR_LAMBDA, fetch_multiplier: int = DEFAULT_FETCH_MULTIPLIER,
+                 scoring: str = 'similarity', access_recorder=None):
         """
         Initialize the vector memory provider.
         
         Args:
             embedding_service: Service for generating embeddings
+            embedding_type: Embedding type used for queries; only memories of
+                this type are searched
+            mmr_lambda: Default relevance/diversity trade-off for MMR re-ranking;
+                None ranks by cosine similarity only
+            fetch_multiplier: Default number of candidates fetched per returned memory
+            scoring: Default scoring mode; 'hybrid' also weighs recency,
+                importance and access count (see Memory.find_ranked)
+            access_recorder: AccessRecorder counting recalled memories, if any
         """
+        get_embedding_dimensions(embedding_type)
+        if scoring not in SCORING_MODES:
+            raise ValueError(f"scoring must be one of {SCORING_MODES}")
         self.embedding_service = embedding_service
+        self.embedding_type = embedding_type
+        self.mmr_lambda = mmr_lambda
+        self.fetch_multiplier = fetch_multiplier
+        self.scoring = scoring
+        self.access_recorder = access_recorder
         
-    def get_relevant_memories(self, query: str, limit: int = 5) -> List[Memory]:
+    def _mmr_settings(self, agent: Optional[Agent], limit: int):
+        """
+        Resolve MMR settings, letting the agent's settings["memory"] override the defaults.
+        
+        Returns:
+            (limit, mmr_lambda, fetch_k)
+        """
+        settings = ((agent.settings or {}).get("memory") or {}) if agent is not None else {}
+        limit = settings.get("limit", limit)
+        mmr_lambda = settings.get("mmr_lambda", self.mmr_lambda)
+        fetch_k = settings.get("fetch_k", limit * self.fetch_multiplier)
+        return limit, mmr_lambda, max(fetch_k, limit)
+        
+    def get_relevant_memories(
+        self,
+        query: str,
+        limit: int = 5,
+        user_id: Optional[str] = None,
+        agent: Optional[Agent] = None,
+        conversation_id: Optional[str] = None
+    ) -> List[Memory]:
         """
         Retrieve relevant memories using vector similarity search.
         
+        Over-fetches candidates and re-ranks them by maximal marginal relevance
+        so near-copies of one fact do not crowd out the rest. The agent's
+        settings["memory"] may set "limit", "mmr_lambda" and "fetch_k", and
+        "scoring": "hybrid" with "ranking" weights to rank the candidates by
+        similarity, recency, importance and access count in SQL instead.
+        
         Args:
             query: The query text to find relevant memories for
             limit: Maximum number of memories to return
+            user_id: Search this user's and global memories (only global ones if None)
+            agent: Only search memories of this agent or shared by all agents
             
         Returns:
             List of Memory objects ordered by relevance
         """
+        limit, mmr_lambda, fetch_k = self._mmr_settings(agent, limit)
+        settings = ((agent.settings or {}).get("memory") or {}) if agent is not None else {}
+        scoring = settings.get("scoring", self.scoring)
+        if mmr_lambda is None and scoring != 'hybrid':
+            fetch_k = limit
+        
         # Generate embedding for the query
-        query_embedding = self.embedding_service.create_embedding(query)
+        query_embedding = self.embedding_service.create_embedding(query, embedding_type=self.embedding_type)
+        
+        if scoring == 'hybrid':
+            with timed('find_ranked'), use_replica():
+                ranked = Memory.find_ranked(
+                    query_embedding,
+                    limit=limit,
+                    fetch_k=fetch_k,
+                    weights=settings.get("ranking"),
+                    embedding_type=self.embedding_type,
+                    user_id=user_id,
+                    agent_id=agent.id if agent is not None else None
+                )
+            return self._accessed([memory for memory, _ in ranked])
         
-        # Find similar memories
-        return Memory.find_similar(query_embedding, limit=limit)
+        # Find similar memories; candidates come back with their embeddings
+        with timed('find_similar'), use_replica():
+            candidates = Memory.find_similar(
+                query_embedding,
+                limit=fetch_k,
+                embedding_type=self.embedding_type,
+                user_id=user_id,
+                agent_id=agent.id if agent is not None else None
+            )
+        if mmr_lambda is None or len(candidates) <= 1:
+            return self._accessed(candidates[:limit])
+        
+        with timed('mmr'):
+            order = mmr_select(query_embedding, [m.embedding for m in candidates], limit, mmr_lambda)
+        return self._accessed([candidates[i] for i in order])
+    
+    def _accessed(self, memories: List[Memory]) -> List[Memory]:
+        """Count the recalled memories' accesses; written later in a batch."""
+        if self.access_recorder is not None and memories:
+            self.access_recorder.record(memory.id for memory in memories)
+        return memories
+
+class ConversationHistoryMemoryProvider(MemoryProvider):
+    """Memory provider that recalls what the user said in their other conversations."""
+    
+    def __init__(self, embedding_service, embedding_type: str = DEFAULT_EMBEDDING_TYPE, min_similarity: float = 0.7):
+        """
+        Initialize the conversation history memory provider.
+        
+        Args:
+            embedding_service: Service for generating embeddings
+            embedding_type: Embedding type used for queries; must match the type
+                messages are embedded with (MEMORY_EMBEDDING_TYPE)
+            min_similarity: Minimum cosine similarity of a recalled message
+        """
+        get_embedding_dimensions(embedding_type)
+        self.embedding_service = embedding_service
+        self.embedding_type = embedding_type
+        self.min_similarity = min_similarity
+        
+    def get_relevant_memories(
+        self,
+        query: str,
+        limit: int = 5,
+        user_id: Optional[str] = None,
+        agent: Optional[Agent] = None,
+        conversation_id: Optional[str] = None
+    ) -> List[Message]:
+        """
+        Retrieve the user's past messages most similar to the query.
+        
+        Messages are embedded in the background after they are stored (see
+        app/services/embedding_jobs.py), so the search is one vector query;
+        the current conversation is excluded since it is already in context.
+        
+        Args:
+            query: The query text to find relevant messages for
+            limit: Maximum number of messages to return
+            user_id: User whose conversations are searched; nothing is recalled without one
+            agent: Unused; history is shared across the user's agents
+            conversation_id: Conversation to exclude
+            
+        Returns:
+            List of Message objects ordered by relevance
+        """
+        if user_id is None:
+            return []
+        query_embedding = self.embedding_service.create_embedding(query, embedding_type=self.embedding_type)
+        with timed('find_similar'), use_replica():
+            return Message.find_similar_in_history(
+                query_embedding,
+                user_id,
+                limit=limit,
+                embedding_type=self.embedding_type,
+                exclude_conversation_id=conversation_id,
+                min_similarity=self.min_similarity
+            )
@@ -1,25 +1,47 @@
-import openai
+from contextlib import nullcontext
 from typing import List, Dict, Optional, Any
-from app.config import get_config
-from app.models import Agent
-from .memory_provider import MemoryProvider, NoOpMemoryProvider
+from app.concurrency import released_session
+from app.config import ConfigView, get_config
+from app.metrics import record_token_usage, timed
+from app.models import Agent, DEFAULT_EMBEDDING_TYPE, EMBEDDING_TYPES
+from .embedding_backends import OpenAIEmbeddingBackend, get_embedding_backend
+from .function_registry import get_function_registry
+from .llm_router import LLMRouter, get_llm_router, router_from_config
+from .memory_access import get_access_recorder
+from .memory_provider import (
+    ConversationHistoryMemoryProvider, MemoryProvider, NoOpMemoryProvider, VectorMemoryProvider
+)
 
 class OpenAIService:
-    """Service for interacting with OpenAI's API."""
+    """Service for interacting with OpenAI's API and the other embedding backends."""
     
-    def __init__(self, config=None):
+    def __init__(self, config=None, router: Optional[LLMRouter] = None):
         """
         Initialize the OpenAI service.
         
         Args:
             config: Optional configuration object
+            router: LLMRouter for chat completions (defaults to one built from config on first use)
         """
         self.config = config or get_config()
-        openai.api_key = self.config.OPENAI_API_KEY
         self.default_model = self.config.OPENAI_DEFAULT_MODEL
         self.default_temperature = self.config.OPENAI_DEFAULT_TEMPERATURE
         self.default_max_tokens = self.config.OPENAI_DEFAULT_MAX_TOKENS
         self._memory_provider = NoOpMemoryProvider()
+        self.function_registry = None  # FunctionRegistry supplying each agent's tools
+        self._router = router
+        
+    @property
+    def router(self) -> LLMRouter:
+        """Get the LLMRouter, building it from config on first use."""
+        if self._router is None:
+            self._router = router_from_config(self.config)
+        return self._router
+        
+    @router.setter
+    def router(self, router: LLMRouter):
+        """Set the LLMRouter."""
+        self._router = router
         
     @property
     def memory_provider(self) -> MemoryProvider:
@@ -40,7 +62,11 @@ class OpenAIService:
         max_tokens: Optional[int] = None,
         functions: Optional[List[Dict[str, Any]]] = None,
         function_call: Optional[str] = None,
-        include_memory: bool = True
+        tools: Optional[List[Dict[str, Any]]] = None,
+        include_memory: bool = True,
+        user_id: Optional[str] = None,
+        conversation_id: Optional[str] = None,
+        release_connection: bool = False
     ) -> Dict:
         """
         Create a chat completion using OpenAI's API.
@@ -53,7 +79,15 @@ class OpenAIService:
             max_tokens: Maximum tokens in response
             functions: List of function definitions
             function_call: Control over function calling
+            tools: Tool definitions; the model may request several calls at once.
+                Defaults to the agent's functions from the function registry; pass
+                an empty list to offer none
             include_memory: Whether to include relevant memories in context
+            user_id: User the conversation belongs to; scopes memory search
+            conversation_id: Conversation being answered; history recall excludes it
+            release_connection: Commit the DB session and return its connection
+                to the pool before the memory lookup's embedding call and before
+                waiting on the API (see released_session)
             
         Returns:
             OpenAI API response dictionary
@@ -73,8 +107,14 @@ class OpenAIService:
             )
             
             if latest_user_msg:
-                # Get relevant memories
-                memories = self.memory_provider.get_relevant_memories(latest_user_msg)
+                # Get relevant memories; embedding the query is a network call too
+                with released_session() if release_connection else nullcontext():
+                    memories = self.memory_provider.get_relevant_memories(
+                        latest_user_msg,
+                        user_id=user_id,
+                        agent=agent,
+                        conversation_id=conversation_id
+                    )
                 
                 if memories:
                     # Format memories as context
@@ -113,31 +153,145 @@ class OpenAIService:
             params["functions"] = functions
             if function_call:
                 params["function_call"] = function_call
+        if tools is None and self.function_registry is not None:
+            # Compiled once per agent and registry version; no file access here
+            tools = self.function_registry.payload_for(agent).tools
+        if tools:
+            params["tools"] = tools
                 
         try:
-            response = openai.ChatCompletion.create(**params)
+            with released_session() if release_connection else nullcontext(), timed('chat_completion'):
+                # The agent's provider first, others on failure or when it is slow
+                response = self.router.create_chat_completion(params, provider=agent.provider)
+            record_token_usage(model, response.get("usage"))
             return response
             
         except Exception as e:
             # Re-raise with standardized error message
             raise Exception(f"OpenAI API error: {str(e)}")
         
-    def create_embedding(self, text: str) -> List[float]:
+    def summarize_conversation(
+        self,
+        previous_summary: Optional[str],
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> str:
+        """
+        Fold new messages into a conversation's rolling summary.
+        
+        Args:
+            previous_summary: Summary of everything before these messages, if any
+            messages: New message dictionaries with 'role' and 'content', oldest first
+            model: OpenAI model to use (defaults to OPENAI_SUMMARY_MODEL)
+            max_tokens: Maximum tokens in the summary
+            
+        Returns:
+            The updated summary text
+        """
+        transcript = "\n".join(f"{msg['role']}: {msg['content']}" for msg in messages)
+        prompt = (
+            f"Current summary:\n{previous_summary or '(none)'}\n\n"
+            f"New messages:\n{transcript}\n\n"
+            "Rewrite the summary to include the new messages. Keep facts, decisions, "
+            "open questions and user preferences; drop small talk."
+        )
+        params = {
+            "model": model or getattr(self.config, 'OPENAI_SUMMARY_MODEL', self.default_model),
+            "messages": [
+                {"role": "system", "content": "You maintain a concise running summary of a conversation."},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0,
+            "max_tokens": max_tokens or getattr(self.config, 'OPENAI_SUMMARY_MAX_TOKENS', 400)
+        }
+        try:
+            with timed('summarize'):
+                response = self.router.create_chat_completion(params)
+            record_token_usage(params["model"], response.get("usage"))
+            return response["choices"][0]["message"]["content"].strip()
+            
+        except Exception as e:
+            raise Exception(f"OpenAI API error: {str(e)}")
+        
+    def _embedding_backend(self, embedding_type: str):
+        """Return the backend and EMBEDDING_TYPES entry of an embedding type."""
+        return get_embedding_backend(embedding_type, self.config), EMBEDDING_TYPES[embedding_type]
+        
+    def create_embedding(self, text: str, embedding_type: str = DEFAULT_EMBEDDING_TYPE) -> List[float]:
         """
-        Create an embedding for the given text using OpenAI's API.
+        Create an embedding for the given text with the embedding type's backend.
         
         Args:
             text: The text to create an embedding for
+            embedding_type: Embedding type to produce (see EMBEDDING_TYPES)
             
         Returns:
             List of floats representing the embedding vector
         """
+        backend, spec = self._embedding_backend(embedding_type)
         try:
-            response = openai.Embedding.create(
-                input=text,      
-                model="text-embedding-ada-002"
-            )
-            return response["data"][0]["embedding"]
+            with timed('embedding'):
+                return backend.embed_one(text, spec)
+            
+        except Exception as e:
+            if not isinstance(backend, OpenAIEmbeddingBackend):
+                raise
+            raise Exception(f"OpenAI API error: {str(e)}")
+            
+    def create_embeddings(self, texts: List[str], embedding_type: str = DEFAULT_EMBEDDING_TYPE) -> List[List[float]]:
+        """
+        Create embeddings for several texts in a single backend call.
+        
+        Args:
+            texts: The texts to create embeddings for
+            embedding_type: Embedding type to produce (see EMBEDDING_TYPES)
+            
+        Returns:
+            List of embedding vectors in the same order as texts
+        """
+        if not texts:
+            return []
+        backend, spec = self._embedding_backend(embedding_type)
+        try:
+            with timed('embedding'):
+                return backend.embed(texts, spec)
             
         except Exception as e:
+            if not isinstance(backend, OpenAIEmbeddingBackend):
+                raise
             raise Exception(f"OpenAI API error: {str(e)}")
+
+
+def get_openai_service(app) -> OpenAIService:
+    """
+    Return the application's shared OpenAIService, creating it on first use.
+    
+    The service reads the application's config; the memory provider is chosen
+    by the MEMORY_PROVIDER setting and completions go through the
+    application's LLMRouter.
+    
+    Args:
+        app: Flask application owning the service
+        
+    Returns:
+        The shared OpenAIService instance
+    """
+    service = app.extensions.get('openai_service')
+    if service is None:
+        service = OpenAIService(ConfigView(app.config), router=get_llm_router(app))
+        if app.config.get('MEMORY_PROVIDER') == 'vector':
+            service.memory_provider = VectorMemoryProvider(
+                service,
+                embedding_type=app.config.get('MEMORY_EMBEDDING_TYPE', DEFAULT_EMBEDDING_TYPE),
+                scoring=app.config.get('MEMORY_SCORING', 'similarity'),
+                access_recorder=get_access_recorder(app)
+            )
+        elif app.config.get('MEMORY_PROVIDER') == 'history':
+            service.memory_provider = ConversationHistoryMemoryProvider(
+                service,
+                embedding_type=app.config.get('MEMORY_EMBEDDING_TYPE', DEFAULT_EMBEDDING_TYPE)
+            )
+        service.function_registry = get_function_registry(app)
+        app.extensions['openai_service'] = service
+    return service
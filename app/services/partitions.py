@@ -0,0 +1,185 @@
+"""
+Monthly range partitions of the message table (PostgreSQL only).
+
+Partitions are named message_pYYYYMM and cover [first of month, first of
+next month). A DEFAULT partition catches rows outside every range so an
+insert never fails; keeping partitions created ahead of time keeps it empty.
+Rows that did land there are moved into a month's partition when it is
+created. The job worker keeps partitions ahead with a recurring
+`maintain_message_partitions` job (or run `flask messages partitions`
+from cron).
+"""
+import logging
+from datetime import date, datetime
+from typing import List
+from flask import current_app
+from sqlalchemy import text
+from app.models import db, Job
+from app.services.job_queue import enqueue, job_handler
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = 'message'
+DEFAULT_PARTITION = 'message_default'
+MAINTAIN_PARTITIONS = 'maintain_message_partitions'
+# pg_advisory_xact_lock key serializing partition DDL across processes
+PARTITION_LOCK_KEY = 0x6d736770
+
+def month_start(value) -> date:
+    """First day of the month containing a date or datetime."""
+    return date(value.year, value.month, 1)
+
+def add_months(month: date, months: int) -> date:
+    """Shift a first-of-month date by a number of months."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    """Name of the partition holding a month."""
+    return f'{PARENT_TABLE}_p{month:%Y%m}'
+
+def is_partitioned(conn) -> bool:
+    """Whether the message table exists and is partitioned."""
+    if conn.dialect.name != 'postgresql':
+        return False
+    return bool(conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :name AND c.relnamespace = current_schema()::regnamespace"
+    ), {'name': PARENT_TABLE}).scalar())
+
+def existing_partitions(conn) -> List[str]:
+    """Names of the partitions currently attached to the message table."""
+    return list(conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :name AND p.relnamespace = current_schema()::regnamespace ORDER BY c.relname"
+    ), {'name': PARENT_TABLE}).scalars())
+
+def create_partition(conn, month: date) -> str:
+    """
+    Create the partition for a month.
+
+    PostgreSQL refuses to create a partition while the DEFAULT partition
+    holds rows in its range, so those rows are moved: the default partition
+    is detached, the month's partition created, the rows reinserted through
+    the parent and the default partition attached again.
+    """
+    name = partition_name(month)
+    bounds = {'start': month, 'end': add_months(month, 1)}
+    create = text(
+        f'CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT_TABLE} '
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{bounds['end'].isoformat()}')"
+    )
+    in_range = 'WHERE created_at >= :start AND created_at < :end'
+    stray = conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {'name': DEFAULT_PARTITION}).scalar() and \
+        conn.execute(text(f'SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} {in_range})'), bounds).scalar()
+    if not stray:
+        conn.execute(create)
+        return name
+
+    conn.execute(text(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION {DEFAULT_PARTITION}'))
+    conn.execute(create)
+    moved = conn.execute(text(
+        f'INSERT INTO {PARENT_TABLE} SELECT * FROM {DEFAULT_PARTITION} {in_range}'
+    ), bounds).rowcount
+    conn.execute(text(f'DELETE FROM {DEFAULT_PARTITION} {in_range}'), bounds)
+    conn.execute(text(f'ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT'))
+    logger.info("Moved %d rows from %s into %s", moved, DEFAULT_PARTITION, name)
+    return name
+
+def ensure_partitions(conn, months_ahead: int = 3, start=None) -> List[str]:
+    """
+    Create any missing partitions from `start` (default: this month) through `months_ahead` months later.
+
+    Only missing partitions are created, so this is cheap to run often; creating
+    one briefly locks the parent table. Concurrent callers are serialized by
+    a transaction-level advisory lock; a caller that finds it taken returns
+    without waiting, since the holder is doing the same work.
+
+    Args:
+        conn: Connection to run on
+        months_ahead: Future months to cover
+        start: Date in the first month to cover
+
+    Returns:
+        Names of the partitions created
+    """
+    if not is_partitioned(conn):
+        return []
+    if not conn.execute(text('SELECT pg_try_advisory_xact_lock(:key)'), {'key': PARTITION_LOCK_KEY}).scalar():
+        logger.info("Message partitions are being maintained by another process")
+        return []
+    existing = set(existing_partitions(conn))
+    if DEFAULT_PARTITION not in existing:
+        conn.execute(text(f'CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT'))
+    first = month_start(start or datetime.utcnow())
+    current = month_start(datetime.utcnow())
+    months = (current.year - first.year) * 12 + current.month - first.month + months_ahead
+    created = []
+    for offset in range(months + 1):
+        month = add_months(first, offset)
+        if partition_name(month) not in existing:
+            created.append(create_partition(conn, month))
+    if created:
+        logger.info("Created message partitions: %s", ", ".join(created))
+    return created
+
+def detach_partitions(conn, older_than_months: int, drop: bool = False) -> List[str]:
+    """
+    Detach (and optionally drop) monthly partitions entirely older than a cutoff.
+
+    Detaching is a catalog change rather than row-by-row deletes; a detached
+    partition stays as an ordinary table until dropped or archived elsewhere.
+
+    Args:
+        conn: Connection to run on
+        older_than_months: Partitions ending before this many months ago are detached
+        drop: Drop the partitions after detaching them
+
+    Returns:
+        Names of the partitions detached
+    """
+    if not is_partitioned(conn):
+        return []
+    cutoff = add_months(month_start(datetime.utcnow()), -older_than_months)
+    detached = []
+    for name in existing_partitions(conn):
+        if name == DEFAULT_PARTITION:
+            continue
+        try:
+            month = datetime.strptime(name[len(PARENT_TABLE) + 2:], '%Y%m').date()
+        except ValueError:
+            continue
+        if add_months(month, 1) <= cutoff:
+            conn.execute(text(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}'))
+            if drop:
+                conn.execute(text(f'DROP TABLE {name}'))
+            detached.append(name)
+    return detached
+
+def schedule_partition_maintenance() -> bool:
+    """
+    Queue the recurring partition maintenance job unless one is already queued or running.
+
+    Returns:
+        Whether a job was queued
+    """
+    pending = Job.query.filter(
+        Job.kind == MAINTAIN_PARTITIONS, Job.status.in_(('queued', 'running'))
+    ).first()
+    if pending is not None:
+        return False
+    enqueue(MAINTAIN_PARTITIONS, {})
+    return True
+
+@job_handler(MAINTAIN_PARTITIONS)
+def maintain_partitions(payloads: List[dict]) -> None:
+    """Create upcoming message partitions, then queue the next run."""
+    with db.engine.begin() as conn:
+        ensure_partitions(conn, months_ahead=current_app.config.get('MESSAGE_PARTITIONS_AHEAD', 3))
+    # The running job is this one; another queued run means a second chain was started
+    if Job.query.filter(Job.kind == MAINTAIN_PARTITIONS, Job.status == 'queued').first() is None:
+        enqueue(
+            MAINTAIN_PARTITIONS, {}, delay=current_app.config.get('MESSAGE_PARTITIONS_INTERVAL', 86400),
+            commit=False
+        )
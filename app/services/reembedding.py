@@ -0,0 +1,131 @@
+from typing import Optional
+from sqlalchemy import exists
+from sqlalchemy.orm import aliased
+from app.models import db, Memory, get_embedding_dimensions
+
+class ReembeddingJob:
+    """
+    Migrates a memory store from one embedding type to another without downtime.
+
+    Memories are copied forward in small batches: each source memory gets a
+    sibling row with the target embedding type, linked through
+    `reembedded_from_id`. Searches on the source type keep working until the
+    application is switched to the target type, after which `retire_source`
+    removes the old rows.
+    """
+
+    def __init__(self, embedding_service, source_type: str, target_type: str, batch_size: int = 100):
+        """
+        Initialize the re-embedding job.
+
+        Args:
+            embedding_service: Service providing create_embeddings(texts, embedding_type)
+            source_type: Embedding type to migrate away from
+            target_type: Embedding type to migrate to
+            batch_size: Number of memories embedded per API call and commit
+        """
+        if source_type == target_type:
+            raise ValueError("Source and target embedding types must differ")
+        # Validate both types up front
+        get_embedding_dimensions(source_type)
+        get_embedding_dimensions(target_type)
+
+        self.embedding_service = embedding_service
+        self.source_type = source_type
+        self.target_type = target_type
+        self.batch_size = batch_size
+
+    def _pending_query(self):
+        """Source memories that do not have a target-type copy yet."""
+        copy = aliased(Memory)
+        return Memory.query.filter(
+            Memory.embedding_type == self.source_type,
+            ~exists().where(
+                copy.reembedded_from_id == Memory.id,
+                copy.embedding_type == self.target_type
+            )
+        )
+
+    def pending_count(self) -> int:
+        """Number of source memories still waiting to be re-embedded."""
+        return self._pending_query().count()
+
+    def run_batch(self) -> int:
+        """
+        Re-embed the next batch of pending memories in one API call and commit.
+
+        The job is resumable: pending memories are recomputed on every batch,
+        so it can be stopped and restarted at any point.
+
+        Returns:
+            Number of memories re-embedded (0 when nothing was left)
+        """
+        batch = self._pending_query().order_by(Memory.id).limit(self.batch_size).all()
+        if not batch:
+            return 0
+
+        vectors = self.embedding_service.create_embeddings(
+            [memory.content for memory in batch],
+            embedding_type=self.target_type
+        )
+        copies = []
+        for memory, vector in zip(batch, vectors):
+            Memory._validate_vector(vector, self.target_type)
+            copies.append(Memory(
+                content=memory.content,
+                user_id=memory.user_id,
+                agent_id=memory.agent_id,
+                storage_type=memory.storage_type,
+                embedding_type=self.target_type,
+                embedding=vector,
+                reembedded_from_id=memory.id,
+                created_at=memory.created_at
+            ))
+        db.session.add_all(copies)
+        db.session.commit()
+        return len(copies)
+
+    def run(self, max_batches: Optional[int] = None) -> int:
+        """
+        Re-embed memories until none are pending or max_batches is reached.
+
+        Returns:
+            Number of memories re-embedded
+        """
+        processed = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            count = self.run_batch()
+            if not count:
+                break
+            processed += count
+            batches += 1
+        return processed
+
+    def retire_source(self) -> int:
+        """
+        Delete source memories that have been copied to the target type.
+
+        Run this after the application has switched to the target type.
+
+        Returns:
+            Number of source memories deleted
+        """
+        source_ids = [
+            row.reembedded_from_id for row in Memory.query.with_entities(Memory.reembedded_from_id).filter(
+                Memory.embedding_type == self.target_type,
+                Memory.reembedded_from_id.isnot(None)
+            )
+        ]
+        deleted = 0
+        for start in range(0, len(source_ids), self.batch_size):
+            chunk = source_ids[start:start + self.batch_size]
+            Memory.query.filter(
+                Memory.reembedded_from_id.in_(chunk)
+            ).update({Memory.reembedded_from_id: None}, synchronize_session=False)
+            deleted += Memory.query.filter(
+                Memory.id.in_(chunk),
+                Memory.embedding_type == self.source_type
+            ).delete(synchronize_session=False)
+            db.session.commit()
+        return deleted
@@ -0,0 +1,136 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import and_, delete, or_, select, update
+from app.models import db, Agent, Conversation, Memory, Message, MessageArchive, User
+
+def delete_conversations(condition) -> int:
+    """
+    Delete conversations matching a condition along with their messages and archives.
+
+    The foreign keys cascade on PostgreSQL; children are still deleted first,
+    set-based, so the same statements work where foreign keys are not
+    enforced (SQLite). Nothing is loaded into the session.
+
+    Args:
+        condition: SQL expression over Conversation columns
+
+    Returns:
+        Number of conversations deleted
+    """
+    ids = select(Conversation.id).where(condition)
+    db.session.execute(delete(Message).where(Message.conversation_id.in_(ids)))
+    db.session.execute(delete(MessageArchive).where(MessageArchive.conversation_id.in_(ids)))
+    return db.session.execute(delete(Conversation).where(condition)).rowcount
+
+def _delete_memories(condition) -> None:
+    ids = select(Memory.id).where(condition)
+    db.session.execute(
+        update(Memory).where(Memory.reembedded_from_id.in_(ids)).values(reembedded_from_id=None)
+    )
+    db.session.execute(delete(Memory).where(condition))
+
+def delete_user(user_id: str) -> bool:
+    """
+    Delete a user with their conversations, messages and memories.
+
+    Returns:
+        Whether the user existed
+    """
+    delete_conversations(Conversation.user_id == user_id)
+    _delete_memories(Memory.user_id == user_id)
+    deleted = db.session.execute(delete(User).where(User.id == user_id)).rowcount
+    db.session.commit()
+    return bool(deleted)
+
+def delete_agent(agent_id: str) -> bool:
+    """
+    Delete an agent with its conversations, messages and agent-specific memories.
+
+    Returns:
+        Whether the agent existed
+    """
+    delete_conversations(Conversation.agent_id == agent_id)
+    _delete_memories(Memory.agent_id == agent_id)
+    deleted = db.session.execute(delete(Agent).where(Agent.id == agent_id)).rowcount
+    db.session.commit()
+    return bool(deleted)
+
+class MessageArchiver:
+    """Moves old messages out of the hot message table into compressed archive chunks."""
+
+    def __init__(self, max_age_days: float = 90, batch_size: int = 1000):
+        """
+        Initialize the archiver.
+
+        Args:
+            max_age_days: Messages older than this are archived
+            batch_size: Messages archived per transaction
+        """
+        self.max_age = timedelta(days=max_age_days)
+        self.batch_size = batch_size
+
+    def _eligible(self, cutoff):
+        # Old messages still needed verbatim by the chat context stay hot: only
+        # archive those folded into the summary or from conversations idle since the cutoff
+        summarized = or_(
+            Message.created_at < Conversation.summarized_through_at,
+            and_(Message.created_at == Conversation.summarized_through_at,
+                 Message.id <= Conversation.summarized_through_id)
+        )
+        return Message.query.join(Conversation, Conversation.id == Message.conversation_id).filter(
+            Message.created_at < cutoff,
+            or_(Conversation.last_active_at < cutoff, summarized)
+        )
+
+    def pending_count(self) -> int:
+        """Number of messages currently eligible for archiving."""
+        return self._eligible(datetime.utcnow() - self.max_age).count()
+
+    def run_batch(self) -> int:
+        """
+        Archive one batch of the oldest eligible messages.
+
+        Returns:
+            Number of messages archived
+        """
+        cutoff = datetime.utcnow() - self.max_age
+        query = self._eligible(cutoff).order_by(Message.created_at, Message.id).limit(self.batch_size)
+        if db.engine.dialect.name == 'postgresql':
+            # Concurrent archivers take disjoint batches
+            query = query.with_for_update(of=Message, skip_locked=True)
+        messages = query.all()
+        if not messages:
+            return 0
+
+        by_conversation = defaultdict(list)
+        for message in messages:
+            by_conversation[message.conversation_id].append(message)
+        db.session.add_all(
+            MessageArchive.pack(conversation_id, group) for conversation_id, group in by_conversation.items()
+        )
+        # The created_at bounds let PostgreSQL prune to the partitions holding the batch
+        db.session.execute(
+            delete(Message).where(
+                Message.id.in_([m.id for m in messages]),
+                Message.created_at.between(messages[0].created_at, messages[-1].created_at)
+            ).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return len(messages)
+
+    def run(self, max_batches=None) -> int:
+        """
+        Archive batches until nothing is eligible or max_batches is reached.
+
+        Returns:
+            Total number of messages archived
+        """
+        total = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            archived = self.run_batch()
+            if not archived:
+                break
+            total += archived
+            batches += 1
+        return total
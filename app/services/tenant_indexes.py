@@ -0,0 +1,140 @@
+import hashlib
+import math
+import uuid
+from typing import List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.sql import text
+from app.models import db, Memory, get_embedding_dimensions
+
+class TenantIndexManager:
+    """
+    Manages per-tenant partial vector indexes on the memory table.
+
+    Small tenants are served by the `ix_memory_owner` btree prefilter followed
+    by an exact distance sort over their few rows. Tenants above `min_rows`
+    get a dedicated partial ivfflat index restricted to their rows, so ANN
+    search cost tracks the tenant's size and the tenant filter never has to
+    be applied after the index scan (which would lose recall). Global
+    memories (no owning user) count as one more tenant. Searches query each
+    owner separately (see Memory.nearest) so their predicates match these
+    indexes.
+    """
+
+    def __init__(self, min_rows: int = 10000):
+        """
+        Initialize the tenant index manager.
+
+        Args:
+            min_rows: Number of memories a tenant needs before it gets its own index
+        """
+        self.min_rows = min_rows
+
+    @staticmethod
+    def index_name(user_id: Optional[str], embedding_type: str) -> str:
+        """Stable index name for a tenant (None for global memories), within PostgreSQL's 63 character limit."""
+        owner = 'global' if user_id is None else user_id
+        digest = hashlib.sha1(f"{owner}:{embedding_type}".encode()).hexdigest()[:20]
+        return f"ix_memory_tenant_{digest}"
+
+    @staticmethod
+    def _owner_predicate(user_id: Optional[str]) -> str:
+        """SQL predicate selecting a tenant's rows, from a validated UUID rather than raw input."""
+        if user_id is None:
+            return "user_id IS NULL"
+        try:
+            owner = uuid.UUID(str(user_id))
+        except ValueError:
+            raise ValueError(f"Invalid tenant id: {user_id!r}") from None
+        return f"user_id = '{owner}'"
+
+    @staticmethod
+    def _is_postgres() -> bool:
+        return db.engine.dialect.name == 'postgresql'
+
+    def large_tenants(self) -> List[Tuple[str, str, int]]:
+        """
+        Find tenants big enough to warrant their own index.
+
+        Returns:
+            List of (user_id, embedding_type, row_count) tuples; user_id is None
+            for global memories
+        """
+        rows = db.session.query(
+            Memory.user_id, Memory.embedding_type, func.count(Memory.id)
+        ).group_by(
+            Memory.user_id, Memory.embedding_type
+        ).having(func.count(Memory.id) >= self.min_rows).all()
+        return [(user_id, embedding_type, count) for user_id, embedding_type, count in rows]
+
+    def create_index(self, user_id: Optional[str], embedding_type: str, row_count: int) -> str:
+        """
+        Create a tenant's partial vector index without blocking writes.
+
+        Args:
+            user_id: Tenant to index, or None for global memories
+            embedding_type: Embedding type to index for that tenant
+            row_count: Current number of rows, used to size the ivfflat lists
+
+        Returns:
+            Name of the index
+
+        Raises:
+            ValueError: If the embedding type is unknown or user_id is not a UUID
+        """
+        name = self.index_name(user_id, embedding_type)
+        # Also validates the type, which is rendered into the DDL below
+        dimensions = get_embedding_dimensions(embedding_type)
+        # pgvector guidance: lists = rows / 1000 up to 1M rows, sqrt(rows) beyond
+        lists = max(1, row_count // 1000 if row_count <= 1000000 else int(math.sqrt(row_count)))
+        if not self._is_postgres():
+            return name
+
+        owner = self._owner_predicate(user_id)
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.execute(text(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON memory "
+                f"USING ivfflat ((embedding::vector({dimensions})) vector_cosine_ops) "
+                f"WITH (lists = {lists}) "
+                f"WHERE {owner} AND embedding_type = '{embedding_type}'"
+            ))
+        return name
+
+    def drop_index(self, user_id: Optional[str], embedding_type: str) -> None:
+        """Drop a tenant's partial vector index if it exists."""
+        if not self._is_postgres():
+            return
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {self.index_name(user_id, embedding_type)}"))
+
+    def drop_all(self, connection) -> List[str]:
+        """
+        Drop every tenant index inside the caller's transaction, e.g. before a bulk load.
+
+        Args:
+            connection: Connection whose transaction the drops join
+
+        Returns:
+            Names of the dropped indexes
+        """
+        if not self._is_postgres():
+            return []
+        names = connection.execute(text(
+            "SELECT indexname FROM pg_indexes "
+            "WHERE tablename = 'memory' AND indexname LIKE 'ix\\_memory\\_tenant\\_%'"
+        )).scalars().all()
+        for name in names:
+            connection.execute(text(f'DROP INDEX IF EXISTS "{name}"'))
+        return names
+
+    def ensure_indexes(self) -> List[str]:
+        """
+        Create partial indexes for every tenant above the size threshold.
+
+        Returns:
+            Names of the indexes that were ensured
+        """
+        return [
+            self.create_index(user_id, embedding_type, count)
+            for user_id, embedding_type, count in self.large_tenants()
+        ]
@@ -0,0 +1,207 @@
+"""
+Warm-up of a freshly started process before it takes traffic.
+
+Without it the first requests after a deploy pay for every cold start:
+opening database connections, reading the memory table and vector indexes
+from disk, building the shared services and the first TLS connection to the
+embedding API. `start_warmup`, called by the serving entry points (wsgi.py,
+run.py) and not by CLI commands, runs these steps once per process, in a
+background thread (WARMUP_MODE=background) or before it returns
+(WARMUP_MODE=sync, which keeps a gunicorn worker from accepting requests
+until it is warm):
+
+    connections   Open WARMUP_DB_CONNECTIONS pooled connections per bind
+    prewarm       pg_prewarm the memory table and its indexes into shared buffers
+                  (skipped unless a migration installed the extension)
+    services      Build the shared OpenAIService, router, registries and dispatcher,
+                  and compile the function payloads of up to WARMUP_AGENTS agents
+    embedding     Embed a probe text (and with MEMORY_PROVIDER=vector run one
+                  similarity search), priming the embedding client and query path
+
+Only a failure to connect to the database is fatal; other steps log and
+record their error. `/health/ready` answers 503 until warm-up has finished
+and `/health/live` always answers 200, for load balancer and orchestrator
+probes.
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from flask import jsonify
+from sqlalchemy import text
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+PENDING, RUNNING, READY, FAILED = 'pending', 'running', 'ready', 'failed'
+
+class Warmup:
+    """Runs the warm-up steps once and tracks readiness."""
+
+    def __init__(self, app, db):
+        self.app = app
+        self.db = db
+        self.status = PENDING
+        self.steps = {}  # step -> {'seconds': float, 'error': str or None}
+        self.finished_at = None
+        self._done = threading.Event()
+        self._thread = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status == READY
+
+    def run(self) -> bool:
+        """
+        Run every step in order inside an application context.
+
+        Returns:
+            Whether the process is ready
+        """
+        self.status = RUNNING
+        try:
+            with self.app.app_context():
+                for name, step in (
+                    ('connections', self.open_connections),
+                    ('prewarm', self.prewarm_relations),
+                    ('services', self.prime_services),
+                    ('embedding', self.prime_embedding),
+                ):
+                    start = time.perf_counter()
+                    error = None
+                    try:
+                        step()
+                    except Exception as e:
+                        error = str(e)
+                        logger.warning("Warm-up step %s failed: %s", name, e)
+                        self.db.session.rollback()
+                    seconds = time.perf_counter() - start
+                    self.steps[name] = {'seconds': round(seconds, 4), 'error': error}
+                    registry.observe('kairix_warmup_step_seconds', seconds, 'Duration of startup warm-up steps',
+                                     step=name, outcome='error' if error else 'ok')
+                    if error and name == 'connections':
+                        self.status = FAILED
+                        return False
+            self.status = READY
+            logger.info("Warm-up finished in %.2fs", sum(s['seconds'] for s in self.steps.values()))
+            return True
+        finally:
+            self.finished_at = datetime.utcnow()
+            self._done.set()
+
+    def start(self) -> None:
+        """Run the steps in a daemon thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name='warmup', daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout=None) -> bool:
+        """Block until warm-up has finished; returns whether it did within timeout."""
+        return self._done.wait(timeout)
+
+    def open_connections(self) -> None:
+        """Check out connections up to the pool size so later requests find them open."""
+        wanted = self.app.config.get('WARMUP_DB_CONNECTIONS', 5)
+        for engine in self.db.engines.values():
+            size = engine.pool.size() if hasattr(engine.pool, 'size') else 1
+            connections = []
+            try:
+                for _ in range(max(1, min(wanted, size))):
+                    connection = engine.connect()
+                    connection.execute(text('SELECT 1'))
+                    connections.append(connection)
+            finally:
+                # Back into the pool, still open
+                for connection in connections:
+                    connection.close()
+
+    def prewarm_relations(self) -> None:
+        """Load the memory table and its indexes into shared buffers with pg_prewarm."""
+        session = self.db.session
+        if session.get_bind().dialect.name != 'postgresql':
+            return
+        installed = session.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_prewarm'")).scalar()
+        if not installed:
+            # Installed by a migration; the app role does not create extensions
+            logger.info("pg_prewarm is not installed; skipping prewarm")
+            return
+        blocks = session.execute(text("""
+            SELECT COALESCE(SUM(pg_prewarm(c.oid)), 0)
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = current_schema()
+              AND (c.relname = 'memory' OR (c.relkind = 'i' AND c.relname LIKE 'ix\\_memory\\_%'))
+        """)).scalar()
+        session.commit()
+        logger.info("Prewarmed %s blocks of the memory table and indexes", blocks)
+
+    def prime_services(self) -> None:
+        """Build the shared services and the per-agent function payloads."""
+        from app.models import Agent
+        from app.services.function_dispatch import get_function_dispatcher
+        from app.services.openai_service import get_openai_service
+
+        service = get_openai_service(self.app)
+        get_function_dispatcher(self.app)
+        if service.function_registry is not None:
+            for agent in Agent.query.limit(self.app.config.get('WARMUP_AGENTS', 100)):
+                service.function_registry.payload_for(agent)
+        self.db.session.rollback()
+
+    def prime_embedding(self) -> None:
+        """Embed a probe text and run one similarity search when memory is enabled."""
+        config = self.app.config
+        if config.get('MEMORY_PROVIDER', 'none') == 'none' or not config.get('WARMUP_EMBEDDING', True):
+            return
+        from app.models import Memory
+        from app.services.openai_service import get_openai_service
+
+        embedding_type = config['MEMORY_EMBEDDING_TYPE']
+        vector = get_openai_service(self.app).create_embedding('warm-up', embedding_type=embedding_type)
+        if config['MEMORY_PROVIDER'] == 'vector':
+            Memory.find_similar(vector, limit=1, embedding_type=embedding_type)
+        self.db.session.rollback()
+
+def get_warmup(app):
+    """Return the application's Warmup, or None if init_app did not create one."""
+    return app.extensions.get('warmup')
+
+def init_app(app, db):
+    """
+    Register the health endpoints and the process's Warmup.
+
+    Warm-up itself only runs when a serving entry point calls `start_warmup`,
+    so CLI commands never pay for it. Testing apps and WARMUP_MODE=off are
+    ready immediately.
+    """
+    warmup = Warmup(app, db)
+    app.extensions['warmup'] = warmup
+
+    @app.route('/health/live')
+    def live():
+        return jsonify({"status": "alive"}), 200
+
+    @app.route('/health/ready')
+    def ready():
+        state = get_warmup(app)
+        body = {"status": state.status, "steps": state.steps}
+        if state.ready:
+            return jsonify(body), 200
+        response = jsonify(body)
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
+
+    if app.testing or app.config.get('WARMUP_MODE', 'background') == 'off':
+        warmup.status = READY
+        warmup._done.set()
+
+def start_warmup(app) -> None:
+    """Warm up a serving process according to WARMUP_MODE."""
+    warmup = get_warmup(app)
+    if warmup is None or warmup.status != PENDING:
+        return
+    if app.config.get('WARMUP_MODE', 'background') == 'sync':
+        warmup.run()
+    else:
+        warmup.start()
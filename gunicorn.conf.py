@@ -0,0 +1,32 @@
+"""
+Gunicorn configuration for serving the API.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+By default each worker process runs gevent green threads, so one process can
+hold hundreds of chat turns waiting on the model. Set GUNICORN_WORKER_CLASS=sync
+(or gthread) to fall back to one request per thread.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gevent')
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+# Concurrent green threads per worker
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+if worker_class == 'gevent':
+    # Admit far more concurrent model calls than the thread-based default;
+    # read by app.config when each worker imports the app
+    os.environ.setdefault('ADMISSION_MAX_IN_FLIGHT', '256')
+    os.environ.setdefault('ADMISSION_MAX_QUEUE', '512')
+
+def post_fork(server, worker):
+    if worker_class == 'gevent':
+        # gevent's worker patches the standard library; psycopg2 needs its own hook
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
@@ -0,0 +1,74 @@
+"""multiple embedding types
+
+Makes memory.embedding a dimensionless vector so one table can hold
+embeddings of several types, replaces the single 1536-dimension ivfflat
+index with one partial cosine index per embedding type, and adds
+reembedded_from_id for migrations between types. Vector changes are
+PostgreSQL only. Columns and indexes that db.create_all() already made on
+a newer database are skipped.
+
+Revision ID: 1a7c3e9b5d20
+Revises:
+Create Date: 2026-10-19 08:21:09.104377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1a7c3e9b5d20'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Embedding types at this revision; later types add their own indexes
+EMBEDDING_TYPES = {
+    'openai': 1536,
+    'openai-3-small': 1536,
+    'openai-3-small-512': 512,
+    'openai-3-large-256': 256,
+}
+
+
+def _index_name(embedding_type):
+    return f"ix_memory_embedding_{embedding_type.replace('-', '_')}_cosine"
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = {column['name'] for column in inspector.get_columns('memory')}
+    indexes = {index['name'] for index in inspector.get_indexes('memory')}
+    with op.batch_alter_table('memory', schema=None) as batch_op:
+        if 'reembedded_from_id' not in columns:
+            batch_op.add_column(sa.Column('reembedded_from_id', sa.String(length=36), nullable=True))
+            batch_op.create_foreign_key('memory_reembedded_from_id_fkey', 'memory', ['reembedded_from_id'], ['id'])
+        if 'ix_memory_reembedded_from_id' not in indexes:
+            batch_op.create_index('ix_memory_reembedded_from_id', ['reembedded_from_id'])
+        if 'ix_memory_embedding_type_id' not in indexes:
+            batch_op.create_index('ix_memory_embedding_type_id', ['embedding_type', 'id'])
+
+    op.execute("DROP INDEX IF EXISTS ix_memory_embedding_cosine")
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("ALTER TABLE memory ALTER COLUMN embedding TYPE vector")
+    for name, dimensions in EMBEDDING_TYPES.items():
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS {_index_name(name)} ON memory USING ivfflat "
+            f"((embedding::vector({dimensions})) vector_cosine_ops) WHERE embedding_type = '{name}'"
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for name in EMBEDDING_TYPES:
+            op.execute(f"DROP INDEX IF EXISTS {_index_name(name)}")
+        # Fails while memories of other dimensions exist
+        op.execute("ALTER TABLE memory ALTER COLUMN embedding TYPE vector(1536)")
+        op.execute("CREATE INDEX ix_memory_embedding_cosine ON memory USING ivfflat (embedding)")
+
+    with op.batch_alter_table('memory', schema=None) as batch_op:
+        batch_op.drop_index('ix_memory_embedding_type_id')
+        batch_op.drop_index('ix_memory_reembedded_from_id')
+        batch_op.drop_constraint('memory_reembedded_from_id_fkey', type_='foreignkey')
+        batch_op.drop_column('reembedded_from_id')
@@ -0,0 +1,51 @@
+"""job queue
+
+Creates the job table backing app.services.job_queue, with the partial
+ix_job_claim index over unfinished jobs. Skipped when the table already
+exists (db.create_all() at startup creates it on databases that have not
+been migrated yet).
+
+Revision ID: 2f8e6c0b7a41
+Revises: c93d5a17e4b8
+Create Date: 2026-10-19 08:44:31.215870
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2f8e6c0b7a41'
+down_revision = 'c93d5a17e4b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table('job'):
+        return
+    op.create_table(
+        'job',
+        sa.Column('id', sa.String(length=36), nullable=False),
+        sa.Column('kind', sa.String(length=100), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('run_after', sa.DateTime(), nullable=False),
+        sa.Column('locked_until', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_job_claim', 'job', ['kind', 'status', 'run_after'],
+        postgresql_where=sa.text("status IN ('queued', 'running')")
+    )
+
+
+def downgrade():
+    op.drop_index('ix_job_claim', table_name='job')
+    op.drop_table('job')
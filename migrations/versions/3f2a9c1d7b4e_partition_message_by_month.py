@@ -0,0 +1,111 @@
+"""partition message by month
+
+Converts an existing, unpartitioned message table (as created by
+db.create_all() before partitioning) into a table range-partitioned by
+created_at, with monthly partitions covering existing rows and the next
+three months. Databases created after this change are already partitioned
+and are left alone. PostgreSQL only.
+
+Revision ID: 3f2a9c1d7b4e
+Revises: d5a3c8e1f9b6
+Create Date: 2026-10-19 09:12:44.318205
+
+"""
+from datetime import date, datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2a9c1d7b4e'
+down_revision = 'd5a3c8e1f9b6'
+branch_labels = None
+depends_on = None
+
+# Frozen copies of the app.services.partitions helpers at this revision
+
+
+def _add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def is_partitioned(conn):
+    return bool(conn.execute(sa.text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = 'message' AND c.relnamespace = current_schema()::regnamespace"
+    )).scalar())
+
+
+def ensure_partitions(conn, months_ahead, start):
+    conn.execute(sa.text("CREATE TABLE IF NOT EXISTS message_default PARTITION OF message DEFAULT"))
+    month = date(start.year, start.month, 1)
+    now = datetime.utcnow()
+    last = _add_months(date(now.year, now.month, 1), months_ahead)
+    while month <= last:
+        conn.execute(sa.text(
+            f"CREATE TABLE IF NOT EXISTS message_p{month:%Y%m} PARTITION OF message "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+        ))
+        month = _add_months(month, 1)
+
+
+def upgrade():
+    conn = op.get_bind()
+    if conn.dialect.name != 'postgresql' or is_partitioned(conn):
+        return
+
+    op.execute("LOCK TABLE message IN ACCESS EXCLUSIVE MODE")
+    op.execute("ALTER TABLE message RENAME TO message_unpartitioned")
+    op.execute("ALTER TABLE message_unpartitioned RENAME CONSTRAINT message_pkey TO message_unpartitioned_pkey")
+    op.execute("DROP INDEX IF EXISTS ix_message_conversation_created")
+    op.execute(
+        "UPDATE message_unpartitioned m SET created_at = COALESCE(c.started_at, now()) "
+        "FROM conversation c WHERE c.id = m.conversation_id AND m.created_at IS NULL"
+    )
+
+    op.execute("""
+        CREATE TABLE message (
+            id VARCHAR(36) NOT NULL,
+            conversation_id VARCHAR(36) NOT NULL REFERENCES conversation (id) ON DELETE CASCADE,
+            role VARCHAR(20) NOT NULL,
+            content TEXT NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.create_index('ix_message_conversation_created', 'message', ['conversation_id', 'created_at', 'id'])
+
+    oldest = conn.execute(sa.text("SELECT min(created_at) FROM message_unpartitioned")).scalar()
+    ensure_partitions(conn, months_ahead=3, start=oldest or datetime.utcnow())
+
+    op.execute(
+        "INSERT INTO message (id, conversation_id, role, content, created_at) "
+        "SELECT id, conversation_id, role, content, created_at FROM message_unpartitioned"
+    )
+    op.execute("DROP TABLE message_unpartitioned")
+
+
+def downgrade():
+    conn = op.get_bind()
+    if conn.dialect.name != 'postgresql' or not is_partitioned(conn):
+        return
+
+    op.execute("LOCK TABLE message IN ACCESS EXCLUSIVE MODE")
+    op.execute("""
+        CREATE TABLE message_unpartitioned (
+            id VARCHAR(36) NOT NULL PRIMARY KEY,
+            conversation_id VARCHAR(36) NOT NULL REFERENCES conversation (id) ON DELETE CASCADE,
+            role VARCHAR(20) NOT NULL,
+            content TEXT NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE
+        )
+    """)
+    op.execute(
+        "INSERT INTO message_unpartitioned (id, conversation_id, role, content, created_at) "
+        "SELECT id, conversation_id, role, content, created_at FROM message"
+    )
+    op.execute("DROP TABLE message CASCADE")
+    op.execute("ALTER TABLE message_unpartitioned RENAME TO message")
+    op.execute("ALTER TABLE message RENAME CONSTRAINT message_unpartitioned_pkey TO message_pkey")
+    op.create_index('ix_message_conversation_created', 'message', ['conversation_id', 'created_at', 'id'])
@@ -0,0 +1,55 @@
+"""message embeddings
+
+Adds embedding and embedding_type columns to message, with one partial
+cosine index per embedding type, for cross-conversation recall. Indexes on
+the partitioned table are created on every partition. PostgreSQL only.
+
+Revision ID: 5d1b7e3f0a62
+Revises: 8c4e6b2a9d17
+Create Date: 2026-10-19 16:40:12.904117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision = '5d1b7e3f0a62'
+down_revision = '8c4e6b2a9d17'
+branch_labels = None
+depends_on = None
+
+# Embedding types at this revision; later types add their own indexes
+EMBEDDING_TYPES = {
+    'openai': 1536,
+    'openai-3-small': 1536,
+    'openai-3-small-512': 512,
+    'openai-3-large-256': 256,
+}
+
+
+def _index_name(embedding_type):
+    return f"ix_message_embedding_{embedding_type.replace('-', '_')}_cosine"
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    if 'embedding' not in {column['name'] for column in sa.inspect(op.get_bind()).get_columns('message')}:
+        op.add_column('message', sa.Column('embedding_type', sa.String(length=50), nullable=True))
+        op.add_column('message', sa.Column('embedding', Vector(), nullable=True))
+    for name, dimensions in EMBEDDING_TYPES.items():
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS {_index_name(name)} ON message USING ivfflat "
+            f"((embedding::vector({dimensions})) vector_cosine_ops) WHERE embedding_type = '{name}'"
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for name in EMBEDDING_TYPES:
+        op.execute(f"DROP INDEX IF EXISTS {_index_name(name)}")
+    op.drop_column('message', 'embedding')
+    op.drop_column('message', 'embedding_type')
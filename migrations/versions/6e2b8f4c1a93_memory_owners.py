@@ -0,0 +1,41 @@
+"""memory owners
+
+Adds the owning user_id and agent_id to memory, with the (user_id,
+embedding_type, agent_id) prefilter index for tenant-scoped searches.
+Existing memories stay global (no owner).
+
+Revision ID: 6e2b8f4c1a93
+Revises: 1a7c3e9b5d20
+Create Date: 2026-10-19 08:27:52.630148
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e2b8f4c1a93'
+down_revision = '1a7c3e9b5d20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases made by db.create_all() already have the owner columns
+    if 'user_id' in {column['name'] for column in sa.inspect(op.get_bind()).get_columns('memory')}:
+        return
+    with op.batch_alter_table('memory', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('user_id', sa.String(length=36), nullable=True))
+        batch_op.add_column(sa.Column('agent_id', sa.String(length=36), nullable=True))
+        batch_op.create_foreign_key('memory_user_id_fkey', 'user', ['user_id'], ['id'])
+        batch_op.create_foreign_key('memory_agent_id_fkey', 'agent', ['agent_id'], ['id'])
+        batch_op.create_index('ix_memory_owner', ['user_id', 'embedding_type', 'agent_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('memory', schema=None) as batch_op:
+        batch_op.drop_index('ix_memory_owner')
+        batch_op.drop_constraint('memory_agent_id_fkey', type_='foreignkey')
+        batch_op.drop_constraint('memory_user_id_fkey', type_='foreignkey')
+        batch_op.drop_column('agent_id')
+        batch_op.drop_column('user_id')
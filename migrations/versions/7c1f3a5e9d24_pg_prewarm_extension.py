@@ -0,0 +1,32 @@
+"""pg_prewarm extension
+
+Installs pg_prewarm, which the startup warm-up uses to load the memory
+table and its indexes into shared buffers. Creating an extension needs more
+privileges than the application role has, so it is done here rather than
+at runtime. PostgreSQL only.
+
+Revision ID: 7c1f3a5e9d24
+Revises: e41c9a7b2f08
+Create Date: 2026-10-19 20:14:52.408316
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1f3a5e9d24'
+down_revision = 'e41c9a7b2f08'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_prewarm')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('DROP EXTENSION IF EXISTS pg_prewarm')
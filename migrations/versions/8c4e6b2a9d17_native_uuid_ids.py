@@ -0,0 +1,67 @@
+"""native uuid ids
+
+Converts the String(36) id and reference columns to native uuid columns.
+Existing ids were generated with uuid4 and keep their values; new ids are
+time-ordered UUIDv7. Foreign keys are dropped around the type change and
+recreated. PostgreSQL only.
+
+Revision ID: 8c4e6b2a9d17
+Revises: 3f2a9c1d7b4e
+Create Date: 2026-10-19 14:03:27.551930
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4e6b2a9d17'
+down_revision = '3f2a9c1d7b4e'
+branch_labels = None
+depends_on = None
+
+ID_COLUMNS = {
+    'user': ['id'],
+    'agent': ['id'],
+    'conversation': ['id', 'user_id', 'agent_id', 'summarized_through_id'],
+    'message': ['id', 'conversation_id'],
+    'message_archive': ['id', 'conversation_id'],
+    'memory': ['id', 'user_id', 'agent_id', 'reembedded_from_id'],
+    'job': ['id'],
+}
+
+# (table, column, referenced table, ON DELETE action)
+FOREIGN_KEYS = [
+    ('conversation', 'user_id', 'user', 'CASCADE'),
+    ('conversation', 'agent_id', 'agent', 'CASCADE'),
+    ('message', 'conversation_id', 'conversation', 'CASCADE'),
+    ('message_archive', 'conversation_id', 'conversation', 'CASCADE'),
+    ('memory', 'user_id', 'user', 'CASCADE'),
+    ('memory', 'agent_id', 'agent', 'CASCADE'),
+    ('memory', 'reembedded_from_id', 'memory', 'SET NULL'),
+]
+
+
+def _convert(type_sql, using):
+    for table, column, _, _ in FOREIGN_KEYS:
+        op.execute(f'ALTER TABLE "{table}" DROP CONSTRAINT IF EXISTS {table}_{column}_fkey')
+    for table, columns in ID_COLUMNS.items():
+        op.execute(f'ALTER TABLE "{table}" ' + ', '.join(
+            f'ALTER COLUMN {column} TYPE {type_sql} USING {column}::{using}' for column in columns
+        ))
+    for table, column, referenced, on_delete in FOREIGN_KEYS:
+        op.execute(
+            f'ALTER TABLE "{table}" ADD CONSTRAINT {table}_{column}_fkey FOREIGN KEY ({column}) '
+            f'REFERENCES "{referenced}" (id) ON DELETE {on_delete}'
+        )
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    _convert('uuid', 'uuid')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    _convert('varchar(36)', 'text')
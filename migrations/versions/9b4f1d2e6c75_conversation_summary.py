@@ -0,0 +1,47 @@
+"""conversation summary
+
+Adds the rolling summary, its (created_at, id) watermark and the message
+counters to conversation, and the (conversation_id, created_at, id) index
+the chat route reads the recent tail through.
+
+Revision ID: 9b4f1d2e6c75
+Revises: 2f8e6c0b7a41
+Create Date: 2026-10-19 08:52:47.903514
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b4f1d2e6c75'
+down_revision = '2f8e6c0b7a41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'message_count' not in {column['name'] for column in inspector.get_columns('conversation')}:
+        with op.batch_alter_table('conversation', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('message_count', sa.Integer(), nullable=False, server_default='0'))
+            batch_op.add_column(sa.Column('summary', sa.Text(), nullable=True))
+            batch_op.add_column(sa.Column('summarized_through_at', sa.DateTime(), nullable=True))
+            batch_op.add_column(sa.Column('summarized_through_id', sa.String(length=36), nullable=True))
+            batch_op.add_column(sa.Column('summarized_count', sa.Integer(), nullable=False, server_default='0'))
+        op.execute(
+            "UPDATE conversation SET message_count = "
+            "(SELECT count(*) FROM message WHERE message.conversation_id = conversation.id)"
+        )
+    if 'ix_message_conversation_created' not in {index['name'] for index in inspector.get_indexes('message')}:
+        op.create_index('ix_message_conversation_created', 'message', ['conversation_id', 'created_at', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_message_conversation_created', table_name='message')
+    with op.batch_alter_table('conversation', schema=None) as batch_op:
+        batch_op.drop_column('summarized_count')
+        batch_op.drop_column('summarized_through_id')
+        batch_op.drop_column('summarized_through_at')
+        batch_op.drop_column('summary')
+        batch_op.drop_column('message_count')
@@ -0,0 +1,35 @@
+"""memory ranking signals
+
+Adds importance, access_count and last_accessed_at to memory for hybrid
+ranking (see Memory.find_ranked).
+
+Revision ID: b7e2d4a19c53
+Revises: 5d1b7e3f0a62
+Create Date: 2026-10-19 18:05:41.226310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2d4a19c53'
+down_revision = '5d1b7e3f0a62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'importance' in {column['name'] for column in sa.inspect(op.get_bind()).get_columns('memory')}:
+        return
+    with op.batch_alter_table('memory', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('importance', sa.Float(), nullable=False, server_default='0.5'))
+        batch_op.add_column(sa.Column('access_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('last_accessed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('memory', schema=None) as batch_op:
+        batch_op.drop_column('last_accessed_at')
+        batch_op.drop_column('access_count')
+        batch_op.drop_column('importance')
@@ -0,0 +1,91 @@
+"""memory content hash
+
+Adds memory.content_hash and the uq_memory_content_hash unique index used
+for exact deduplication. Existing memories are hashed first; where several
+share a hash, owner and embedding type, only the oldest is kept. The index
+is built only after that, so it never sees duplicate hashes.
+
+On PostgreSQL the index is NULLS NOT DISTINCT, so global (NULL-owner)
+memories are deduplicated too; this requires PostgreSQL 15 or later.
+
+Revision ID: c93d5a17e4b8
+Revises: 6e2b8f4c1a93
+Create Date: 2026-10-19 08:36:18.472906
+
+"""
+import hashlib
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c93d5a17e4b8'
+down_revision = '6e2b8f4c1a93'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def content_hash(content):
+    # Frozen copy of app.models.content_hash at this revision
+    normalized = ' '.join(content.split())
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def _chunks(items):
+    for start in range(0, len(items), BATCH_SIZE):
+        yield items[start:start + BATCH_SIZE]
+
+
+def upgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    if 'content_hash' not in {column['name'] for column in inspector.get_columns('memory')}:
+        with op.batch_alter_table('memory', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+
+    memory = sa.table(
+        'memory', sa.column('id'), sa.column('content'), sa.column('embedding_type'), sa.column('user_id'),
+        sa.column('agent_id'), sa.column('created_at'), sa.column('content_hash'), sa.column('reembedded_from_id')
+    )
+    rows = conn.execute(
+        sa.select(memory.c.id, memory.c.content, memory.c.embedding_type, memory.c.user_id, memory.c.agent_id)
+        .order_by(memory.c.created_at, memory.c.id)
+    )
+    # Oldest first, so the first memory of each key is the one kept
+    kept, hashes, doomed = set(), [], []
+    for row in rows:
+        digest = content_hash(row.content)
+        key = (digest, row.embedding_type, row.user_id, row.agent_id)
+        if key in kept:
+            doomed.append(row.id)
+        else:
+            kept.add(key)
+            hashes.append({'memory_id': row.id, 'digest': digest})
+
+    for chunk in _chunks(doomed):
+        conn.execute(
+            memory.update().where(memory.c.reembedded_from_id.in_(chunk)).values(reembedded_from_id=None)
+        )
+        conn.execute(memory.delete().where(memory.c.id.in_(chunk)))
+    for chunk in _chunks(hashes):
+        conn.execute(
+            memory.update().where(memory.c.id == sa.bindparam('memory_id'))
+            .values(content_hash=sa.bindparam('digest')),
+            chunk
+        )
+
+    if 'uq_memory_content_hash' in {index['name'] for index in inspector.get_indexes('memory')}:
+        return
+    op.create_index(
+        'uq_memory_content_hash', 'memory', ['content_hash', 'embedding_type', 'user_id', 'agent_id'],
+        unique=True, postgresql_nulls_not_distinct=True,
+        postgresql_where=sa.text('content_hash IS NOT NULL')
+    )
+
+
+def downgrade():
+    op.drop_index('uq_memory_content_hash', table_name='memory')
+    with op.batch_alter_table('memory', schema=None) as batch_op:
+        batch_op.drop_column('content_hash')
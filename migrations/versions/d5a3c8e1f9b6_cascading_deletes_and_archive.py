@@ -0,0 +1,81 @@
+"""cascading deletes and message archive
+
+Recreates the foreign keys from conversations, messages and memories with
+ON DELETE actions, so deleting a user, agent or conversation removes its
+dependants in the database (foreign keys are PostgreSQL only), indexes
+conversation.user_id and agent_id for those cascades, and creates the
+message_archive table unless db.create_all() already did.
+
+Revision ID: d5a3c8e1f9b6
+Revises: 9b4f1d2e6c75
+Create Date: 2026-10-19 09:03:25.376912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a3c8e1f9b6'
+down_revision = '9b4f1d2e6c75'
+branch_labels = None
+depends_on = None
+
+# (table, column, referenced table, ON DELETE action)
+FOREIGN_KEYS = [
+    ('conversation', 'user_id', 'user', 'CASCADE'),
+    ('conversation', 'agent_id', 'agent', 'CASCADE'),
+    ('message', 'conversation_id', 'conversation', 'CASCADE'),
+    ('memory', 'user_id', 'user', 'CASCADE'),
+    ('memory', 'agent_id', 'agent', 'CASCADE'),
+    ('memory', 'reembedded_from_id', 'memory', 'SET NULL'),
+]
+
+
+def _recreate_foreign_keys(with_actions):
+    for table, column, referenced, on_delete in FOREIGN_KEYS:
+        action = f' ON DELETE {on_delete}' if with_actions else ''
+        op.execute(f'ALTER TABLE "{table}" DROP CONSTRAINT IF EXISTS {table}_{column}_fkey')
+        op.execute(
+            f'ALTER TABLE "{table}" ADD CONSTRAINT {table}_{column}_fkey FOREIGN KEY ({column}) '
+            f'REFERENCES "{referenced}" (id){action}'
+        )
+
+
+def upgrade():
+    conn = op.get_bind()
+    if conn.dialect.name == 'postgresql':
+        _recreate_foreign_keys(with_actions=True)
+    inspector = sa.inspect(conn)
+    indexes = {index['name'] for index in inspector.get_indexes('conversation')}
+    if 'ix_conversation_user_id' not in indexes:
+        op.create_index('ix_conversation_user_id', 'conversation', ['user_id'])
+    if 'ix_conversation_agent_id' not in indexes:
+        op.create_index('ix_conversation_agent_id', 'conversation', ['agent_id'])
+
+    if inspector.has_table('message_archive'):
+        return
+    op.create_table(
+        'message_archive',
+        sa.Column('id', sa.String(length=36), nullable=False),
+        sa.Column('conversation_id', sa.String(length=36), nullable=False),
+        sa.Column('first_created_at', sa.DateTime(), nullable=False),
+        sa.Column('last_created_at', sa.DateTime(), nullable=False),
+        sa.Column('message_count', sa.Integer(), nullable=False),
+        sa.Column('payload', sa.LargeBinary(), nullable=False),
+        sa.Column('archived_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ['conversation_id'], ['conversation.id'], name='message_archive_conversation_id_fkey', ondelete='CASCADE'
+        ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_message_archive_conversation_id', 'message_archive', ['conversation_id'])
+
+
+def downgrade():
+    op.drop_index('ix_message_archive_conversation_id', table_name='message_archive')
+    op.drop_table('message_archive')
+    op.drop_index('ix_conversation_agent_id', table_name='conversation')
+    op.drop_index('ix_conversation_user_id', table_name='conversation')
+    if op.get_bind().dialect.name == 'postgresql':
+        _recreate_foreign_keys(with_actions=False)
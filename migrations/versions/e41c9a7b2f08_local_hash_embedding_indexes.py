@@ -0,0 +1,44 @@
+"""local-hash-384 embedding indexes
+
+Adds the partial cosine indexes of the local-hash-384 embedding type on
+memory and message. The message index may already exist on databases
+upgraded while the message embeddings migration still indexed every type
+in the live EMBEDDING_TYPES registry. PostgreSQL only.
+
+Revision ID: e41c9a7b2f08
+Revises: b7e2d4a19c53
+Create Date: 2026-10-19 18:52:07.615032
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e41c9a7b2f08'
+down_revision = 'b7e2d4a19c53'
+branch_labels = None
+depends_on = None
+
+EMBEDDING_TYPE = 'local-hash-384'
+DIMENSIONS = 384
+
+
+def _index_name(table):
+    return f"ix_{table}_embedding_{EMBEDDING_TYPE.replace('-', '_')}_cosine"
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table in ('memory', 'message'):
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS {_index_name(table)} ON {table} USING ivfflat "
+            f"((embedding::vector({DIMENSIONS})) vector_cosine_ops) WHERE embedding_type = '{EMBEDDING_TYPE}'"
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table in ('memory', 'message'):
+        op.execute(f"DROP INDEX IF EXISTS {_index_name(table)}")
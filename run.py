@@ -1,6 +1,8 @@
 from app import create_app
+from app.warmup import start_warmup
 
 
 if __name__ == '__main__':
     app = create_app()
+    start_warmup(app)
     app.run()
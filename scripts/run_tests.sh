@@ -27,6 +27,12 @@ case $SUITE in
         export FLASK_CONFIG=devtest
         PYTHONPATH=. pytest --cov=app tests/e2e/ -v
         ;;
+    "bench")
+        export FLASK_CONFIG=testing
+        mkdir -p bench
+        PYTHONPATH=. python -m tests.benchmarks.run --database-url "${BENCH_DATABASE_URL:-sqlite:///:memory:}" \
+            --output "bench/$(git rev-parse --short HEAD).json"
+        ;;
     "all")
         echo "Running all test suites..."
         
@@ -39,7 +45,7 @@ case $SUITE in
         PYTHONPATH=. pytest --cov=app tests/e2e/ -v
         ;;
     *)
-        echo "Invalid test suite specified. Available options: unit, e2e, all"
+        echo "Invalid test suite specified. Available options: unit, e2e, bench, all"
         exit 1
         ;;
 esac
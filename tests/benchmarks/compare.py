@@ -0,0 +1,54 @@
+"""
+Compare two benchmark result files.
+
+Usage:
+    python -m tests.benchmarks.compare baseline.json current.json --threshold 0.2
+
+Exits with status 1 when any benchmark's p50 regressed by more than the threshold.
+"""
+import argparse
+import json
+import sys
+
+def _key(result):
+    return result["name"], json.dumps(result.get("params", {}), sort_keys=True)
+
+def compare(baseline, current, threshold=0.2):
+    """
+    Pair up benchmarks by name and parameters.
+
+    Returns:
+        List of (name, params, baseline_p50, current_p50, ratio, regressed) tuples
+    """
+    before = {_key(r): r for r in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        key = _key(result)
+        if key not in before:
+            continue
+        old, new = before[key]["p50_ms"], result["p50_ms"]
+        ratio = new / old if old else float("inf")
+        rows.append((key[0], key[1], old, new, ratio, ratio > 1 + threshold))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative p50 slowdown")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    rows = compare(baseline, current, args.threshold)
+    print(f"{'benchmark':<28} {'params':<40} {'base p50':>10} {'new p50':>10} {'ratio':>7}")
+    for name, params, old, new, ratio, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<28} {params[:40]:<40} {old:>10.3f} {new:>10.3f} {ratio:>7.2f}{flag}")
+    return 1 if any(row[-1] for row in rows) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""Synthetic data generator for benchmarks."""
+import uuid
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import insert
+from app.ids import uuid7
+from app.models import db, User, Agent, Conversation, Message, Memory, content_hash, get_embedding_dimensions
+
+WORDS = (
+    "tea coffee cat dog travel music book film garden code meeting family "
+    "birthday project deadline recipe running weekend holiday doctor school"
+).split()
+
+def random_unit_vectors(count, dimensions, rng):
+    """Return a (count, dimensions) float32 matrix of random unit-norm rows."""
+    vectors = rng.standard_normal((count, dimensions)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+def random_sentence(rng, words=8):
+    """Return a random sentence made of a small vocabulary."""
+    return " ".join(rng.choice(WORDS, size=words))
+
+def generate_users(count, rng):
+    """Insert `count` users and return their ids."""
+    rows = [
+        {"id": uuid7(), "name": f"User {i}", "email": f"user{i}-{uuid.uuid4().hex[:8]}@example.com",
+         "created_at": datetime.utcnow()}
+        for i in range(count)
+    ]
+    db.session.execute(insert(User), rows)
+    db.session.commit()
+    return [row["id"] for row in rows]
+
+def generate_agents(count):
+    """Insert `count` agents and return their ids."""
+    rows = [
+        {"id": uuid7(), "provider": "openai", "system_message": "You are a helpful assistant.",
+         "settings": {}}
+        for _ in range(count)
+    ]
+    db.session.execute(insert(Agent), rows)
+    db.session.commit()
+    return [row["id"] for row in rows]
+
+def generate_conversations(user_ids, agent_ids, per_user, messages_per_conversation, rng):
+    """
+    Insert conversations with alternating user/assistant messages.
+
+    Returns:
+        List of conversation ids
+    """
+    conversation_ids = []
+    start = datetime.utcnow() - timedelta(days=30)
+    for user_id in user_ids:
+        conversations = [
+            {"id": uuid7(), "user_id": user_id, "agent_id": agent_ids[rng.integers(len(agent_ids))],
+             "started_at": start, "last_active_at": start}
+            for _ in range(per_user)
+        ]
+        db.session.execute(insert(Conversation), conversations)
+        messages = [
+            {"id": uuid7(), "conversation_id": conversation["id"],
+             "role": "user" if i % 2 == 0 else "assistant", "content": random_sentence(rng),
+             "created_at": start + timedelta(minutes=i)}
+            for conversation in conversations
+            for i in range(messages_per_conversation)
+        ]
+        if messages:
+            db.session.execute(insert(Message), messages)
+        conversation_ids.extend(conversation["id"] for conversation in conversations)
+    db.session.commit()
+    return conversation_ids
+
+def generate_memories(count, rng, embedding_type="openai", user_ids=None, batch_size=1000):
+    """
+    Insert `count` memories with random unit-norm embeddings.
+
+    Memories are spread evenly over `user_ids` when given, otherwise global.
+    """
+    dimensions = get_embedding_dimensions(embedding_type)
+    for start in range(0, count, batch_size):
+        size = min(batch_size, count - start)
+        vectors = random_unit_vectors(size, dimensions, rng)
+        rows = []
+        for i in range(size):
+            content = f"{random_sentence(rng)} #{start + i}"
+            rows.append({
+                "id": uuid7(),
+                "user_id": user_ids[(start + i) % len(user_ids)] if user_ids else None,
+                "content": content,
+                "content_hash": content_hash(content),
+                "storage_type": "postgres",
+                "embedding_type": embedding_type,
+                "embedding": vectors[i],
+                "created_at": datetime.utcnow(),
+                "updated_at": datetime.utcnow()
+            })
+        db.session.execute(insert(Memory), rows)
+        db.session.commit()
+
+def reset_database():
+    """Drop and recreate all tables."""
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
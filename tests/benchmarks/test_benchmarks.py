@@ -0,0 +1,31 @@
+import numpy as np
+from tests.benchmarks import synthetic
+from tests.benchmarks.compare import compare
+from tests.benchmarks.run import run_suite
+
+def test_random_unit_vectors():
+    """Test generated embeddings are unit-norm."""
+    vectors = synthetic.random_unit_vectors(10, 64, np.random.default_rng(0))
+    assert vectors.shape == (10, 64)
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+
+def test_run_suite_smoke(tmp_path):
+    """Test the suite runs end to end on a tiny SQLite dataset."""
+    document = run_suite(
+        f"sqlite:///{tmp_path / 'bench.db'}", sizes=[20, 40], repeat=2,
+        users=2, conversations_per_user=1, messages_per_conversation=4, id_rows=100
+    )
+    names = {r["name"] for r in document["results"]}
+    assert {"memory.find_similar", "memory.batch_create", "route.messages.timeline", "route.users.list",
+            "ids.insert"} <= names
+    variants = {r["params"]["variant"] for r in document["results"] if r["name"] == "ids.insert"}
+    assert variants == {"uuid4-string", "uuid7-native"}
+    assert document["meta"]["database"] == "sqlite"
+    assert all(r["p50_ms"] >= 0 for r in document["results"])
+
+def test_compare_flags_regressions():
+    """Test comparison pairs results by name and params."""
+    baseline = {"results": [{"name": "a", "params": {"rows": 1}, "p50_ms": 1.0}]}
+    current = {"results": [{"name": "a", "params": {"rows": 1}, "p50_ms": 1.5}]}
+    [(name, _, old, new, ratio, regressed)] = compare(baseline, current, threshold=0.2)
+    assert (name, old, new, regressed) == ("a", 1.0, 1.5, True)
@@ -20,4 +20,39 @@ def client(app):
 @pytest.fixture
 def runner(app):
     """Create a test CLI runner for the app."""
-    return app.test_cli_runner()
\ No newline at end of file
+    return app.test_cli_runner()
+
+@pytest.fixture
+def chat_completion():
+    """Build OpenAI chat completion responses for mocked API calls."""
+    from openai.types.chat import ChatCompletion
+
+    def build(*messages, usage=None):
+        return ChatCompletion.model_validate({
+            'id': 'chatcmpl-test',
+            'object': 'chat.completion',
+            'created': 0,
+            'model': 'test',
+            'choices': [
+                {'index': i, 'finish_reason': 'stop', 'message': message} for i, message in enumerate(messages)
+            ],
+            'usage': usage
+        })
+    return build
+
+@pytest.fixture
+def embedding_response():
+    """Build OpenAI embedding responses for mocked API calls."""
+    from openai.types import CreateEmbeddingResponse
+
+    def build(*embeddings, indexes=None):
+        indexes = indexes or range(len(embeddings))
+        return CreateEmbeddingResponse.model_validate({
+            'object': 'list',
+            'model': 'test',
+            'data': [
+                {'object': 'embedding', 'index': i, 'embedding': e} for i, e in zip(indexes, embeddings)
+            ],
+            'usage': {'prompt_tokens': 0, 'total_tokens': 0}
+        })
+    return build
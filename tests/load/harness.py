@@ -0,0 +1,253 @@
+"""
+End-to-end load test for the chat path.
+
+Drives concurrent chat turns (and optional timeline reads) through the HTTP
+API and reports throughput, latency percentiles and error rates per endpoint.
+
+Usage against a running app (started with OPENAI_API_BASE pointing at the mock):
+    python -m tests.load.mock_llm --port 8089 &
+    OPENAI_API_BASE=http://127.0.0.1:8089/v1 flask run &
+    python -m tests.load.harness --target http://127.0.0.1:5000 --concurrency 32 --duration 60
+
+Self-contained run (mock LLM and app started in-process on a SQLite file):
+    python -m tests.load.harness --spawn --concurrency 16 --duration 30
+"""
+import argparse
+import json
+import math
+import os
+import random
+import re
+import statistics
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+
+ID_PATTERN = re.compile(r"/[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+class Recorder:
+    """Thread-safe collection of (endpoint, status, latency) samples."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint, status, seconds):
+        with self._lock:
+            self.samples[endpoint].append(seconds * 1000)
+            self.statuses[endpoint][status] += 1
+            if status is None or status >= 400:
+                self.errors[endpoint] += 1
+
+    def report(self, elapsed):
+        """
+        Summarize the samples.
+
+        Args:
+            elapsed: Wall-clock duration of the run in seconds
+
+        Returns:
+            Dictionary keyed by endpoint with throughput, latency percentiles and error rate
+        """
+        summary = {}
+        for endpoint, values in sorted(self.samples.items()):
+            ordered = sorted(values)
+            summary[endpoint] = {
+                "requests": len(ordered),
+                "throughput_rps": len(ordered) / elapsed if elapsed else 0.0,
+                "error_rate": self.errors[endpoint] / len(ordered),
+                "mean_ms": statistics.fmean(ordered),
+                "p50_ms": percentile(ordered, 0.50),
+                "p95_ms": percentile(ordered, 0.95),
+                "p99_ms": percentile(ordered, 0.99),
+                "statuses": {str(k): v for k, v in self.statuses[endpoint].items()}
+            }
+        return summary
+
+class LoadTest:
+    """Concurrent chat-turn driver."""
+
+    def __init__(self, target, concurrency=8, duration=None, turns=None, read_ratio=0.2, timeout=60):
+        """
+        Initialize the load test.
+
+        Args:
+            target: Base URL of the API, e.g. http://127.0.0.1:5000
+            concurrency: Number of simulated users, each in its own conversation
+            duration: Seconds to run for (ignored when turns is given)
+            turns: Chat turns per simulated user
+            read_ratio: Probability of a timeline read after each chat turn
+            timeout: Per-request timeout in seconds
+        """
+        if duration is None and turns is None:
+            raise ValueError("Either duration or turns is required")
+        self.target = target.rstrip("/")
+        self.concurrency = concurrency
+        self.duration = duration
+        self.turns = turns
+        self.read_ratio = read_ratio
+        self.timeout = timeout
+        self.recorder = Recorder()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency * 2)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _request(self, method, path, **kwargs):
+        endpoint = f"{method} {ID_PATTERN.sub('/<id>', path)}"
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, self.target + path, timeout=self.timeout, **kwargs)
+        except requests.RequestException:
+            self.recorder.record(endpoint, None, time.perf_counter() - start)
+            return None
+        self.recorder.record(endpoint, response.status_code, time.perf_counter() - start)
+        return response
+
+    def setup(self):
+        """Create an agent, and a user with one conversation per simulated user."""
+        agent = self._request("POST", "/api/agents/", json={
+            "provider": "openai", "system_message": "You are a load test assistant.", "settings": {}
+        }).json()
+        conversation_ids = []
+        for i in range(self.concurrency):
+            user = self._request("POST", "/api/users/", json={
+                "name": f"Load Test {i}", "email": f"load-{i}-{time.time_ns()}@example.com"
+            }).json()
+            conversation_ids.append(self._request("POST", "/api/conversations/", json={
+                "user_id": user["id"], "agent_id": agent["id"]
+            }).json()["id"])
+        return conversation_ids
+
+    def _simulate_user(self, conversation_id, deadline, rng_seed):
+        rng = random.Random(rng_seed)
+        turn = 0
+        while (self.turns is not None and turn < self.turns) or (self.turns is None and time.monotonic() < deadline):
+            self._request("POST", f"/api/conversations/{conversation_id}/chat",
+                          json={"content": f"Load test message {turn}"})
+            if rng.random() < self.read_ratio:
+                self._request("GET", f"/api/messages/{conversation_id}")
+            turn += 1
+
+    def run(self):
+        """
+        Run the load test.
+
+        Returns:
+            Report dictionary with run parameters and per-endpoint results
+        """
+        conversation_ids = self.setup()
+        # Setup requests are not part of the measured load
+        self.recorder = Recorder()
+        deadline = time.monotonic() + (self.duration or 0)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            list(executor.map(self._simulate_user, conversation_ids, [deadline] * len(conversation_ids),
+                              range(len(conversation_ids))))
+        elapsed = time.perf_counter() - start
+        return {
+            "target": self.target,
+            "concurrency": self.concurrency,
+            "elapsed_seconds": elapsed,
+            "endpoints": self.recorder.report(elapsed)
+        }
+
+def format_report(report):
+    """Render a report as a text table."""
+    lines = [
+        f"{report['concurrency']} users for {report['elapsed_seconds']:.1f}s against {report['target']}",
+        f"{'endpoint':<42} {'reqs':>7} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}"
+    ]
+    for endpoint, stats in report["endpoints"].items():
+        lines.append(
+            f"{endpoint:<42} {stats['requests']:>7} {stats['throughput_rps']:>8.1f} {stats['p50_ms']:>9.1f} "
+            f"{stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f} {stats['error_rate']:>6.1%}"
+        )
+    return "\n".join(lines)
+
+def spawn_stack(mock_options, database_url=None):
+    """
+    Start the mock LLM and the app in-process.
+
+    Returns:
+        (app_base_url, stop_callable)
+    """
+    from werkzeug.serving import make_server
+    from .mock_llm import MockLLMServer
+
+    mock = MockLLMServer(**mock_options).start()
+    # Services built from the config module rather than app.config read these at import
+    os.environ["OPENAI_API_BASE"] = mock.base_url
+    os.environ.setdefault("OPENAI_API_KEY", "mock-key")
+    from app import create_app
+
+    database_url = database_url or f"sqlite:///{tempfile.mkdtemp()}/load.db"
+    # Per-user rate limits would cap each simulated user's turns; measure the server instead
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": database_url,
+        "ADMISSION_USER_RATE": 0,
+        "OPENAI_API_BASE": mock.base_url,
+        "OPENAI_API_KEY": os.environ["OPENAI_API_KEY"]
+    })
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    def stop():
+        server.shutdown()
+        mock.stop()
+
+    return f"http://127.0.0.1:{server.server_port}", stop
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", help="Base URL of a running app")
+    parser.add_argument("--spawn", action="store_true", help="Start the mock LLM and app in-process")
+    parser.add_argument("--database-url", help="Database for --spawn (defaults to a temporary SQLite file)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--turns", type=int, help="Chat turns per user instead of a fixed duration")
+    parser.add_argument("--read-ratio", type=float, default=0.2)
+    parser.add_argument("--chat-latency", default="lognormal:6.2:0.5", help="Mock latency spec for --spawn")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Mock error rate for --spawn")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    stop = None
+    target = args.target
+    if args.spawn:
+        target, stop = spawn_stack(
+            {"chat_latency": args.chat_latency, "error_rate": args.error_rate}, args.database_url
+        )
+    elif not target:
+        parser.error("--target or --spawn is required")
+
+    try:
+        report = LoadTest(
+            target, concurrency=args.concurrency, duration=None if args.turns else args.duration,
+            turns=args.turns, read_ratio=args.read_ratio
+        ).run()
+    finally:
+        if stop:
+            stop()
+
+    print(format_report(report))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Local mock of the OpenAI chat-completions and embeddings endpoints.
+
+Usage:
+    python -m tests.load.mock_llm --port 8089 --chat-latency lognormal:6.2:0.5 --error-rate 0.01
+
+Then point the app at it with OPENAI_API_BASE=http://127.0.0.1:8089/v1.
+
+Latency specs are in milliseconds:
+    fixed:<ms>                  constant delay
+    uniform:<low>:<high>        uniform between low and high
+    normal:<mean>:<stddev>      normal, truncated at zero
+    lognormal:<mu>:<sigma>      exp(N(mu, sigma)), heavy-tailed like real LLM latency
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+def parse_latency(spec):
+    """
+    Turn a latency spec into a sampler returning seconds.
+
+    Args:
+        spec: Latency spec string, see module docstring
+
+    Returns:
+        Zero-argument callable returning a delay in seconds
+    """
+    kind, *args = spec.split(":")
+    args = [float(a) for a in args]
+    if kind == "fixed":
+        return lambda: args[0] / 1000
+    if kind == "uniform":
+        return lambda: random.uniform(args[0], args[1]) / 1000
+    if kind == "normal":
+        return lambda: max(0.0, random.gauss(args[0], args[1])) / 1000
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(args[0], args[1]) / 1000
+    raise ValueError(f"Unknown latency distribution: {kind}")
+
+def fake_embedding(text, dimensions=1536):
+    """Deterministic unit-norm embedding derived from the text."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimensions)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+class MockLLMServer:
+    """Threaded HTTP server imitating the OpenAI API with configurable behavior."""
+
+    def __init__(self, host="127.0.0.1", port=0, chat_latency="fixed:0", embedding_latency="fixed:0",
+                 error_rate=0.0, rate_limit_rate=0.0, stream_token_delay_ms=0.0, reply_tokens=20):
+        """
+        Initialize the mock server.
+
+        Args:
+            host: Interface to bind
+            port: Port to bind; 0 picks a free port
+            chat_latency: Latency spec for chat completions (time to first token when streaming)
+            embedding_latency: Latency spec for embeddings
+            error_rate: Fraction of requests answered with a 500 error
+            rate_limit_rate: Fraction of requests answered with a 429 error
+            stream_token_delay_ms: Delay between streamed chunks
+            reply_tokens: Number of words in each reply
+        """
+        self.chat_latency = parse_latency(chat_latency)
+        self.embedding_latency = parse_latency(embedding_latency)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.stream_token_delay = stream_token_delay_ms / 1000
+        self.reply_tokens = reply_tokens
+        self.request_counts = {"chat": 0, "embeddings": 0}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        """Serve in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Shut the server down."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def _count(self, endpoint):
+        with self._lock:
+            self.request_counts[endpoint] += 1
+
+    def _handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, body):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _injected_error(self):
+                roll = random.random()
+                if roll < mock.error_rate:
+                    self._send_json(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+                    return True
+                if roll < mock.error_rate + mock.rate_limit_rate:
+                    self._send_json(429, {"error": {"message": "Injected rate limit", "type": "rate_limit_error"}})
+                    return True
+                return False
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                path = self.path.rstrip("/")
+                if path.endswith("/chat/completions"):
+                    mock._count("chat")
+                    self._chat(body)
+                elif path.endswith("/embeddings"):
+                    mock._count("embeddings")
+                    self._embeddings(body)
+                else:
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+            def _chat(self, body):
+                time.sleep(mock.chat_latency())
+                if self._injected_error():
+                    return
+                words = ["mock"] * mock.reply_tokens
+                prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+                completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+                model = body.get("model", "mock-model")
+                if body.get("stream"):
+                    self._stream(completion_id, model, words)
+                    return
+                self._send_json(200, {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": " ".join(words)},
+                        "finish_reason": "stop"
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": len(words),
+                        "total_tokens": prompt_tokens + len(words)
+                    }
+                })
+
+            def _stream(self, completion_id, model, words):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                def chunk(data):
+                    encoded = f"data: {data}\n\n".encode("utf-8")
+                    self.wfile.write(f"{len(encoded):X}\r\n".encode() + encoded + b"\r\n")
+                    self.wfile.flush()
+
+                for i, word in enumerate(words):
+                    if i:
+                        time.sleep(mock.stream_token_delay)
+                    chunk(json.dumps({
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "model": model,
+                        "choices": [{"index": 0, "delta": {"content": (" " if i else "") + word}, "finish_reason": None}]
+                    }))
+                chunk(json.dumps({
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+                }))
+                chunk("[DONE]")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _embeddings(self, body):
+                time.sleep(mock.embedding_latency())
+                if self._injected_error():
+                    return
+                inputs = body.get("input", [])
+                if isinstance(inputs, str):
+                    inputs = [inputs]
+                dimensions = body.get("dimensions", 1536)
+                self._send_json(200, {
+                    "object": "list",
+                    "model": body.get("model", "mock-embedding"),
+                    "data": [
+                        {"object": "embedding", "index": i, "embedding": fake_embedding(text, dimensions)}
+                        for i, text in enumerate(inputs)
+                    ],
+                    "usage": {"prompt_tokens": sum(len(t.split()) for t in inputs), "total_tokens": 0}
+                })
+
+        return Handler
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--chat-latency", default="lognormal:6.2:0.5")
+    parser.add_argument("--embedding-latency", default="lognormal:3.9:0.4")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--stream-token-delay-ms", type=float, default=20.0)
+    args = parser.parse_args(argv)
+
+    server = MockLLMServer(
+        host=args.host, port=args.port, chat_latency=args.chat_latency,
+        embedding_latency=args.embedding_latency, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, stream_token_delay_ms=args.stream_token_delay_ms
+    )
+    print(f"Mock LLM listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
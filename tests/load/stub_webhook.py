@@ -0,0 +1,117 @@
+"""
+Local stub of Zapier-style catch hooks for function-call tests.
+
+Usage:
+    python -m tests.load.stub_webhook --port 8090 --latency fixed:200
+
+Every POST to /hooks/<name> is recorded and answered with
+{"ok": true, "hook": <name>, "echo": <request body>} after the configured
+latency. Per-hook latency and status can be overridden in code.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .mock_llm import parse_latency
+
+class StubWebhookServer:
+    """Threaded HTTP server recording webhook calls and answering with canned responses."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency="fixed:0"):
+        """
+        Initialize the stub server.
+
+        Args:
+            host: Interface to bind
+            port: Port to bind; 0 picks a free port
+            latency: Default latency spec (see tests.load.mock_llm)
+        """
+        self.latency = parse_latency(latency)
+        self.hook_latency = {}  # hook name -> latency spec overriding the default
+        self.hook_status = {}  # hook name -> HTTP status to answer with
+        self.requests = []  # (hook name, headers, body) in arrival order
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    def url(self, hook):
+        """URL of a hook."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/hooks/{hook}"
+
+    def set_latency(self, hook, spec):
+        self.hook_latency[hook] = parse_latency(spec)
+
+    def count(self, hook):
+        """Number of calls a hook received."""
+        with self._lock:
+            return sum(1 for name, _, _ in self.requests if name == hook)
+
+    def start(self):
+        """Serve in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Shut the server down."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                hook = self.path.rstrip("/").rsplit("/", 1)[-1]
+                with stub._lock:
+                    stub.requests.append((hook, dict(self.headers), body))
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                try:
+                    time.sleep(stub.hook_latency.get(hook, stub.latency)())
+                    status = stub.hook_status.get(hook, 200)
+                    payload = json.dumps({"ok": status < 400, "hook": hook, "echo": body}).encode("utf-8")
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+        return Handler
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", default="fixed:0")
+    args = parser.parse_args(argv)
+
+    server = StubWebhookServer(host=args.host, port=args.port, latency=args.latency)
+    print(f"Stub webhooks listening on {server.url('<name>')}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import json
+import pytest
+import requests
+from tests.load.harness import LoadTest, percentile, spawn_stack
+from tests.load.mock_llm import MockLLMServer, parse_latency
+
+@pytest.fixture
+def mock_llm():
+    """Start a mock LLM server."""
+    server = MockLLMServer(reply_tokens=3).start()
+    yield server
+    server.stop()
+
+def test_parse_latency():
+    """Test latency specs produce delays in seconds."""
+    assert parse_latency("fixed:250")() == 0.25
+    assert 0.1 <= parse_latency("uniform:100:200")() <= 0.2
+    with pytest.raises(ValueError):
+        parse_latency("bogus:1")
+
+def test_mock_chat_completion(mock_llm):
+    """Test the mock answers chat completions with usage."""
+    response = requests.post(f"{mock_llm.base_url}/chat/completions", json={
+        "model": "gpt-4", "messages": [{"role": "user", "content": "Hello there"}]
+    })
+    body = response.json()
+    assert body["choices"][0]["message"]["content"] == "mock mock mock"
+    assert body["usage"]["prompt_tokens"] == 2
+
+def test_mock_streaming(mock_llm):
+    """Test the mock streams server-sent events."""
+    response = requests.post(f"{mock_llm.base_url}/chat/completions", json={
+        "model": "gpt-4", "messages": [], "stream": True
+    }, stream=True)
+    events = [line[len("data: "):] for line in response.iter_lines(decode_unicode=True) if line]
+    assert events[-1] == "[DONE]"
+    content = "".join(json.loads(e)["choices"][0]["delta"].get("content", "") for e in events[:-1])
+    assert content == "mock mock mock"
+
+def test_mock_embeddings(mock_llm):
+    """Test the mock returns deterministic embeddings of the requested size."""
+    body = requests.post(f"{mock_llm.base_url}/embeddings", json={"input": ["a", "b"], "dimensions": 8}).json()
+    assert [len(d["embedding"]) for d in body["data"]] == [8, 8]
+    again = requests.post(f"{mock_llm.base_url}/embeddings", json={"input": "a", "dimensions": 8}).json()
+    assert again["data"][0]["embedding"] == body["data"][0]["embedding"]
+
+def test_mock_error_injection():
+    """Test configured error rates are applied."""
+    server = MockLLMServer(error_rate=1.0).start()
+    try:
+        response = requests.post(f"{server.base_url}/chat/completions", json={"messages": []})
+        assert response.status_code == 500
+    finally:
+        server.stop()
+
+def test_percentile():
+    """Test nearest-rank percentiles."""
+    values = list(range(1, 101))
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile([], 0.5) == 0.0
+
+def test_load_test_end_to_end(monkeypatch, tmp_path):
+    """Test the harness drives chat turns through the API against the mock."""
+    monkeypatch.setenv("OPENAI_API_BASE", "unset")
+    target, stop = spawn_stack({"reply_tokens": 2}, f"sqlite:///{tmp_path / 'load.db'}")
+    try:
+        report = LoadTest(target, concurrency=3, turns=2, read_ratio=1.0).run()
+    finally:
+        stop()
+
+    chat = report["endpoints"]["POST /api/conversations/<id>/chat"]
+    assert chat["requests"] == 6
+    assert chat["error_rate"] == 0
+    assert chat["p99_ms"] >= chat["p50_ms"]
+    assert report["endpoints"]["GET /api/messages/<id>"]["requests"] == 6
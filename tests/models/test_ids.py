@@ -0,0 +1,40 @@
+import time
+import uuid
+import pytest
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import StatementError
+from app.ids import InvalidId, UUIDType, uuid7, uuid7_timestamp
+from app.models import db, User
+
+def test_uuid7_is_time_ordered():
+    """Test generated ids are valid version 7 UUIDs, strictly increasing and carry the current time."""
+    ids = [uuid7() for _ in range(5000)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+    assert {uuid.UUID(i).version for i in ids} == {7}
+    assert abs(uuid7_timestamp(ids[-1]) - time.time()) < 5
+
+def test_uuid_type_binds_per_dialect():
+    """Test ids are validated for native PostgreSQL columns and passed through elsewhere."""
+    column_type = UUIDType()
+    value = uuid7()
+    assert column_type.process_bind_param(uuid.UUID(value), postgresql.dialect()) == value
+    assert column_type.process_bind_param('test-user', sqlite.dialect()) == 'test-user'
+    with pytest.raises(InvalidId):
+        column_type.process_bind_param('test-user', postgresql.dialect())
+
+def test_models_default_to_uuid7(app):
+    """Test new rows get UUIDv7 ids."""
+    user = User(name='Test', email='test@example.com')
+    db.session.add(user)
+    db.session.commit()
+    assert uuid.UUID(user.id).version == 7
+
+def test_invalid_id_is_not_found(app, client):
+    """Test a non-UUID id rejected by the column type answers 404."""
+    @app.route('/invalid-id')
+    def invalid_id():
+        raise StatementError('bind failed', None, None, InvalidId('bad'))
+
+    response = client.get('/invalid-id')
+    assert response.status_code == 404
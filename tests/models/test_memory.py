@@ -1,6 +1,7 @@
 import pytest
 import numpy as np
-from app.models import db, Memory
+from datetime import datetime, timedelta
+from app.models import db, Memory, ranking_weights, truncate_embedding
 
 @pytest.fixture
 def sample_vector():
@@ -91,3 +92,142 @@ def test_invalid_vector_dimension(app):
                 embedding=[1.0, 2.0]  # Wrong dimension
             )
             memory.update_embedding([1.0, 2.0])  # Should raise ValueError
+
+def test_embedding_types_side_by_side(app):
+    """Test storing and searching memories of different embedding types."""
+    with app.app_context():
+        db.session.add_all([
+            Memory(content="Ada memory", embedding=np.random.rand(1536).tolist()),
+            Memory(
+                content="Small memory",
+                embedding_type="openai-3-small-512",
+                embedding=np.random.rand(512).tolist()
+            )
+        ])
+        db.session.commit()
+
+        results = Memory.find_similar(np.random.rand(512).tolist(), embedding_type="openai-3-small-512")
+        assert [m.content for m in results] == ["Small memory"]
+
+        with pytest.raises(ValueError):
+            Memory.find_similar(np.random.rand(1536).tolist(), embedding_type="openai-3-small-512")
+
+def test_update_embedding_switches_type(app, sample_vector):
+    """Test moving a memory to another embedding type."""
+    with app.app_context():
+        memory = Memory(content="Test content", embedding=sample_vector)
+        db.session.add(memory)
+        db.session.commit()
+
+        memory.update_embedding(np.random.rand(256).tolist(), embedding_type="openai-3-large-256")
+        db.session.commit()
+
+        updated = Memory.query.first()
+        assert updated.embedding_type == "openai-3-large-256"
+        assert len(updated.embedding) == 256
+
+def test_batch_create_validates_dimensions(app):
+    """Test that batch_create rejects vectors of the wrong dimension."""
+    with app.app_context():
+        with pytest.raises(ValueError):
+            Memory.batch_create(["Content"], [np.random.rand(1536).tolist()], embedding_type="openai-3-small-512")
+
+def test_truncate_embedding():
+    """Test Matryoshka truncation re-normalizes the vector."""
+    truncated = truncate_embedding(np.random.rand(1536), 256)
+    assert len(truncated) == 256
+    assert np.isclose(np.linalg.norm(truncated), 1.0)
+
+def test_batch_create_skips_exact_duplicates(app):
+    """Test that repeated content is stored once."""
+    with app.app_context():
+        vector = np.random.rand(1536).tolist()
+        first = Memory.batch_create(["Likes tea"], [vector], user_id="user-1")
+        again = Memory.batch_create(["Likes  tea", "Likes tea"], [vector, vector], user_id="user-1")
+
+        assert Memory.query.count() == 1
+        assert [m.id for m in again] == [first[0].id, first[0].id]
+
+def test_batch_create_skips_near_duplicates(app):
+    """Test that near-identical embeddings are treated as duplicates."""
+    with app.app_context():
+        vector = np.random.rand(1536)
+        Memory.batch_create(["Likes tea"], [vector.tolist()])
+        Memory.batch_create(["Enjoys tea"], [(vector + 0.001).tolist()])
+
+        assert [m.content for m in Memory.query.all()] == ["Likes tea"]
+
+def test_batch_create_merge_policy(app):
+    """Test that the merge policy overwrites the stored duplicate."""
+    with app.app_context():
+        vector = np.random.rand(1536)
+        original = Memory.batch_create(["Likes tea"], [vector.tolist()])[0]
+        merged = Memory.batch_create(["Enjoys tea"], [(vector + 0.001).tolist()], on_duplicate="merge")[0]
+
+        assert merged.id == original.id
+        assert Memory.query.one().content == "Enjoys tea"
+
+def test_batch_create_duplicates_are_per_owner(app):
+    """Test that the same content may be stored for different users."""
+    with app.app_context():
+        vector = np.random.rand(1536).tolist()
+        Memory.batch_create(["Likes tea"], [vector], user_id="user-1")
+        Memory.batch_create(["Likes tea"], [vector], user_id="user-2")
+
+        assert Memory.query.count() == 2
+
+def test_find_ranked_weighs_recency_importance_and_access(app, sample_vector):
+    """Test hybrid ranking lets recency, importance and use outrank a slightly closer match."""
+    with app.app_context():
+        now = datetime.utcnow()
+        closest = Memory(content="Closest but stale", embedding=sample_vector,
+                         created_at=now - timedelta(days=60), updated_at=now - timedelta(days=60), importance=0.1)
+        fresh = Memory(content="Fresh and important", embedding=(np.array(sample_vector) * 0.98 + 0.02).tolist(),
+                       created_at=now, updated_at=now, importance=0.9, access_count=20)
+        db.session.add_all([closest, fresh])
+        db.session.commit()
+
+        by_similarity = Memory.find_ranked(sample_vector, limit=2, now=now,
+                                           weights={'recency': 0, 'importance': 0, 'access': 0})
+        assert [m.content for m, _ in by_similarity] == ["Closest but stale", "Fresh and important"]
+
+        ranked = Memory.find_ranked(sample_vector, limit=2, now=now)
+        assert [m.content for m, _ in ranked] == ["Fresh and important", "Closest but stale"]
+        assert ranked[0][1] > ranked[1][1]
+
+def test_ranking_weights_validation():
+    assert ranking_weights({'recency': 1})['recency'] == 1.0
+    with pytest.raises(ValueError):
+        ranking_weights({'freshness': 1})
+    with pytest.raises(ValueError):
+        ranking_weights({'half_life_hours': 0})
+
+def test_record_accesses(app, sample_vector):
+    """Test access counts of many memories are added in one batch."""
+    with app.app_context():
+        memories = [Memory(content=f"Memory {i}", embedding=sample_vector) for i in range(3)]
+        db.session.add_all(memories)
+        db.session.commit()
+        accessed_at = datetime(2026, 1, 1)
+
+        assert Memory.record_accesses({memories[0].id: 2, memories[1].id: 1}, accessed_at) == 2
+        db.session.commit()
+        db.session.expire_all()
+        assert [m.access_count for m in memories] == [2, 1, 0]
+        assert memories[0].last_accessed_at == accessed_at
+        assert memories[2].last_accessed_at is None
+
+def test_find_ranked_scopes_owners(app, sample_vector):
+    """Test ranked search returns the user's and global memories, and only global ones unscoped."""
+    with app.app_context():
+        db.session.add_all([
+            Memory(content="User A's", user_id="user-a", embedding=sample_vector),
+            Memory(content="User B's", user_id="user-b", embedding=sample_vector),
+            Memory(content="Global", embedding=sample_vector)
+        ])
+        db.session.commit()
+
+        assert {m.content for m, _ in Memory.find_ranked(sample_vector, limit=10)} == {"Global"}
+        ranked = Memory.find_ranked(sample_vector, limit=10, user_id="user-b")
+        assert {m.content for m, _ in ranked} == {"User B's", "Global"}
+        assert {m.content for m in Memory.find_similar(sample_vector, limit=10)} == {"Global"}
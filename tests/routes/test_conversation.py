@@ -1,4 +1,8 @@
 import json
+from unittest.mock import patch
+from app.models import db, Conversation, Job
+from app.services.embedding_jobs import EMBED_MESSAGES
+from app.services.openai_service import get_openai_service
 
 def test_create_conversation(client):
     """Test creating a conversation"""
@@ -14,4 +18,109 @@ def test_create_conversation(client):
 def test_get_conversations(client):
     """Test retrieving all conversations"""
     response = client.get('/api/conversations/')
-    assert response.status_code == 200
\ No newline at end of file
+    assert response.status_code == 200
+def test_chat_turn(client, chat_completion):
+    """Test a chat turn stores both messages and returns the reply"""
+    agent = client.post('/api/agents/', json={'provider': 'openai', 'system_message': 'Be brief.'})
+    agent_id = json.loads(agent.data)['id']
+    conversation = client.post('/api/conversations/', json={'user_id': 'test-user', 'agent_id': agent_id})
+    conversation_id = json.loads(conversation.data)['id']
+
+    with patch('openai.resources.chat.completions.Completions.create') as mock_completion:
+        mock_completion.return_value = chat_completion(
+            {"role": "assistant", "content": "Hi!"},
+            usage={"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12}
+        )
+        response = client.post(f'/api/conversations/{conversation_id}/chat', json={'content': 'Hello'})
+
+    assert response.status_code == 200
+    assert json.loads(response.data)['message']['content'] == 'Hi!'
+    sent = mock_completion.call_args[1]['messages']
+    assert sent[0] == {'role': 'system', 'content': 'Be brief.'}
+    assert sent[-1] == {'role': 'user', 'content': 'Hello'}
+
+    messages = json.loads(client.get(f'/api/messages/{conversation_id}').data)
+    assert [m['role'] for m in messages] == ['user', 'assistant']
+
+def test_chat_unknown_conversation(client):
+    """Test chatting in a missing conversation"""
+    response = client.post('/api/conversations/missing/chat', json={'content': 'Hello'})
+    assert response.status_code == 404
+
+def test_chat_releases_connection_during_completion(app, client, chat_completion):
+    """Test no transaction is open while looking up memories or waiting on the model"""
+    agent_id = json.loads(client.post('/api/agents/', json={'provider': 'openai'}).data)['id']
+    conversation = client.post('/api/conversations/', json={'user_id': 'test-user', 'agent_id': agent_id})
+    conversation_id = json.loads(conversation.data)['id']
+    in_transaction = []
+
+    def memories(*args, **kwargs):
+        in_transaction.append(('memories', db.session().in_transaction()))
+        return []
+
+    def completion(**params):
+        in_transaction.append(('completion', db.session().in_transaction()))
+        return chat_completion({"role": "assistant", "content": "Hi!"})
+
+    service = get_openai_service(app)
+    with patch.object(service.memory_provider, 'get_relevant_memories', side_effect=memories), \
+         patch('openai.resources.chat.completions.Completions.create', side_effect=completion):
+        response = client.post(f'/api/conversations/{conversation_id}/chat', json={'content': 'Hello'})
+
+    assert response.status_code == 200
+    assert in_transaction == [('memories', False), ('completion', False)]
+    messages = json.loads(client.get(f'/api/messages/{conversation_id}').data)
+    assert [m['role'] for m in messages] == ['user', 'assistant']
+
+def test_chat_model_error_keeps_user_message(app, client):
+    """Test a failed model call still counts and embeds the stored user message"""
+    app.config.update(MEMORY_PROVIDER='history', MEMORY_EMBEDDING_TYPE='local-hash-384')
+    agent_id = json.loads(client.post('/api/agents/', json={'provider': 'openai'}).data)['id']
+    conversation = client.post('/api/conversations/', json={'user_id': 'test-user', 'agent_id': agent_id})
+    conversation_id = json.loads(conversation.data)['id']
+
+    with patch('openai.resources.chat.completions.Completions.create', side_effect=Exception("API Error")):
+        response = client.post(f'/api/conversations/{conversation_id}/chat', json={'content': 'Hello'})
+
+    assert response.status_code == 502
+    messages = json.loads(client.get(f'/api/messages/{conversation_id}').data)
+    assert [m['role'] for m in messages] == ['user']
+    db.session.expire_all()
+    assert db.session.get(Conversation, conversation_id).message_count == 1
+    jobs = Job.query.filter_by(kind=EMBED_MESSAGES).all()
+    assert [job.payload['message_id'] for job in jobs] == [messages[0]['id']]
+
+def test_chat_executes_function_calls(client, chat_completion):
+    """Test requested function calls are executed and their results sent back for the final answer"""
+    agent = client.post('/api/agents/', json={'provider': 'openai', 'settings': {'functions': [{
+        'name': 'get_weather', 'description': 'Weather for a city',
+        'parameters': {'type': 'object', 'properties': {'city': {'type': 'string'}}},
+        'webhook_url': 'http://hooks.invalid/weather', 'idempotent': True
+    }]}})
+    agent_id = json.loads(agent.data)['id']
+    conversation = client.post('/api/conversations/', json={'user_id': 'test-user', 'agent_id': agent_id})
+    conversation_id = json.loads(conversation.data)['id']
+    calls = [
+        {'id': f'call_{city}', 'type': 'function',
+         'function': {'name': 'get_weather', 'arguments': json.dumps({'city': city})}}
+        for city in ('Oslo', 'Lima')
+    ]
+    replies = iter([
+        chat_completion({"role": "assistant", "content": None, "tool_calls": calls}),
+        chat_completion({"role": "assistant", "content": "Cold in Oslo, mild in Lima."})
+    ])
+
+    with patch('openai.resources.chat.completions.Completions.create', side_effect=lambda **params: next(replies)) as mock_completion, \
+            patch('app.services.function_dispatch.FunctionDispatcher.dispatch_to_zapier',
+                  side_effect=lambda spec, arguments: {'city': arguments['city'], 'temp': 3}):
+        response = client.post(f'/api/conversations/{conversation_id}/chat', json={'content': 'Weather?'})
+
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data['message']['content'] == 'Cold in Oslo, mild in Lima.'
+    assert [c['arguments']['city'] for c in data['function_calls']] == ['Oslo', 'Lima']
+    first, second = [c[1] for c in mock_completion.call_args_list]
+    assert first['tools'][0]['function']['name'] == 'get_weather'
+    assert 'webhook_url' not in first['tools'][0]['function']
+    assert [m['role'] for m in second['messages'][-3:]] == ['assistant', 'tool', 'tool']
+    assert json.loads(second['messages'][-1]['content']) == {'city': 'Lima', 'temp': 3}
@@ -0,0 +1,36 @@
+import json
+from unittest.mock import patch
+from app.services.job_queue import Worker
+from app.models import Memory
+
+def test_create_memories_deferred(client, app):
+    """Test memories are stored immediately and embedded by the worker."""
+    response = client.post('/api/memories/', json={
+        'contents': ['Likes tea', 'Owns a cat', 'Likes tea'],
+        'user_id': 'user-1'
+    })
+    assert response.status_code == 202
+    data = json.loads(response.data)
+    assert [m['embedding_status'] for m in data] == ['pending'] * 3
+    assert data[0]['id'] == data[2]['id']
+
+    with patch('app.services.openai_service.OpenAIService.create_embeddings',
+               side_effect=lambda texts, embedding_type: [[0.1] * 1536 for _ in texts]) as mock_embed:
+        assert Worker(app, kinds=['embed_memories']).run_once() == 2
+    mock_embed.assert_called_once()
+
+    response = client.get(f"/api/memories/{data[0]['id']}")
+    assert json.loads(response.data)['embedding_status'] == 'ready'
+    assert Memory.query.filter(Memory.embedding.is_(None)).count() == 0
+
+def test_create_memories_requires_content(client):
+    """Test validation of the request body."""
+    response = client.post('/api/memories/', json={})
+    assert response.status_code == 400
+
+def test_job_stats(client):
+    """Test the queue stats endpoint."""
+    client.post('/api/memories/', json={'content': 'Likes tea'})
+    response = client.get('/api/jobs/stats')
+    assert response.status_code == 200
+    assert json.loads(response.data)['depth'] == 1
@@ -1,4 +1,7 @@
 import json
+from unittest.mock import patch
+from app.models import Message
+from app.services.job_queue import Worker
 
 def test_create_message(client):
     """Test creating a message"""
@@ -16,4 +19,30 @@ def test_create_message(client):
     assert response.status_code == 201
     data = json.loads(response.data)
     assert data['role'] == 'user'
-    assert data['content'] == 'Hello!'
\ No newline at end of file
+    assert data['content'] == 'Hello!'
+
+def test_messages_embedded_for_history_recall(app, client):
+    """Test user messages are embedded in the background when history recall is enabled"""
+    app.config['MEMORY_PROVIDER'] = 'history'
+    conversation = client.post('/api/conversations/', json={'user_id': 'test-user', 'agent_id': 'test-agent'})
+    conversation_id = json.loads(conversation.data)['id']
+    for role, content in [('user', 'I love green tea'), ('assistant', 'Noted!')]:
+        client.post('/api/messages/', json={'conversation_id': conversation_id, 'role': role, 'content': content})
+
+    with patch('app.services.openai_service.OpenAIService.create_embeddings',
+               side_effect=lambda texts, embedding_type: [[0.1] * 1536 for _ in texts]) as mock_embed:
+        assert Worker(app, kinds=['embed_messages']).run_once() == 1
+    mock_embed.assert_called_once_with(['I love green tea'], embedding_type='openai')
+    embedded = {m.content: m.embedding_type for m in Message.query.all()}
+    assert embedded == {'I love green tea': 'openai', 'Noted!': None}
+
+def test_embed_command_backfills(app, runner):
+    """Test the embed CLI queues messages stored before recall was enabled"""
+    app.config['MEMORY_PROVIDER'] = 'history'
+    client = app.test_client()
+    conversation = client.post('/api/conversations/', json={'user_id': 'test-user', 'agent_id': 'test-agent'})
+    conversation_id = json.loads(conversation.data)['id']
+    app.config['MEMORY_PROVIDER'] = 'none'
+    client.post('/api/messages/', json={'conversation_id': conversation_id, 'role': 'user', 'content': 'Hi'})
+    result = runner.invoke(args=['messages', 'embed', '--batch-size', '1'])
+    assert 'Queued 1 messages for embedding' in result.output
@@ -0,0 +1,84 @@
+import json
+import threading
+from unittest.mock import patch
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from app.metrics import MetricsRegistry
+from app.models import db
+
+def test_server_timing_header(client):
+    """Test every response carries a Server-Timing breakdown"""
+    response = client.get('/api/users/')
+    assert response.status_code == 200
+    timing = response.headers['Server-Timing']
+    assert 'db;dur=' in timing
+    assert 'total;dur=' in timing
+
+def test_chat_phases_and_token_usage(client, chat_completion):
+    """Test a chat turn reports its LLM phase and token usage"""
+    agent_id = json.loads(client.post('/api/agents/', json={'provider': 'openai'}).data)['id']
+    conversation = client.post('/api/conversations/', json={'user_id': 'test-user', 'agent_id': agent_id})
+    conversation_id = json.loads(conversation.data)['id']
+
+    with patch('openai.resources.chat.completions.Completions.create') as mock_completion:
+        mock_completion.return_value = chat_completion(
+            {"role": "assistant", "content": "Hi!"},
+            usage={"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12}
+        )
+        response = client.post(f'/api/conversations/{conversation_id}/chat', json={'content': 'Hello'})
+
+    assert 'chat_completion;dur=' in response.headers['Server-Timing']
+
+    metrics = client.get('/metrics')
+    assert metrics.status_code == 200
+    body = metrics.data.decode()
+    assert '# TYPE kairix_http_request_duration_seconds histogram' in body
+    assert 'phase="chat_completion",route="/api/conversations/<string:conversation_id>/chat"' in body
+    assert 'kairix_openai_tokens_total{model="text-davinci-003",type="completion"}' in body
+    assert '# TYPE kairix_job_oldest_ready_age_seconds gauge' in body
+
+def test_registry_render():
+    """Test the Prometheus text rendering of histograms and counters"""
+    registry = MetricsRegistry()
+    registry.observe('latency_seconds', 0.003, 'Latency', route='/x')
+    registry.observe('latency_seconds', 2.0, route='/x')
+    registry.inc('events_total', 3, 'Events', kind='a"b')
+
+    body = registry.render()
+    assert '# HELP latency_seconds Latency' in body
+    assert 'latency_seconds_bucket{route="/x",le="0.005"} 1' in body
+    assert 'latency_seconds_bucket{route="/x",le="+Inf"} 2' in body
+    assert 'latency_seconds_count{route="/x"} 2' in body
+    assert 'events_total{kind="a\\"b"} 3' in body
+
+def test_registry_render_during_updates():
+    """Test rendering while other threads add series never fails"""
+    registry = MetricsRegistry()
+    stop = threading.Event()
+
+    def add_series():
+        i = 0
+        while not stop.is_set():
+            # A bounded label set keeps each render small
+            registry.inc('test_total', 1, 'Test counter', n=i % 16)
+            registry.observe('test_seconds', 0.1, 'Test histogram', n=i % 16)
+            i += 1
+
+    writer = threading.Thread(target=add_series)
+    writer.start()
+    try:
+        for _ in range(50):
+            registry.render()
+    finally:
+        stop.set()
+        writer.join()
+
+def test_failed_query_clears_start_time(app):
+    """Test a failing statement does not leave its start time behind"""
+    with app.app_context():
+        conn = db.session.connection()
+        with pytest.raises(DBAPIError):
+            conn.execute(text('SELECT * FROM no_such_table'))
+        assert conn.info.get('query_start_time') == []
+        db.session.rollback()
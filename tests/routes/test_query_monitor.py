@@ -0,0 +1,102 @@
+from types import SimpleNamespace
+import pytest
+from flask import jsonify
+from app.models import db, User
+from app.query_monitor import capture_plan, statement_shape
+
+def test_statement_shape():
+    """Test statements differing only in parameters share a shape"""
+    assert statement_shape("SELECT * FROM user WHERE id = 'a' AND n = 1") == \
+        statement_shape("SELECT *  FROM user\nWHERE id = 'b' AND n = 22")
+    assert statement_shape("SELECT * FROM memory WHERE id IN (?, ?, ?)") == \
+        statement_shape("SELECT * FROM memory WHERE id IN (%(id_1)s, %(id_2)s)")
+
+def test_query_count_headers(client):
+    """Test each response reports its query count and DB time"""
+    response = client.get('/api/users/')
+    assert int(response.headers['X-Query-Count']) >= 1
+    assert response.headers['X-Query-Time'].endswith('ms')
+
+def test_n_plus_one_detected(app, client, caplog):
+    """Test a loop of identical lookups is flagged"""
+    ids = []
+    for i in range(6):
+        user = User(name=f'User {i}', email=f'user{i}@example.com')
+        db.session.add(user)
+        db.session.flush()
+        ids.append(user.id)
+    db.session.commit()
+
+    @app.route('/n-plus-one')
+    def n_plus_one():
+        db.session.expire_all()
+        return jsonify([db.session.get(User, user_id).name for user_id in ids])
+
+    with caplog.at_level('WARNING', logger='app.query_monitor'):
+        response = client.get('/n-plus-one')
+    assert int(response.headers['X-Query-Count']) >= 6
+    assert 'Probable N+1 on GET /n-plus-one' in caplog.text
+
+    metrics = client.get('/metrics').data.decode()
+    assert 'kairix_db_n_plus_one_total{route="/n-plus-one"} 1' in metrics
+
+def test_slow_query_explain_skipped_on_sqlite(app, client):
+    """Test slow-query sampling never tries EXPLAIN outside PostgreSQL"""
+    app.config.update(SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_EXPLAIN_SAMPLE_RATE=1.0)
+    response = client.get('/api/users/')
+    assert response.status_code == 200
+
+class FakeCursor:
+    """DBAPI cursor recording statements, failing any that start with `fail`."""
+
+    def __init__(self, executed, fail):
+        self.executed = executed
+        self.fail = fail
+
+    def execute(self, statement, parameters=None):
+        self.executed.append(statement)
+        if self.fail and statement.startswith(self.fail):
+            raise RuntimeError("EXPLAIN failed")
+
+    def fetchall(self):
+        return [("Index Scan using user_pkey on user",)]
+
+    def close(self):
+        pass
+
+def fake_postgres_connection(executed, fail=None):
+    return SimpleNamespace(
+        dialect=SimpleNamespace(name='postgresql'),
+        in_transaction=lambda: True,
+        connection=SimpleNamespace(cursor=lambda: FakeCursor(executed, fail))
+    )
+
+@pytest.mark.parametrize('analyze, explain', [
+    (False, 'EXPLAIN SELECT 1'),
+    (True, 'EXPLAIN (ANALYZE, BUFFERS) SELECT 1')
+])
+def test_capture_plan_runs_in_rolled_back_savepoint(app, analyze, explain):
+    """Test plans are captured in a savepoint and only re-run the query when asked"""
+    executed = []
+    record = capture_plan(fake_postgres_connection(executed), 'SELECT 1', (), 0.5, analyze=analyze)
+    assert record['uses_index']
+    assert executed == [
+        'SAVEPOINT query_monitor_explain',
+        explain,
+        'ROLLBACK TO SAVEPOINT query_monitor_explain',
+        'RELEASE SAVEPOINT query_monitor_explain'
+    ]
+
+def test_failed_explain_leaves_transaction_usable(app):
+    """Test a failing EXPLAIN is rolled back to its savepoint instead of aborting the transaction"""
+    executed = []
+    assert capture_plan(fake_postgres_connection(executed, fail='EXPLAIN'), 'SELECT 1', (), 0.5) is None
+    assert executed[-2:] == ['ROLLBACK TO SAVEPOINT query_monitor_explain', 'RELEASE SAVEPOINT query_monitor_explain']
+
+def test_monitor_shares_metrics_timing(client):
+    """Test the query monitor reports the same DB time as the metrics' db phase"""
+    response = client.get('/api/users/')
+    server_timing = dict(
+        entry.split(';dur=') for entry in response.headers['Server-Timing'].split(', ')
+    )
+    assert response.headers['X-Query-Time'] == server_timing['db'] + 'ms'
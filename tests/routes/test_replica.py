@@ -0,0 +1,78 @@
+import json
+import pytest
+from sqlalchemy import insert
+from app import create_app, db
+from app.models import User
+
+@pytest.fixture
+def replica_app(tmp_path):
+    """Create an app with two local SQLite databases as primary and replica."""
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path}/primary.db',
+        'SQLALCHEMY_BINDS': {'replica': f'sqlite:///{tmp_path}/replica.db'},
+        'REPLICA_STICKY_SECONDS': 30,
+        'REPLICA_LAG_CHECK_INTERVAL': 0
+    })
+    with app.app_context():
+        db.create_all()
+        db.metadata.create_all(db.engines['replica'])
+        # A row only the replica has, to tell the two apart
+        with db.engines['replica'].begin() as conn:
+            conn.execute(insert(User), [{'id': 'replica-user', 'name': 'Replica', 'email': 'replica@example.com'}])
+        yield app
+        db.session.remove()
+    # The extension registers metadata per bind key; later apps have no replica bind
+    db.metadatas.pop('replica', None)
+
+def user_names(client):
+    return {u['name'] for u in json.loads(client.get('/api/users/').data)}
+
+def test_reads_go_to_replica(replica_app):
+    """Test GET requests read from the replica"""
+    assert user_names(replica_app.test_client()) == {'Replica'}
+
+def test_writes_go_to_primary_and_pin_reads(replica_app):
+    """Test a write lands on the primary and the writer reads its own writes"""
+    writer = replica_app.test_client()
+    response = writer.post('/api/users/', json={'name': 'Primary', 'email': 'primary@example.com'})
+    assert response.status_code == 201
+    assert 'kx_primary_until' in response.headers['Set-Cookie']
+
+    assert user_names(writer) == {'Primary'}
+    # Other clients still read the replica, which has not replicated the write
+    assert user_names(replica_app.test_client()) == {'Replica'}
+
+def test_bulk_delete_pins_reads(replica_app):
+    """Test a set-based delete pins the client to the primary like any other write"""
+    with replica_app.app_context(), db.engine.begin() as conn:
+        conn.execute(insert(User), [{'id': 'doomed-user', 'name': 'Doomed', 'email': 'doomed@example.com'}])
+    client = replica_app.test_client()
+    response = client.delete('/api/users/doomed-user')
+    assert response.status_code == 204
+    assert 'kx_primary_until' in response.headers['Set-Cookie']
+    assert user_names(client) == set()
+
+def test_group_commit_pins_reads(replica_app):
+    """Test a message stored by the group commit writer pins the client to the primary"""
+    replica_app.config['MESSAGE_GROUP_COMMIT'] = True
+    client = replica_app.test_client()
+    conversation = json.loads(client.post('/api/conversations/', json={'user_id': 'u', 'agent_id': 'a'}).data)
+    fresh = replica_app.test_client()
+    try:
+        response = fresh.post('/api/messages/', json={
+            'conversation_id': conversation['id'], 'role': 'user', 'content': 'Hello'
+        })
+    finally:
+        replica_app.extensions['message_buffer'].stop()
+    assert response.status_code == 201
+    assert 'kx_primary_until' in response.headers['Set-Cookie']
+
+def test_lagging_replica_falls_back_to_primary(replica_app):
+    """Test reads use the primary while replica lag is over the threshold"""
+    monitor = replica_app.extensions['replica_monitor']
+    monitor.measure = lambda: 60.0
+    assert user_names(replica_app.test_client()) == set()
+    monitor.measure = lambda: None
+    assert user_names(replica_app.test_client()) == set()
+    monitor.measure = lambda: 0.0
+    assert user_names(replica_app.test_client()) == {'Replica'}
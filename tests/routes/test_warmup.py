@@ -0,0 +1,54 @@
+from unittest.mock import patch
+from app import db
+from app.models import Agent
+from app.warmup import FAILED, PENDING, READY, Warmup, start_warmup
+
+def test_health_endpoints(client):
+    """Test testing apps report ready without warming up."""
+    assert client.get('/health/live').status_code == 200
+    response = client.get('/health/ready')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == READY
+
+def test_warmup_primes_services_and_embedding(app):
+    """Test every step runs and leaves the shared services built."""
+    app.config.update(MEMORY_PROVIDER='vector', MEMORY_EMBEDDING_TYPE='local-hash-384')
+    with app.app_context():
+        db.session.add(Agent(id='warm-agent', provider='openai', settings={'functions': ['create_trello_card']}))
+        db.session.commit()
+
+    warmup = Warmup(app, db)
+    with patch('openai.resources.embeddings.Embeddings.create') as api:
+        assert warmup.run()
+    api.assert_not_called()
+
+    assert warmup.status == READY
+    assert list(warmup.steps) == ['connections', 'prewarm', 'services', 'embedding']
+    assert all(step['error'] is None for step in warmup.steps.values())
+    assert 'openai_service' in app.extensions and 'function_dispatcher' in app.extensions
+    assert 'warm-agent' in app.extensions['function_registry']._payloads
+
+def test_readiness_fails_without_database(app, client):
+    """Test a process that cannot reach the database never reports ready."""
+    warmup = Warmup(app, db)
+    app.extensions['warmup'] = warmup
+    with patch.object(Warmup, 'open_connections', side_effect=RuntimeError('connection refused')), \
+         patch.object(Warmup, 'prime_services') as prime:
+        assert not warmup.run()
+    prime.assert_not_called()
+    assert warmup.status == FAILED
+    assert warmup.steps['connections']['error'] == 'connection refused'
+
+    response = client.get('/health/ready')
+    assert response.status_code == 503
+    assert response.get_json()['status'] == FAILED
+
+def test_warmup_waits_for_serving_entry_point(app):
+    """Test warm-up only runs when a serving entry point starts it."""
+    warmup = Warmup(app, db)
+    app.extensions['warmup'] = warmup
+    app.config['WARMUP_MODE'] = 'sync'
+    assert warmup.status == PENDING
+    with patch.object(Warmup, 'run') as run:
+        start_warmup(app)
+    run.assert_called_once()
@@ -0,0 +1,83 @@
+import json
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from app.services.admission import AdmissionController, AdmissionRejected
+
+def test_user_token_bucket():
+    """Test a user over their burst is rejected with 429 until tokens refill."""
+    controller = AdmissionController(user_rate=10, user_burst=2)
+    for _ in range(2):
+        with controller.admit('user-1'):
+            pass
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.acquire('user-1')
+    assert rejected.value.status == 429
+    assert 0 < rejected.value.retry_after <= 0.1
+
+    # Other users have their own bucket
+    with controller.admit('user-2'):
+        pass
+    time.sleep(0.11)
+    with controller.admit('user-1'):
+        pass
+
+def test_full_queue_rejected_with_503():
+    """Test requests beyond the in-flight limit and queue are shed immediately."""
+    controller = AdmissionController(max_in_flight=1, max_queue=0, user_rate=0)
+    controller.acquire()
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.acquire()
+    assert rejected.value.status == 503
+    controller.release()
+    controller.acquire()
+
+def test_queued_request_admitted_when_slot_frees():
+    """Test a waiting request takes the next free slot before its deadline."""
+    controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=2, user_rate=0)
+    controller.acquire()
+    admitted = threading.Event()
+
+    def waiter():
+        with controller.admit():
+            admitted.set()
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    time.sleep(0.05)
+    assert controller.waiting == 1 and not admitted.is_set()
+    controller.release()
+    thread.join(1)
+    assert admitted.is_set()
+    assert controller.in_flight == 0
+
+def test_queue_deadline():
+    """Test a waiting request is rejected once its deadline passes."""
+    controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=0.05, user_rate=0)
+    controller.acquire()
+    start = time.monotonic()
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.acquire()
+    assert rejected.value.status == 503
+    assert time.monotonic() - start >= 0.05
+    assert controller.waiting == 0
+
+def test_chat_rate_limited(app, client, chat_completion):
+    """Test the chat route answers 429 with Retry-After once a user is over their rate."""
+    app.config.update(ADMISSION_USER_RATE=0.01, ADMISSION_USER_BURST=1)
+    agent_id = json.loads(client.post('/api/agents/', json={'provider': 'openai'}).data)['id']
+    conversation = client.post('/api/conversations/', json={'user_id': 'test-user', 'agent_id': agent_id})
+    conversation_id = json.loads(conversation.data)['id']
+
+    with patch('openai.resources.chat.completions.Completions.create') as mock_completion:
+        mock_completion.return_value = chat_completion({"role": "assistant", "content": "Hi!"})
+        assert client.post(f'/api/conversations/{conversation_id}/chat', json={'content': 'One'}).status_code == 200
+        response = client.post(f'/api/conversations/{conversation_id}/chat', json={'content': 'Two'})
+
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert mock_completion.call_count == 1
+    # The rejected turn stored nothing
+    messages = json.loads(client.get(f'/api/messages/{conversation_id}').data)
+    assert [m['content'] for m in messages] == ['One', 'Hi!']
@@ -0,0 +1,102 @@
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+from sqlalchemy import update
+from app.models import db, Conversation, Job, Message
+from app.services.conversation_summary import SUMMARIZE_CONVERSATION, build_context, record_messages, summarize
+from app.services.job_queue import Worker
+
+@pytest.fixture
+def conversation(app):
+    """Create a conversation with a small summary interval and tail."""
+    app.config.update(CONVERSATION_SUMMARY_INTERVAL=4, CONVERSATION_TAIL_MESSAGES=2)
+    conversation = Conversation(user_id='test-user', agent_id='test-agent')
+    db.session.add(conversation)
+    db.session.commit()
+    return conversation
+
+def add_messages(conversation, count):
+    """Add alternating user/assistant messages one second apart."""
+    start = datetime.utcnow() + timedelta(seconds=conversation.message_count or 0)
+    for i in range(count):
+        db.session.add(Message(
+            conversation_id=conversation.id,
+            role='user' if i % 2 == 0 else 'assistant',
+            content=f'Message {(conversation.message_count or 0) + i}',
+            created_at=start + timedelta(seconds=i)
+        ))
+    record_messages(conversation, count)
+    db.session.commit()
+
+def summary_jobs():
+    return Job.query.filter_by(kind=SUMMARIZE_CONVERSATION).count()
+
+def test_summary_queued_every_interval(conversation):
+    """Test a summary job is queued once per interval past the tail."""
+    add_messages(conversation, 5)
+    assert summary_jobs() == 0
+    add_messages(conversation, 1)
+    assert summary_jobs() == 1
+    add_messages(conversation, 3)
+    assert summary_jobs() == 1
+    add_messages(conversation, 1)
+    assert summary_jobs() == 2
+
+def test_message_count_survives_concurrent_turns(conversation):
+    """Test counting from a stale copy of the conversation keeps other turns' counts."""
+    assert conversation.message_count == 0
+    # Another turn counts its messages after this session loaded the conversation
+    with db.engine.begin() as conn:
+        conn.execute(update(Conversation).where(Conversation.id == conversation.id).values(message_count=3))
+    record_messages(conversation, 2)
+    db.session.commit()
+    db.session.expire_all()
+    assert db.session.get(Conversation, conversation.id).message_count == 5
+
+def test_summary_job_folds_all_but_tail(app, conversation, chat_completion):
+    """Test the worker summarizes past the watermark and leaves the tail verbatim."""
+    add_messages(conversation, 6)
+
+    with patch('openai.resources.chat.completions.Completions.create') as mock_completion:
+        mock_completion.return_value = chat_completion({"role": "assistant", "content": "Summary A"})
+        assert Worker(app, kinds=[SUMMARIZE_CONVERSATION]).run_once() == 1
+    prompt = mock_completion.call_args[1]['messages'][-1]['content']
+    assert 'Message 3' in prompt and 'Message 4' not in prompt
+
+    db.session.refresh(conversation)
+    assert conversation.summary == 'Summary A'
+    assert conversation.summarized_count == 4
+    assert build_context(conversation) == [
+        {"role": "system", "content": "Summary of the conversation so far:\nSummary A"},
+        {"role": "user", "content": "Message 4"},
+        {"role": "assistant", "content": "Message 5"}
+    ]
+
+def test_concurrent_summary_is_not_folded_twice(conversation):
+    """Test a job that loses the race on the watermark stores nothing."""
+    add_messages(conversation, 6)
+    first = Message.query.filter_by(conversation_id=conversation.id).order_by(Message.created_at).first()
+
+    def other_job_wins(previous_summary, messages):
+        # Another worker moves the watermark while this one waits on the model
+        with db.engine.begin() as conn:
+            conn.execute(update(Conversation).where(Conversation.id == conversation.id).values(
+                summary='Summary B', summarized_through_at=first.created_at,
+                summarized_through_id=first.id, summarized_count=1
+            ))
+        return 'Summary A'
+
+    service = MagicMock()
+    service.summarize_conversation.side_effect = other_job_wins
+    assert summarize(conversation, service) == 0
+    db.session.commit()
+    db.session.expire_all()
+    stored = db.session.get(Conversation, conversation.id)
+    assert (stored.summary, stored.summarized_count) == ('Summary B', 1)
+
+def test_context_is_bounded_without_summary(conversation):
+    """Test the tail is capped at one interval plus the tail when summaries lag."""
+    add_messages(conversation, 20)
+    history = build_context(conversation)
+    assert len(history) == 6
+    assert history[-1]['content'] == 'Message 19'
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from unittest.mock import patch
+from app.models import db, Memory, EMBEDDING_TYPES
+from app.services.embedding_backends import (
+    HashingEmbeddingBackend, OpenAIEmbeddingBackend, get_embedding_backend, hash_embedding
+)
+from app.services.memory_provider import VectorMemoryProvider
+from app.services.openai_service import OpenAIService
+
+LOCAL = 'local-hash-384'
+
+def cosine(a, b):
+    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+def test_hash_embedding_is_stable_and_lexical():
+    """Test vectors are deterministic, normalized and closer for overlapping text."""
+    a = hash_embedding("The quarterly budget review is on Friday", 384)
+    assert a.shape == (384,)
+    assert np.allclose(a, hash_embedding("the quarterly  budget review is on friday!", 384))
+    assert np.linalg.norm(a) == pytest.approx(1.0)
+
+    related = hash_embedding("When is the budget review?", 384)
+    unrelated = hash_embedding("My cat likes sardines", 384)
+    assert cosine(a, related) > cosine(a, unrelated)
+    assert not hash_embedding("...", 384).any()
+
+def test_backend_selection():
+    assert isinstance(get_embedding_backend('openai'), OpenAIEmbeddingBackend)
+    assert isinstance(get_embedding_backend(LOCAL), HashingEmbeddingBackend)
+    assert get_embedding_backend(LOCAL) is get_embedding_backend(LOCAL)
+    with pytest.raises(ValueError):
+        get_embedding_backend('missing')
+
+def test_parallel_batches_match_serial():
+    """Test batches split across processes give the same vectors in the same order."""
+    texts = [f"note number {i} about topic {i % 7}" for i in range(40)]
+    spec = EMBEDDING_TYPES[LOCAL]
+    serial = HashingEmbeddingBackend(workers=1).embed(texts, spec)
+    parallel = HashingEmbeddingBackend(workers=2, parallel_threshold=10).embed(texts, spec)
+    assert np.allclose(serial, parallel)
+
+def test_local_type_needs_no_api(app):
+    """Test memories of the local type are embedded and recalled without calling OpenAI."""
+    with app.app_context(), patch('openai.resources.embeddings.Embeddings.create') as api:
+        service = OpenAIService()
+        contents = ["Standup moved to 9:30", "Dentist appointment next Tuesday", "Standup notes are in the wiki"]
+        vectors = service.create_embeddings(contents, embedding_type=LOCAL)
+        Memory.batch_create(contents, vectors, embedding_type=LOCAL)
+        db.session.commit()
+
+        provider = VectorMemoryProvider(service, embedding_type=LOCAL, mmr_lambda=None)
+        results = provider.get_relevant_memories("when is standup", limit=2)
+        assert {m.content for m in results} == {"Standup moved to 9:30", "Standup notes are in the wiki"}
+        api.assert_not_called()
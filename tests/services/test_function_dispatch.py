@@ -0,0 +1,105 @@
+import json
+import time
+import pytest
+from unittest.mock import patch
+from app.services.function_dispatch import FunctionDispatcher, ResultCache, parse_function_calls
+from tests.load.stub_webhook import StubWebhookServer
+
+@pytest.fixture
+def webhooks():
+    """Start a local stub webhook server."""
+    server = StubWebhookServer().start()
+    yield server
+    server.stop()
+
+@pytest.fixture
+def dispatcher():
+    return FunctionDispatcher(max_workers=4, default_timeout=2.0, webhook_secret='s3cret')
+
+def tool_call(call_id, name, arguments):
+    return {'id': call_id, 'type': 'function', 'function': {'name': name, 'arguments': json.dumps(arguments)}}
+
+def test_parse_function_calls():
+    """Test parallel tool calls and the legacy single function call are parsed."""
+    message = {'tool_calls': [tool_call('a', 'lookup', {'q': 1}), tool_call('b', 'notify', {})]}
+    assert parse_function_calls(message) == [
+        {'id': 'a', 'name': 'lookup', 'arguments': {'q': 1}},
+        {'id': 'b', 'name': 'notify', 'arguments': {}}
+    ]
+    legacy = {'function_call': {'name': 'lookup', 'arguments': 'not json'}}
+    assert parse_function_calls(legacy) == [{'id': None, 'name': 'lookup', 'arguments': {'_raw': 'not json'}}]
+    assert parse_function_calls({'content': 'Hi'}) == []
+
+def test_calls_run_concurrently(webhooks, dispatcher):
+    """Test calls from one response overlap instead of running back to back."""
+    webhooks.latency = lambda: 0.3
+    specs = {name: {'name': name, 'webhook_url': webhooks.url(name)} for name in ('a', 'b', 'c')}
+    calls = [{'id': str(i), 'name': name, 'arguments': {'i': i}} for i, name in enumerate(specs)]
+
+    start = time.monotonic()
+    results = dispatcher.dispatch_all(calls, specs)
+    assert time.monotonic() - start < 0.8
+    assert webhooks.max_in_flight == 3
+    assert [r['hook'] for r in results] == ['a', 'b', 'c']
+    assert results[1]['echo'] == {'function': 'b', 'arguments': {'i': 1}}
+    assert webhooks.requests[0][1]['X-Kairix-Secret'] == 's3cret'
+
+def test_timeouts_and_errors_become_results(webhooks, dispatcher):
+    """Test slow, failing and unknown functions answer with errors without failing the batch."""
+    webhooks.set_latency('slow', 'fixed:1000')
+    webhooks.hook_status['broken'] = 500
+    specs = {
+        'slow': {'name': 'slow', 'webhook_url': webhooks.url('slow'), 'timeout': 0.2},
+        'broken': {'name': 'broken', 'webhook_url': webhooks.url('broken')},
+        'fine': {'name': 'fine', 'webhook_url': webhooks.url('fine')}
+    }
+    calls = [{'id': None, 'name': name, 'arguments': {}} for name in ('slow', 'broken', 'fine', 'missing')]
+
+    start = time.monotonic()
+    slow, broken, fine, missing = dispatcher.dispatch_all(calls, specs)
+    assert time.monotonic() - start < 0.9
+    assert 'timed out' in slow['error']
+    assert 'failed' in broken['error']
+    assert fine['ok'] is True
+    assert missing == {'error': "Unknown function 'missing'"}
+
+def test_idempotent_results_are_cached(webhooks, dispatcher):
+    """Test identical idempotent calls hit the webhook once; other calls always go out."""
+    specs = {
+        'lookup': {'name': 'lookup', 'webhook_url': webhooks.url('lookup'), 'idempotent': True, 'cache_ttl': 60},
+        'notify': {'name': 'notify', 'webhook_url': webhooks.url('notify')}
+    }
+    calls = [
+        {'id': '1', 'name': 'lookup', 'arguments': {'q': 'tea', 'n': 1}},
+        {'id': '2', 'name': 'lookup', 'arguments': {'n': 1, 'q': 'tea'}},
+        {'id': '3', 'name': 'notify', 'arguments': {}},
+        {'id': '4', 'name': 'notify', 'arguments': {}}
+    ]
+    first = dispatcher.dispatch_all(calls, specs)
+    second = dispatcher.dispatch_all(calls[:1], specs)
+    assert first[0] == first[1] == second[0]
+    assert webhooks.count('lookup') == 1
+    assert webhooks.count('notify') == 2
+
+def test_result_cache_expires_and_evicts():
+    """Test entries expire after their TTL and the least recently used entry is evicted."""
+    cache = ResultCache(max_size=2)
+    cache.set('a', 1, ttl=60)
+    cache.set('b', 2, ttl=60)
+    cache.get('a')
+    cache.set('c', 3, ttl=60)
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, None, 3)
+    with patch('app.services.function_dispatch.time.monotonic', return_value=time.monotonic() + 120):
+        assert cache.get('a') is None
+
+def test_invalid_arguments_are_not_sent(webhooks, dispatcher):
+    """Test calls violating the parameters schema are answered without calling the webhook."""
+    from app.services.function_registry import compile_definition
+    spec, validator = compile_definition({
+        'name': 'notify', 'description': 'Notify', 'webhook_url': webhooks.url('notify'),
+        'parameters': {'type': 'object', 'properties': {'to': {'type': 'string'}}, 'required': ['to']}
+    })
+    [result] = dispatcher.dispatch_all([{'id': '1', 'name': 'notify', 'arguments': {}}],
+                                       {'notify': spec}, {'notify': validator})
+    assert "Invalid arguments for 'notify'" in result['error']
+    assert webhooks.count('notify') == 0
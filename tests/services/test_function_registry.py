@@ -0,0 +1,110 @@
+import json
+import os
+import pytest
+from unittest.mock import patch
+from app.models import Agent
+from app.services.function_registry import FunctionRegistry, InvalidFunctionDefinition, compile_definition
+
+def definition(name, **fields):
+    return {
+        'name': name, 'description': f'Do {name}',
+        'parameters': {'type': 'object', 'properties': {'title': {'type': 'string'}}, 'required': ['title']},
+        **fields
+    }
+
+def write(directory, filename, body, mtime=None):
+    path = directory / filename
+    path.write_text(body if isinstance(body, str) else json.dumps(body))
+    if mtime is not None:
+        os.utime(path, ns=(mtime, mtime))
+    return path
+
+@pytest.fixture
+def functions_dir(tmp_path):
+    write(tmp_path, 'notion.json', definition('create_notion_page', webhook_url='https://hooks.example.com/notion'))
+    write(tmp_path, 'trello.json', definition('create_trello_card', webhook_url_env='TRELLO_HOOK'))
+    write(tmp_path, 'broken.json', '{"name": "broken"')
+    write(tmp_path, 'README.md', 'not a definition')
+    return tmp_path
+
+def test_compile_definition_validates():
+    """Test definitions and their parameter schemas are validated."""
+    spec, validator = compile_definition(definition('ok', timeout=2))
+    assert spec['timeout'] == 2
+    assert not validator.is_valid({})
+    with pytest.raises(InvalidFunctionDefinition, match='description'):
+        compile_definition({'name': 'x', 'parameters': {}})
+    with pytest.raises(InvalidFunctionDefinition, match='parameters'):
+        compile_definition(definition('x', parameters={'type': 'nonsense'}))
+    with pytest.raises(InvalidFunctionDefinition):
+        compile_definition(definition('x', webhook='typo'))
+
+def test_loads_directory(functions_dir, monkeypatch):
+    """Test valid files load, invalid ones are reported and webhook URLs resolve from the environment."""
+    monkeypatch.setenv('TRELLO_HOOK', 'https://hooks.example.com/trello')
+    registry = FunctionRegistry(str(functions_dir))
+    assert [d['name'] for d in registry.definitions()] == ['create_notion_page', 'create_trello_card']
+    assert registry.definitions()[1]['webhook_url'] == 'https://hooks.example.com/trello'
+    assert list(registry.errors) == ['broken.json']
+    assert FunctionRegistry(str(functions_dir / 'missing')).definitions() == []
+
+def test_payload_is_cached_per_agent(functions_dir):
+    """Test an agent's tools are compiled once and rebuilt when its selection changes."""
+    registry = FunctionRegistry(str(functions_dir))
+    agent = Agent(id='agent-1', provider='openai', settings={'functions': ['create_notion_page', 'unknown']})
+    payload = registry.payload_for(agent)
+    assert [t['function']['name'] for t in payload.tools] == ['create_notion_page']
+    assert 'webhook_url' not in payload.tools[0]['function']
+    assert registry.payload_for(agent) is payload
+
+    agent.settings = {'functions': ['create_notion_page', definition('inline_lookup')]}
+    assert list(registry.payload_for(agent).specs) == ['create_notion_page', 'inline_lookup']
+    assert not registry.payload_for(Agent(id='agent-2', provider='openai', settings={}))
+
+def test_reload_by_mtime(functions_dir):
+    """Test changed, broken and deleted files are picked up without re-reading unchanged ones."""
+    registry = FunctionRegistry(str(functions_dir))
+    agent = Agent(id='agent-1', provider='openai', settings={'functions': ['create_notion_page']})
+    before = registry.payload_for(agent)
+    assert registry.reload() is False
+
+    write(functions_dir, 'notion.json', definition('create_notion_page', timeout=30), mtime=10**18)
+    assert registry.reload() is True
+    after = registry.payload_for(agent)
+    assert after is not before
+    assert after.specs['create_notion_page']['timeout'] == 30
+
+    # A bad edit keeps serving the last good version
+    write(functions_dir, 'notion.json', '{', mtime=2 * 10**18)
+    assert registry.reload() is True
+    assert registry.payload_for(agent).specs['create_notion_page']['timeout'] == 30
+    assert 'notion.json' in registry.errors
+
+    os.remove(functions_dir / 'notion.json')
+    registry.reload()
+    assert not registry.payload_for(agent)
+    assert 'notion.json' not in registry.errors
+
+def test_chat_completion_attaches_tools_without_file_access(app, functions_dir, chat_completion):
+    """Test the completion gets the agent's tools from memory."""
+    from app.services.openai_service import get_openai_service
+    app.config['FUNCTION_CONFIG_DIR'] = str(functions_dir)
+    service = get_openai_service(app)
+    agent = Agent(id='agent-1', provider='openai', settings={'functions': ['create_notion_page']})
+    service.function_registry.payload_for(agent)
+
+    with patch('builtins.open', side_effect=AssertionError('file read')), \
+            patch('os.stat', side_effect=AssertionError('file stat')), \
+            patch('openai.resources.chat.completions.Completions.create', return_value=chat_completion()) as mock_completion:
+        service.create_chat_completion([{'role': 'user', 'content': 'Hi'}], agent, include_memory=False)
+    assert mock_completion.call_args[1]['tools'][0]['function']['name'] == 'create_notion_page'
+
+def test_list_functions_route(app, client, functions_dir):
+    """Test the functions endpoint lists loaded definitions without webhook URLs."""
+    app.config['FUNCTION_CONFIG_DIR'] = str(functions_dir)
+    response = client.get('/api/functions/')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert [f['name'] for f in data] == ['create_notion_page', 'create_trello_card']
+    assert data[0]['configured'] is True
+    assert 'webhook_url' not in data[0]
@@ -0,0 +1,104 @@
+import pytest
+from datetime import datetime, timedelta
+from app.services.job_queue import HANDLERS, JobQueue, Worker, enqueue, job_handler
+from app.models import Job, db
+
+@pytest.fixture
+def handled():
+    """Register test handlers and record the payloads they receive."""
+    calls = []
+
+    @job_handler('test_ok', batch_size=2)
+    def ok(payloads):
+        calls.append(payloads)
+
+    @job_handler('test_fail')
+    def fail(payloads):
+        raise RuntimeError("boom")
+
+    yield calls
+    HANDLERS.pop('test_ok')
+    HANDLERS.pop('test_fail')
+
+def test_claim_marks_jobs_running(app):
+    """Test claimed jobs are hidden from other claims."""
+    queue = JobQueue(visibility_timeout=60)
+    enqueue('test_ok', {'n': 1})
+    enqueue('test_ok', {'n': 2})
+
+    jobs = queue.claim('test_ok', limit=1)
+    assert len(jobs) == 1
+    assert jobs[0].status == 'running'
+    assert jobs[0].attempts == 1
+    assert len(queue.claim('test_ok', limit=5)) == 1
+    assert queue.claim('test_ok', limit=5) == []
+
+def test_visibility_timeout_releases_job(app):
+    """Test a job whose worker died becomes claimable again."""
+    queue = JobQueue(visibility_timeout=60)
+    enqueue('test_ok', {})
+    job = queue.claim('test_ok')[0]
+    job.locked_until = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+    reclaimed = queue.claim('test_ok')
+    assert [j.id for j in reclaimed] == [job.id]
+    assert reclaimed[0].attempts == 2
+
+def test_visibility_timeout_fails_exhausted_job(app):
+    """Test a job that timed out on its last attempt is failed, not reclaimed."""
+    queue = JobQueue(visibility_timeout=60)
+    enqueue('test_ok', {}, max_attempts=1)
+    job = queue.claim('test_ok')[0]
+    job.locked_until = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+    assert queue.claim('test_ok') == []
+    db.session.refresh(job)
+    assert job.status == 'failed'
+    assert job.last_error == 'visibility timeout'
+    assert job.attempts == 1
+
+def test_delayed_job_not_claimed(app):
+    """Test jobs are not claimable before run_after."""
+    enqueue('test_ok', {}, delay=60)
+    assert JobQueue().claim('test_ok') == []
+
+def test_worker_runs_batches(app, handled):
+    """Test the worker passes batches of payloads to the handler."""
+    for n in range(3):
+        enqueue('test_ok', {'n': n})
+
+    worker = Worker(app, kinds=['test_ok'])
+    assert worker.run_once() == 2
+    assert worker.run_once() == 1
+    assert sorted(p['n'] for batch in handled for p in batch) == [0, 1, 2]
+    assert Job.query.filter_by(status='done').count() == 3
+
+def test_worker_retries_then_fails(app, handled):
+    """Test failing jobs back off and are eventually marked failed."""
+    job = enqueue('test_fail', {}, max_attempts=2)
+    worker = Worker(app, kinds=['test_fail'], queue=JobQueue(retry_backoff=0))
+
+    worker.run_once()
+    db.session.refresh(job)
+    assert job.status == 'queued'
+    assert job.last_error == "boom"
+
+    worker.run_once()
+    db.session.refresh(job)
+    assert job.status == 'failed'
+    assert job.attempts == 2
+
+def test_stats(app, handled):
+    """Test queue depth and latency reporting."""
+    enqueue('test_ok', {})
+    enqueue('test_ok', {})
+    enqueue('test_fail', {})
+    Worker(app, kinds=['test_ok']).run_once()
+
+    stats = JobQueue.stats()
+    assert stats['depth'] == 1
+    assert stats['kinds']['test_ok']['done'] == 2
+    assert stats['kinds']['test_fail']['queued'] == 1
+    assert stats['avg_wait_seconds'] >= 0
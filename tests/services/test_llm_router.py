@@ -0,0 +1,133 @@
+import time
+import openai
+import pytest
+from unittest.mock import patch
+from app.services.llm_router import (
+    ChatProvider, CircuitBreaker, LLMRouter, OpenAICompatibleProvider, providers_from_config
+)
+
+class FakeProvider(ChatProvider):
+    """Provider answering after a fixed delay, or failing."""
+
+    def __init__(self, name, latency=0.0, error=None):
+        self.name = name
+        self.latency = latency
+        self.error = error
+        self.calls = []
+
+    def complete(self, params):
+        self.calls.append(params)
+        time.sleep(self.latency)
+        if self.error is not None:
+            raise self.error
+        return {'provider': self.name, 'choices': [{'message': {'role': 'assistant', 'content': self.name}}]}
+
+class ClientError(Exception):
+    http_status = 400
+
+PARAMS = {'model': 'gpt-4', 'messages': [{'role': 'user', 'content': 'Hi'}]}
+
+def test_agent_provider_is_primary():
+    """Test requests go to the preferred provider, or the default for unknown names."""
+    openai_, backup = FakeProvider('openai'), FakeProvider('backup')
+    router = LLMRouter([openai_, backup])
+    assert router.create_chat_completion(PARAMS, provider='backup')['provider'] == 'backup'
+    assert router.create_chat_completion(PARAMS, provider='unknown')['provider'] == 'openai'
+    assert len(openai_.calls) == len(backup.calls) == 1
+
+def test_failover_and_circuit_breaking():
+    """Test a failing provider is failed over and then skipped until its cooldown ends."""
+    broken = FakeProvider('openai', error=RuntimeError('503'))
+    backup = FakeProvider('backup')
+    router = LLMRouter([broken, backup], failure_threshold=2, cooldown=0.2)
+
+    for _ in range(3):
+        assert router.create_chat_completion(PARAMS)['provider'] == 'backup'
+    # The breaker opened after two failures; the third request skipped it
+    assert len(broken.calls) == 2
+    assert router.breakers['openai'].state == CircuitBreaker.OPEN
+    assert router.stats('openai', 'gpt-4').error_rate() == 1.0
+
+    # After the cooldown one probe is let through and closes the breaker on success
+    time.sleep(0.25)
+    broken.error = None
+    assert router.create_chat_completion(PARAMS)['provider'] == 'openai'
+    assert router.breakers['openai'].state == CircuitBreaker.CLOSED
+
+def test_listing_does_not_claim_probe():
+    """Test a provider whose cooldown ended keeps its probe until it is actually called."""
+    primary, broken = FakeProvider('openai'), FakeProvider('backup', error=RuntimeError('503'))
+    router = LLMRouter([primary, broken], failure_threshold=1, cooldown=0.05)
+    router.breakers['backup'].record_failure()
+    time.sleep(0.1)
+
+    assert router.create_chat_completion(PARAMS)['provider'] == 'openai'
+    assert router.breakers['backup'].state == CircuitBreaker.OPEN
+    broken.error = None
+    assert router.create_chat_completion(PARAMS, provider='backup')['provider'] == 'backup'
+    assert router.breakers['backup'].state == CircuitBreaker.CLOSED
+
+def test_non_retriable_errors_are_not_failed_over():
+    """Test bad requests are raised without trying other providers or tripping the breaker."""
+    primary, backup = FakeProvider('openai', error=ClientError('bad request')), FakeProvider('backup')
+    router = LLMRouter([primary, backup], failure_threshold=1)
+    with pytest.raises(ClientError):
+        router.create_chat_completion(PARAMS)
+    assert backup.calls == []
+    assert router.breakers['openai'].state == CircuitBreaker.CLOSED
+
+def test_all_providers_failing_raises_last_error():
+    router = LLMRouter([FakeProvider('openai', error=RuntimeError('a')), FakeProvider('backup', error=RuntimeError('b'))])
+    with pytest.raises(RuntimeError, match='b'):
+        router.create_chat_completion(PARAMS)
+
+def test_slow_primary_is_hedged():
+    """Test a request slower than the primary's p95 is raced against the next provider."""
+    primary, backup = FakeProvider('openai', latency=0.01), FakeProvider('backup')
+    router = LLMRouter([primary, backup], hedge=True, hedge_min_samples=5)
+    for _ in range(5):
+        router.create_chat_completion(PARAMS)
+    assert backup.calls == []
+    assert router.hedge_delay(primary, 'gpt-4') == pytest.approx(0.01, abs=0.02)
+
+    primary.latency = 1.0
+    start = time.monotonic()
+    response = router.create_chat_completion(PARAMS)
+    assert response['provider'] == 'backup'
+    assert time.monotonic() - start < 0.5
+    assert len(backup.calls) == 1
+
+def test_hedged_bad_request_is_not_sent_twice():
+    """Test a primary failing with a bad request before the hedge delay is not hedged."""
+    primary, backup = FakeProvider('openai', latency=0.01), FakeProvider('backup')
+    router = LLMRouter([primary, backup], hedge=True, hedge_min_samples=5)
+    for _ in range(5):
+        router.create_chat_completion(PARAMS)
+
+    primary.latency, primary.error = 0.0, ClientError('bad request')
+    with pytest.raises(ClientError):
+        router.create_chat_completion(PARAMS)
+    assert backup.calls == []
+
+def test_providers_from_config(monkeypatch, chat_completion):
+    """Test LLM_PROVIDERS builds OpenAI-compatible providers with model mapping."""
+    monkeypatch.setenv('AZURE_KEY', 'azure-secret')
+    providers = providers_from_config({'LLM_PROVIDERS': '[{"name": "openai"}, {"name": "azure", '
+                                                       '"api_base": "https://azure.example", '
+                                                       '"api_key_env": "AZURE_KEY", "models": {"gpt-4": "gpt4-prod"}}]'})
+    assert [p.name for p in providers] == ['openai', 'azure']
+    azure = providers[1]
+    assert azure.model_for('gpt-4') == 'gpt4-prod'
+    assert azure.model_for('gpt-3.5-turbo') == 'gpt-3.5-turbo'
+
+    assert str(azure.client.base_url).startswith('https://azure.example')
+    assert azure.client.api_key == 'azure-secret'
+    with patch('openai.resources.chat.completions.Completions.create', return_value=chat_completion()) as create:
+        assert azure.complete(dict(PARAMS, model='gpt4-prod'))['choices'] == []
+    assert create.call_args[1]['model'] == 'gpt4-prod'
+
+    default, = providers_from_config({'OPENAI_API_KEY': 'openai-secret'})
+    assert isinstance(default, OpenAICompatibleProvider) and default.name == 'openai'
+    assert default.client.api_key == 'openai-secret'
+    with pytest.raises(openai.OpenAIError):
+        providers_from_config({})[0].complete(PARAMS)
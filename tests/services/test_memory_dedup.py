@@ -0,0 +1,55 @@
+import numpy as np
+from datetime import datetime, timedelta
+from app.services.memory_dedup import MemoryCompactor
+from app.models import Memory, db
+
+def test_compact_collapses_duplicates(app):
+    """Test exact and near duplicates are collapsed onto the oldest memory."""
+    with app.app_context():
+        now = datetime.utcnow()
+        vector = np.random.rand(1536)
+        other = np.random.rand(1536)
+        db.session.add_all([
+            Memory(content="Likes tea", embedding=vector.tolist(), created_at=now - timedelta(days=2)),
+            Memory(content="Enjoys tea", embedding=(vector + 0.001).tolist(), created_at=now - timedelta(days=1)),
+            Memory(content="Owns a cat", embedding=other.tolist(), created_at=now - timedelta(days=3)),
+            Memory(content="Owns a cat", user_id="user-1", embedding=other.tolist(), created_at=now)
+        ])
+        db.session.commit()
+        # Rows written before hashing existed
+        db.session.add(Memory(content="Owns a cat", embedding=other.tolist(), created_at=now))
+        db.session.flush()
+        db.session.execute(db.text("UPDATE memory SET content_hash = NULL WHERE created_at = :now AND user_id IS NULL"), {"now": now})
+        db.session.commit()
+
+        counts = MemoryCompactor().compact()
+
+        assert counts == {"hashed": 0, "exact": 1, "near": 1}
+        remaining = {(m.content, m.user_id) for m in Memory.query.all()}
+        assert remaining == {("Likes tea", None), ("Owns a cat", None), ("Owns a cat", "user-1")}
+
+def test_compact_keeps_distinct_memories(app):
+    """Test unrelated memories are left alone."""
+    with app.app_context():
+        db.session.add_all([
+            Memory(content=f"Fact {i}", embedding=np.eye(1536)[i].tolist()) for i in range(3)
+        ])
+        db.session.commit()
+
+        assert MemoryCompactor(batch_size=2).compact() == {"hashed": 0, "exact": 0, "near": 0}
+        assert Memory.query.count() == 3
+
+def test_backfill_collapses_legacy_duplicates(app):
+    """Test unhashed copies of one text are collapsed before their hashes are written."""
+    with app.app_context():
+        now = datetime.utcnow()
+        for content, created_at in [("Owns a cat", now - timedelta(days=1)), ("Owns  a cat", now), ("Owns a dog", now)]:
+            db.session.add(Memory(content=content, user_id="user-1", agent_id="agent-1", created_at=created_at))
+            # Rows written before hashing existed
+            db.session.flush()
+            db.session.execute(db.text("UPDATE memory SET content_hash = NULL"))
+        db.session.commit()
+
+        assert MemoryCompactor().backfill_hashes() == (2, 1)
+        remaining = {(m.content, m.created_at) for m in Memory.query.all()}
+        assert remaining == {("Owns a cat", now - timedelta(days=1)), ("Owns a dog", now)}
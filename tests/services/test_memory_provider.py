@@ -1,8 +1,9 @@
 import pytest
 import numpy as np
 from unittest.mock import Mock, patch
-from app.services.memory_provider import VectorMemoryProvider
-from app.models import Memory, db
+from app.services.memory_access import AccessRecorder
+from app.services.memory_provider import ConversationHistoryMemoryProvider, VectorMemoryProvider, mmr_select
+from app.models import Agent, Conversation, Memory, Message, db
 
 @pytest.fixture
 def embedding_service():
@@ -37,7 +38,7 @@ def test_get_relevant_memories(app, memory_provider):
         # Verify results
         assert len(results) == 3
         assert all(isinstance(m, Memory) for m in results)
-        memory_provider.embedding_service.create_embedding.assert_called_once_with(query)
+        memory_provider.embedding_service.create_embedding.assert_called_once_with(query, embedding_type='openai')
 
 def test_get_relevant_memories_empty(app, memory_provider):
     """Test retrieving memories when none exist."""
@@ -62,3 +63,132 @@ def test_get_relevant_memories_limit(app, memory_provider):
         # Test different limits
         assert len(memory_provider.get_relevant_memories("query", limit=2)) == 2
         assert len(memory_provider.get_relevant_memories("query", limit=10)) == 5
+
+def test_get_relevant_memories_scoped_to_tenant(app, memory_provider):
+    """Test memories are scoped to the user and agent."""
+    with app.app_context():
+        agent = Agent(id="agent-1", provider="openai")
+        db.session.add_all([
+            Memory(content="Mine", user_id="user-1", embedding=np.random.rand(1536).tolist()),
+            Memory(content="Mine for agent", user_id="user-1", agent_id="agent-1", embedding=np.random.rand(1536).tolist()),
+            Memory(content="Mine for other agent", user_id="user-1", agent_id="agent-2", embedding=np.random.rand(1536).tolist()),
+            Memory(content="Theirs", user_id="user-2", embedding=np.random.rand(1536).tolist()),
+            Memory(content="Global", embedding=np.random.rand(1536).tolist())
+        ])
+        db.session.commit()
+
+        results = memory_provider.get_relevant_memories("query", limit=10, user_id="user-1")
+        assert {m.content for m in results} == {"Mine", "Mine for agent", "Mine for other agent", "Global"}
+
+        results = memory_provider.get_relevant_memories("query", limit=10, user_id="user-1", agent=agent)
+        assert {m.content for m in results} == {"Mine", "Mine for agent", "Global"}
+
+def test_unscoped_search_sees_only_global_memories(app, memory_provider):
+    """Test a search without a user never returns another tenant's memories."""
+    with app.app_context():
+        db.session.add_all([
+            Memory(content="User A's", user_id="user-a", embedding=np.random.rand(1536).tolist()),
+            Memory(content="User B's", user_id="user-b", embedding=np.random.rand(1536).tolist()),
+            Memory(content="Global", embedding=np.random.rand(1536).tolist())
+        ])
+        db.session.commit()
+
+        assert {m.content for m in memory_provider.get_relevant_memories("query", limit=10)} == {"Global"}
+        results = memory_provider.get_relevant_memories("query", limit=10, user_id="user-a")
+        assert {m.content for m in results} == {"User A's", "Global"}
+
+def test_mmr_select_prefers_diverse_candidates():
+    """Test MMR skips a near-copy of an already selected candidate."""
+    query = np.array([1.0, 0.0, 0.0])
+    candidates = [
+        [0.95, 0.31, 0.0],
+        [0.94, 0.34, 0.0],
+        [0.80, 0.0, 0.60]
+    ]
+    assert mmr_select(query, candidates, 2, lambda_mult=1.0) == [0, 1]
+    assert mmr_select(query, candidates, 2, lambda_mult=0.5) == [0, 2]
+    assert mmr_select(query, [], 2) == []
+
+def test_get_relevant_memories_mmr_per_agent(app, embedding_service):
+    """Test agent settings control MMR re-ranking."""
+    with app.app_context():
+        base = np.zeros(1536)
+        base[0] = 1.0
+        copy = base.copy()
+        copy[1] = 0.05
+        other = np.zeros(1536)
+        other[0], other[2] = 0.7, 0.7
+        db.session.add_all([
+            Memory(content="Likes tea", embedding=base.tolist()),
+            Memory(content="Likes tea a lot", embedding=copy.tolist()),
+            Memory(content="Has a cat", embedding=other.tolist())
+        ])
+        db.session.commit()
+        embedding_service.create_embedding.return_value = base.tolist()
+        provider = VectorMemoryProvider(embedding_service)
+
+        relevance_only = Agent(id="agent-r", provider="openai", settings={"memory": {"mmr_lambda": 1.0}})
+        results = provider.get_relevant_memories("query", limit=2, agent=relevance_only)
+        assert [m.content for m in results] == ["Likes tea", "Likes tea a lot"]
+
+        diverse = Agent(id="agent-d", provider="openai", settings={"memory": {"mmr_lambda": 0.3, "fetch_k": 3}})
+        results = provider.get_relevant_memories("query", limit=2, agent=diverse)
+        assert [m.content for m in results] == ["Likes tea", "Has a cat"]
+
+        fewer = Agent(id="agent-f", provider="openai", settings={"memory": {"limit": 1}})
+        assert len(provider.get_relevant_memories("query", limit=5, agent=fewer)) == 1
+
+def test_history_provider_recalls_other_conversations(app, embedding_service):
+    """Test history recall searches the user's other conversations only."""
+    with app.app_context():
+        tea = np.zeros(1536)
+        tea[0] = 1.0
+        cat = np.zeros(1536)
+        cat[1] = 1.0
+        earlier = Conversation(user_id="user-1", agent_id="agent-1")
+        current = Conversation(user_id="user-1", agent_id="agent-2")
+        someone_else = Conversation(user_id="user-2", agent_id="agent-1")
+        db.session.add_all([earlier, current, someone_else])
+        db.session.flush()
+        for conversation, content, vector in [
+            (earlier, "I love green tea", tea), (earlier, "My cat is called Miso", cat),
+            (current, "Do you remember my tea?", tea), (someone_else, "I drink tea daily", tea)
+        ]:
+            db.session.add(Message(conversation_id=conversation.id, role="user", content=content,
+                                   embedding=vector.tolist(), embedding_type="openai"))
+        db.session.add(Message(conversation_id=earlier.id, role="user", content="Not embedded yet"))
+        db.session.commit()
+        embedding_service.create_embedding.return_value = tea.tolist()
+        provider = ConversationHistoryMemoryProvider(embedding_service)
+
+        results = provider.get_relevant_memories("tea?", limit=1, user_id="user-1", conversation_id=current.id)
+        assert [m.content for m in results] == ["I love green tea"]
+        results = provider.get_relevant_memories("tea?", limit=5, user_id="user-1", conversation_id=current.id)
+        assert [m.content for m in results] == ["I love green tea", "My cat is called Miso"]
+        assert provider.get_relevant_memories("tea?") == []
+
+def test_hybrid_scoring_and_batched_access_counts(app, embedding_service):
+    """Test hybrid scoring from agent settings, with accesses written only on flush."""
+    with app.app_context():
+        vector = embedding_service.create_embedding.return_value
+        memories = [Memory(content=f"Memory {i}", embedding=vector, importance=i / 4) for i in range(4)]
+        db.session.add_all(memories)
+        db.session.commit()
+        agent = Agent(id="ranked-agent", provider="openai",
+                      settings={"memory": {"scoring": "hybrid", "ranking": {"importance": 1.0}}})
+        recorder = AccessRecorder(app)
+        provider = VectorMemoryProvider(embedding_service, access_recorder=recorder)
+
+        results = provider.get_relevant_memories("query", limit=2, agent=agent)
+        assert [m.content for m in results] == ["Memory 3", "Memory 2"]
+        provider.get_relevant_memories("query", limit=1, agent=agent)
+
+        # Nothing is written on the read path
+        db.session.expire_all()
+        assert all(m.access_count == 0 for m in Memory.query)
+        assert recorder.pending() == 2
+
+        assert recorder.flush() == 2
+        counts = {m.content: m.access_count for m in Memory.query}
+        assert counts == {"Memory 0": 0, "Memory 1": 0, "Memory 2": 1, "Memory 3": 2}
+        assert recorder.pending() == 0
@@ -0,0 +1,102 @@
+import json
+import threading
+import time
+import pytest
+from app.models import db, Conversation, Message
+from app.services.message_buffer import MessageWriteBuffer
+
+@pytest.fixture
+def conversation_id(client):
+    response = client.post('/api/conversations/', json={'user_id': 'test-user', 'agent_id': 'test-agent'})
+    return json.loads(response.data)['id']
+
+def test_concurrent_inserts_share_commits(app, conversation_id):
+    """Test rows submitted together are written in fewer commits than rows"""
+    buffer = MessageWriteBuffer(app, max_delay=0.05, max_batch=100)
+    commits = []
+    original = buffer._write
+    buffer._write = lambda batch: (commits.append(len(batch)), original(batch))
+    try:
+        start = threading.Barrier(20)
+
+        def submit(i):
+            start.wait()
+            return buffer.submit({'conversation_id': conversation_id, 'role': 'user', 'content': f'Message {i}'})
+
+        futures = []
+        threads = [threading.Thread(target=lambda i=i: futures.append(submit(i))) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        results = [future.result(timeout=5) for future in futures]
+    finally:
+        buffer.stop()
+
+    assert sum(commits) == 20
+    assert len(commits) < 20
+    assert len({result['id'] for result in results}) == 20
+    db.session.expire_all()
+    assert Message.query.filter_by(conversation_id=conversation_id).count() == 20
+    assert db.session.get(Conversation, conversation_id).message_count == 20
+
+def test_failed_row_fails_alone(app, conversation_id):
+    """Test a row that cannot be stored fails only its own submitter"""
+    buffer = MessageWriteBuffer(app, max_delay=0.05)
+    try:
+        good = buffer.submit({'conversation_id': conversation_id, 'role': 'user', 'content': 'Fine'})
+        bad = buffer.submit({'conversation_id': conversation_id, 'role': 'user', 'content': None})
+        assert good.result(timeout=5)['content'] == 'Fine'
+        with pytest.raises(Exception):
+            bad.result(timeout=5)
+    finally:
+        buffer.stop()
+    db.session.expire_all()
+    assert [m.content for m in Message.query.filter_by(conversation_id=conversation_id)] == ['Fine']
+
+def test_cancelled_row_not_written(app, conversation_id):
+    """Test a row whose submitter gave up before its group started is dropped"""
+    buffer = MessageWriteBuffer(app, max_delay=1)
+    try:
+        cancelled = buffer.submit({'conversation_id': conversation_id, 'role': 'user', 'content': 'Gave up'})
+        assert cancelled.cancel()
+    finally:
+        buffer.stop()
+    db.session.expire_all()
+    assert Message.query.filter_by(conversation_id=conversation_id).count() == 0
+
+def test_create_message_with_group_commit(app, client, conversation_id):
+    """Test the route answers with the stored message when group commit is enabled"""
+    app.config['MESSAGE_GROUP_COMMIT'] = True
+    try:
+        response = client.post('/api/messages/', json={
+            'conversation_id': conversation_id,
+            'role': 'user',
+            'content': 'Buffered hello'
+        })
+    finally:
+        app.extensions['message_buffer'].stop()
+    assert response.status_code == 201
+    data = json.loads(response.data)
+    assert data['content'] == 'Buffered hello'
+    db.session.expire_all()
+    assert db.session.get(Message, data['id']).content == 'Buffered hello'
+
+def test_slow_group_is_awaited_not_abandoned(app, client, conversation_id):
+    """Test a timed-out request whose group already started answers with the stored row"""
+    app.config.update(MESSAGE_GROUP_COMMIT=True, MESSAGE_GROUP_COMMIT_TIMEOUT=0.05)
+    buffer = MessageWriteBuffer(app, max_delay=0)
+    original = buffer._write
+    buffer._write = lambda batch: (time.sleep(0.2), original(batch))
+    app.extensions['message_buffer'] = buffer
+    try:
+        response = client.post('/api/messages/', json={
+            'conversation_id': conversation_id,
+            'role': 'user',
+            'content': 'Slow hello'
+        })
+    finally:
+        buffer.stop()
+    assert response.status_code == 201
+    db.session.expire_all()
+    assert Message.query.filter_by(conversation_id=conversation_id).count() == 1
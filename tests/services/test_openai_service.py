@@ -1,27 +1,20 @@
 import pytest
 from unittest.mock import Mock, patch
 import openai
-from app.services.openai_service import OpenAIService
+from app.services.llm_router import get_llm_router
+from app.services.openai_service import OpenAIService, get_openai_service
 from app.services.memory_provider import MemoryProvider
 from app.models import Memory, Agent
 
 @pytest.fixture
-def mock_openai():
+def mock_openai(chat_completion, embedding_response):
     """Mock OpenAI API responses."""
-    with patch('openai.ChatCompletion.create') as mock_completion, \
-         patch('openai.Embedding.create') as mock_embedding:
+    with patch('openai.resources.chat.completions.Completions.create') as mock_completion, \
+         patch('openai.resources.embeddings.Embeddings.create') as mock_embedding:
         # Mock chat completion
-        mock_completion.return_value = {
-            "choices": [{
-                "message": {"role": "assistant", "content": "Test response"}
-            }]
-        }
+        mock_completion.return_value = chat_completion({"role": "assistant", "content": "Test response"})
         # Mock embedding
-        mock_embedding.return_value = {
-            "data": [{
-                "embedding": [0.1] * 1536
-            }]
-        }
+        mock_embedding.return_value = embedding_response([0.1] * 1536)
         yield {
             "completion": mock_completion,
             "embedding": mock_embedding
@@ -81,7 +74,9 @@ def test_create_chat_completion_with_memory(openai_service, mock_openai, mock_me
     response = openai_service.create_chat_completion(messages, mock_agent)
     
     # Verify memory provider was called
-    mock_memory_provider.get_relevant_memories.assert_called_once_with("Hello")
+    mock_memory_provider.get_relevant_memories.assert_called_once_with(
+        "Hello", user_id=None, agent=mock_agent, conversation_id=None
+    )
     
     # Verify messages structure
     call_args = mock_openai["completion"].call_args[1]
@@ -165,7 +160,7 @@ def test_create_embedding(openai_service, mock_openai):
 
 def test_create_chat_completion_error(openai_service, mock_agent):
     """Test error handling in chat completion."""
-    with patch('openai.ChatCompletion.create', side_effect=Exception("API Error")):
+    with patch('openai.resources.chat.completions.Completions.create', side_effect=Exception("API Error")):
         with pytest.raises(Exception) as exc_info:
             openai_service.create_chat_completion(
                 [{"role": "user", "content": "Hello"}],
@@ -175,7 +170,51 @@ def test_create_chat_completion_error(openai_service, mock_agent):
 
 def test_create_embedding_error(openai_service):
     """Test error handling in embedding creation."""
-    with patch('openai.Embedding.create', side_effect=Exception("API Error")):
+    with patch('openai.resources.embeddings.Embeddings.create', side_effect=Exception("API Error")):
         with pytest.raises(Exception) as exc_info:
             openai_service.create_embedding("Test text")
         assert "OpenAI API error" in str(exc_info.value)
+
+def test_create_embeddings_batch(openai_service, mock_openai, embedding_response):
+    """Test creating several shortened embeddings in one call."""
+    mock_openai["embedding"].return_value = embedding_response([0.2] * 512, [0.1] * 512, indexes=[1, 0])
+    embeddings = openai_service.create_embeddings(["a", "b"], embedding_type="openai-3-small-512")
+
+    assert embeddings == [[0.1] * 512, [0.2] * 512]
+    mock_openai["embedding"].assert_called_once_with(
+        input=["a", "b"],
+        model="text-embedding-3-small",
+        dimensions=512
+    )
+
+def test_create_chat_completion_scopes_memory(openai_service, mock_openai, mock_memory_provider, mock_agent):
+    """Test memory search is scoped to the conversation, its user and agent."""
+    openai_service.memory_provider = mock_memory_provider
+
+    openai_service.create_chat_completion(
+        [{"role": "user", "content": "Hello"}],
+        mock_agent,
+        user_id="user-1",
+        conversation_id="conversation-1"
+    )
+
+    mock_memory_provider.get_relevant_memories.assert_called_once_with(
+        "Hello", user_id="user-1", agent=mock_agent, conversation_id="conversation-1"
+    )
+
+def test_router_built_on_first_use(app):
+    """Test the router is only built when a completion needs it, and shared by the app's service."""
+    with app.app_context():
+        with patch('app.services.openai_service.router_from_config') as router_from_config:
+            service = OpenAIService()
+            router_from_config.assert_not_called()
+            assert service.router is router_from_config.return_value
+        assert get_openai_service(app).router is get_llm_router(app)
+
+def test_shared_service_reads_app_config():
+    """Test the app's shared service uses that app's settings."""
+    from app import create_app
+    app = create_app({'OPENAI_DEFAULT_MODEL': 'gpt-test', 'OPENAI_SUMMARY_MAX_TOKENS': 123})
+    service = get_openai_service(app)
+    assert service.default_model == 'gpt-test'
+    assert service.config.OPENAI_SUMMARY_MAX_TOKENS == 123
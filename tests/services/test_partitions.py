@@ -0,0 +1,39 @@
+from datetime import date, datetime
+from app.models import Job, db
+from app.services.job_queue import JobQueue
+from app.services.partitions import (
+    MAINTAIN_PARTITIONS, add_months, detach_partitions, ensure_partitions, month_start, partition_name,
+    maintain_partitions, schedule_partition_maintenance
+)
+
+def test_month_arithmetic():
+    """Test month helpers roll over year boundaries."""
+    assert month_start(datetime(2025, 3, 17, 12, 30)) == date(2025, 3, 1)
+    assert add_months(date(2025, 11, 1), 3) == date(2026, 2, 1)
+    assert add_months(date(2025, 1, 1), -1) == date(2024, 12, 1)
+    assert partition_name(date(2025, 2, 1)) == 'message_p202502'
+
+def test_partition_management_is_postgres_only(app):
+    """Test partition helpers are no-ops on an unpartitioned (SQLite) table."""
+    with db.engine.begin() as conn:
+        assert ensure_partitions(conn, months_ahead=3) == []
+        assert detach_partitions(conn, older_than_months=1) == []
+
+def test_partitions_command(runner):
+    """Test the partitions CLI reports what it created."""
+    result = runner.invoke(args=['messages', 'partitions', '--months-ahead', '2'])
+    assert 'Created 0 partitions' in result.output
+
+def test_maintenance_job_is_scheduled_once_and_recurs(app):
+    """Test the maintenance job is queued once and each run queues the next."""
+    assert schedule_partition_maintenance()
+    assert not schedule_partition_maintenance()
+
+    queue = JobQueue()
+    jobs = queue.claim(MAINTAIN_PARTITIONS)
+    maintain_partitions([job.payload for job in jobs])
+    queue.complete(jobs)
+
+    queued = Job.query.filter_by(kind=MAINTAIN_PARTITIONS, status='queued').all()
+    assert len(queued) == 1
+    assert queued[0].run_after > datetime.utcnow()
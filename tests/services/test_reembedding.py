@@ -0,0 +1,61 @@
+import pytest
+import numpy as np
+from unittest.mock import Mock
+from app.services.reembedding import ReembeddingJob
+from app.models import Memory, db
+
+@pytest.fixture
+def embedding_service():
+    """Create a mock embedding service producing 512-dimensional vectors."""
+    service = Mock()
+    service.create_embeddings.side_effect = lambda texts, embedding_type: [
+        np.random.rand(512).tolist() for _ in texts
+    ]
+    return service
+
+@pytest.fixture
+def source_memories(app):
+    """Create memories with the default embedding type."""
+    memories = [
+        Memory(content=f"Test content {i}", embedding=np.random.rand(1536).tolist())
+        for i in range(5)
+    ]
+    db.session.add_all(memories)
+    db.session.commit()
+    return memories
+
+def test_reembed_in_batches(app, embedding_service, source_memories):
+    """Test memories are copied forward to the target type in batches."""
+    job = ReembeddingJob(embedding_service, "openai", "openai-3-small-512", batch_size=2)
+
+    assert job.pending_count() == 5
+    assert job.run() == 5
+    assert job.pending_count() == 0
+    assert embedding_service.create_embeddings.call_count == 3
+
+    copies = Memory.query.filter_by(embedding_type="openai-3-small-512").all()
+    assert {m.content for m in copies} == {m.content for m in source_memories}
+    # Source rows remain searchable until retired
+    assert Memory.query.filter_by(embedding_type="openai").count() == 5
+
+def test_reembed_is_resumable(app, embedding_service, source_memories):
+    """Test a stopped job continues where it left off."""
+    job = ReembeddingJob(embedding_service, "openai", "openai-3-small-512", batch_size=2)
+
+    assert job.run(max_batches=1) == 2
+    assert job.run() == 3
+    assert Memory.query.filter_by(embedding_type="openai-3-small-512").count() == 5
+
+def test_retire_source(app, embedding_service, source_memories):
+    """Test retiring removes only source rows that were copied."""
+    job = ReembeddingJob(embedding_service, "openai", "openai-3-small-512", batch_size=2)
+    job.run(max_batches=1)
+
+    assert job.retire_source() == 2
+    assert Memory.query.filter_by(embedding_type="openai").count() == 3
+    assert Memory.query.filter(Memory.reembedded_from_id.isnot(None)).count() == 0
+
+def test_same_type_rejected(embedding_service):
+    """Test that migrating to the same type is rejected."""
+    with pytest.raises(ValueError):
+        ReembeddingJob(embedding_service, "openai", "openai")
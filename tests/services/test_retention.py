@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+import numpy as np
+from app.models import db, Agent, Conversation, Memory, Message, MessageArchive, User
+from app.services.retention import MessageArchiver, delete_agent, delete_user
+
+def make_conversation(user_id, agent_id, messages=0, start=None, **fields):
+    """Create a conversation with `messages` messages one minute apart."""
+    conversation = Conversation(user_id=user_id, agent_id=agent_id, **fields)
+    db.session.add(conversation)
+    db.session.flush()
+    start = start or datetime.utcnow()
+    for i in range(messages):
+        db.session.add(Message(conversation_id=conversation.id, role='user', content=f'Message {i}',
+                               created_at=start + timedelta(minutes=i)))
+    db.session.commit()
+    return conversation
+
+def test_delete_user_cascades(app):
+    """Test deleting a user removes their conversations, messages and memories only."""
+    db.session.add_all([
+        User(id='user-1', name='One', email='one@example.com'),
+        User(id='user-2', name='Two', email='two@example.com'),
+        Agent(id='agent-1', provider='openai')
+    ])
+    mine = make_conversation('user-1', 'agent-1', messages=3)
+    theirs = make_conversation('user-2', 'agent-1', messages=2)
+    source = Memory(content='Old', user_id='user-1', embedding=np.random.rand(1536).tolist())
+    db.session.add(source)
+    db.session.flush()
+    db.session.add_all([
+        Memory(content='New', user_id='user-2', embedding=np.random.rand(1536).tolist(),
+               reembedded_from_id=source.id),
+        MessageArchive.pack(mine.id, Message.query.filter_by(conversation_id=mine.id).all())
+    ])
+    db.session.commit()
+
+    assert delete_user('user-1')
+    assert not delete_user('user-1')
+    assert db.session.get(User, 'user-2') is not None
+    assert [c.id for c in Conversation.query.all()] == [theirs.id]
+    assert Message.query.count() == 2
+    assert MessageArchive.query.count() == 0
+    assert [m.content for m in Memory.query.all()] == ['New']
+    assert Memory.query.one().reembedded_from_id is None
+
+def test_delete_agent_cascades(app):
+    """Test deleting an agent removes its conversations and agent-specific memories."""
+    db.session.add(Agent(id='agent-1', provider='openai'))
+    make_conversation('test-user', 'agent-1', messages=2)
+    make_conversation('test-user', 'agent-2', messages=1)
+    db.session.add_all([
+        Memory(content='Agent memory', agent_id='agent-1', embedding=np.random.rand(1536).tolist()),
+        Memory(content='Shared memory', embedding=np.random.rand(1536).tolist())
+    ])
+    db.session.commit()
+
+    assert delete_agent('agent-1')
+    assert [c.agent_id for c in Conversation.query.all()] == ['agent-2']
+    assert Message.query.count() == 1
+    assert [m.content for m in Memory.query.all()] == ['Shared memory']
+
+def test_delete_conversation_route_removes_messages(client):
+    """Test the delete route removes the conversation's messages in bulk."""
+    conversation = make_conversation('test-user', 'test-agent', messages=3)
+    assert client.delete(f'/api/conversations/{conversation.id}').status_code == 200
+    assert Message.query.count() == 0
+    assert client.delete(f'/api/conversations/{conversation.id}').status_code == 404
+
+def test_archiver_moves_old_messages(app):
+    """Test old messages are archived in compressed chunks and removed from the hot table."""
+    old = datetime.utcnow() - timedelta(days=200)
+    idle = make_conversation('test-user', 'test-agent', messages=5, start=old, last_active_at=old)
+    # Active conversation: only the part folded into the summary may be archived
+    active = make_conversation('test-user', 'test-agent', messages=4, start=old)
+    folded = Message.query.filter_by(conversation_id=active.id, content='Message 1').one()
+    active.summarized_through_at = folded.created_at
+    active.summarized_through_id = folded.id
+    recent = make_conversation('test-user', 'test-agent', messages=2)
+    db.session.commit()
+
+    archiver = MessageArchiver(max_age_days=90, batch_size=3)
+    assert archiver.pending_count() == 7
+    assert archiver.run() == 7
+    assert archiver.pending_count() == 0
+
+    remaining = {(m.conversation_id, m.content) for m in Message.query.all()}
+    assert remaining == {
+        (active.id, 'Message 2'), (active.id, 'Message 3'),
+        (recent.id, 'Message 0'), (recent.id, 'Message 1')
+    }
+    chunks = MessageArchive.query.filter_by(conversation_id=idle.id).order_by(MessageArchive.first_created_at).all()
+    assert sum(c.message_count for c in chunks) == 5
+    assert [m['content'] for c in chunks for m in c.messages()] == [f'Message {i}' for i in range(5)]
+
+def test_archive_command(runner):
+    """Test the archive CLI reports what it did."""
+    old = datetime.utcnow() - timedelta(days=200)
+    make_conversation('test-user', 'test-agent', messages=2, start=old, last_active_at=old)
+    result = runner.invoke(args=['messages', 'archive', '--older-than-days', '30'])
+    assert 'Archived 2 messages, 0 pending' in result.output
@@ -0,0 +1,71 @@
+import json
+import os
+import numpy as np
+import pytest
+from app.models import db, Agent, Memory, User
+from app.services.snapshots import export_snapshot, import_snapshot
+
+@pytest.fixture
+def store(app):
+    """A small memory store with owners, an unembedded memory and a re-embedded copy."""
+    with app.app_context():
+        user = User(id='snapshot-user', name='Snap', email='snap@example.com')
+        agent = Agent(id='snapshot-agent', provider='openai')
+        db.session.add_all([user, agent])
+        vectors = np.random.rand(3, 1536).tolist()
+        memories = [
+            Memory(content=f'Memory {i}', embedding=vectors[i], user_id=user.id, agent_id=agent.id, importance=i / 2)
+            for i in range(3)
+        ]
+        pending = Memory(content='Not embedded yet', user_id=user.id)
+        db.session.add_all(memories + [pending])
+        db.session.flush()
+        copy = Memory(content='Memory 0', embedding_type='openai-3-small-512',
+                      embedding=np.random.rand(512).tolist(), reembedded_from_id=memories[0].id)
+        db.session.add(copy)
+        db.session.commit()
+        return {'vectors': vectors, 'copy_id': copy.id, 'source_id': memories[0].id}
+
+def test_export_writes_memory_mappable_matrices(app, store, tmp_path):
+    with app.app_context():
+        counts = export_snapshot(str(tmp_path), dtype='float16')
+    assert counts == {'openai': 4, 'openai-3-small-512': 1}
+
+    manifest = json.loads((tmp_path / 'manifest.json').read_text())
+    assert manifest['types']['openai'] == {'rows': 4, 'dimensions': 1536}
+    matrix = np.load(tmp_path / 'openai' / 'embeddings.npy', mmap_mode='r')
+    assert isinstance(matrix, np.memmap) and matrix.shape == (4, 1536) and matrix.dtype == np.float16
+    assert np.load(tmp_path / 'openai' / 'embedded.npy').sum() == 3
+    owners = json.loads((tmp_path / 'owners.json').read_text())
+    assert [u['id'] for u in owners['users']] == ['snapshot-user']
+
+def test_round_trip(app, store, tmp_path):
+    """Test a restore reproduces rows, embeddings and re-embedding links."""
+    with app.app_context():
+        export_snapshot(str(tmp_path))
+        with pytest.raises(ValueError, match='not empty'):
+            import_snapshot(str(tmp_path))
+
+        # Restore into a store whose owners are gone too
+        Memory.query.delete()
+        User.query.delete()
+        Agent.query.delete()
+        db.session.commit()
+        assert import_snapshot(str(tmp_path), batch_size=2) == {'openai': 4, 'openai-3-small-512': 1}
+
+        restored = {m.content: m for m in Memory.query.filter_by(embedding_type='openai')}
+        assert len(restored) == 4
+        assert restored['Not embedded yet'].embedding is None
+        for i in range(3):
+            memory = restored[f'Memory {i}']
+            assert np.allclose(memory.embedding, store['vectors'][i], atol=1e-6)
+            assert memory.importance == i / 2
+            assert memory.user_id == 'snapshot-user' and memory.agent_id == 'snapshot-agent'
+        assert db.session.get(Memory, store['copy_id']).reembedded_from_id == store['source_id']
+        assert db.session.get(User, 'snapshot-user').email == 'snap@example.com'
+
+def test_restore_command_rejects_incomplete_snapshot(runner, tmp_path):
+    os.makedirs(tmp_path / 'openai')
+    result = runner.invoke(args=['memory', 'restore', str(tmp_path)])
+    assert result.exit_code != 0
+    assert 'not a complete snapshot' in result.output
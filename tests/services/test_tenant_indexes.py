@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from app.services.tenant_indexes import TenantIndexManager
+from app.models import Memory, db
+
+def test_large_tenants(app):
+    """Test only tenants above the threshold are selected for indexing."""
+    with app.app_context():
+        db.session.add_all(
+            [Memory(content=f"Big {i}", user_id="big", embedding=np.random.rand(1536).tolist()) for i in range(3)] +
+            [Memory(content="Small", user_id="small", embedding=np.random.rand(1536).tolist())]
+        )
+        db.session.commit()
+
+        manager = TenantIndexManager(min_rows=2)
+        assert manager.large_tenants() == [("big", "openai", 3)]
+        assert manager.ensure_indexes() == [TenantIndexManager.index_name("big", "openai")]
+
+def test_index_name_is_stable_and_short():
+    """Test index names are deterministic and fit PostgreSQL's identifier limit."""
+    name = TenantIndexManager.index_name("0f8fad5b-d9cb-469f-a165-70867728950e", "openai-3-small-512")
+    assert name == TenantIndexManager.index_name("0f8fad5b-d9cb-469f-a165-70867728950e", "openai-3-small-512")
+    assert name != TenantIndexManager.index_name("other", "openai-3-small-512")
+    assert len(name) <= 63
+
+def test_global_memories_are_a_tenant(app):
+    """Test memories without an owner get their own index like any large tenant."""
+    with app.app_context():
+        db.session.add_all([Memory(content=f"Global {i}", embedding=np.random.rand(1536).tolist()) for i in range(2)])
+        db.session.commit()
+
+        assert TenantIndexManager(min_rows=2).large_tenants() == [(None, "openai", 2)]
+
+def test_owner_predicate_requires_uuid():
+    """Test tenant ids are validated as UUIDs before they reach index DDL."""
+    assert TenantIndexManager._owner_predicate(None) == "user_id IS NULL"
+    assert TenantIndexManager._owner_predicate("0F8FAD5B-D9CB-469F-A165-70867728950E") == \
+        "user_id = '0f8fad5b-d9cb-469f-a165-70867728950e'"
+    with pytest.raises(ValueError):
+        TenantIndexManager._owner_predicate("x' OR '1'='1")
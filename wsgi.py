@@ -0,0 +1,7 @@
+from app import create_app
+from app.warmup import start_warmup
+
+# WSGI entry point for gunicorn: gunicorn -c gunicorn.conf.py wsgi:app
+app = create_app()
+# Imported in each worker, so each one warms up before taking traffic
+start_warmup(app)